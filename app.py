@@ -1,9 +1,40 @@
 import streamlit as st
 from modelo_sir import simulate_sir
-from modelo_agentes import ModeloAgentes
+from intervenciones import Intervenciones
+from modelo_agentes import ModeloAgentes, Instantanea, INFECTADO
+from cache_simulaciones import CacheSimulaciones
+from campo_medio import simular_agregado
+import nucleo_numba
+from trayectorias import EscritorTrayectoria, LectorTrayectoria
+from instrumentacion import Perfilador, BORDES_HISTOGRAMA, activar, fase
+from trabajos import GestorTrabajos
+from visualizacion import (AnimacionCurvas, AnimacionAgentes, programar_fotogramas, MAX_PUNTOS_DISPERSION,
+                           UMBRAL_DENSIDAD)
 import matplotlib.pyplot as plt
 import numpy as np
+import os
 import time
+import uuid
+
+# Fotogramas por segundo objetivo de la animación en tiempo real
+FPS_ANIMACION = 20
+
+# Días de la corrida piloto con agentes del modo de campo medio y divergencia
+# (fracción de la población) a partir de la cual se advierte al usuario
+DIAS_PILOTO = 10
+UMBRAL_DIVERGENCIA = 0.05
+
+# Directorio donde la página de agentes guarda las corridas para reproducirlas
+DIRECTORIO_TRAYECTORIAS = os.environ.get("SIR_TRAYECTORIAS", "trayectorias_guardadas")
+
+# Hilos de fondo para las corridas de agentes (compartidos por todas las
+# sesiones) y segundos entre refrescos del progreso de una corrida
+HILOS_SIMULACION = int(os.environ.get("SIR_HILOS", os.cpu_count() or 2))
+INTERVALO_SEGUIMIENTO = 0.5
+
+# Segundos entre refrescos de la animación en tiempo real del simulador SIR;
+# el ritmo de los días lo marca FPS_ANIMACION en el hilo de fondo
+INTERVALO_ANIMACION = 0.1
 
 # Configuración de página
 st.set_page_config(layout="wide")
@@ -105,9 +136,371 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+@st.cache_resource
+def obtener_cache():
+    # Caché compartida entre todas las sesiones del servidor
+    return CacheSimulaciones(max_entradas=256, max_bytes=256 * 2**20)
+
+
+@st.cache_resource
+def obtener_gestor():
+    # Un único grupo de hilos para todo el servidor; cada sesión ejecuta como
+    # mucho una corrida a la vez y las sesiones se turnan los hilos libres
+    return GestorTrabajos(hilos=HILOS_SIMULACION, activos_por_propietario=1)
+
+
+def reproducir_trayectoria(trayectoria):
+    # Recorre una trayectoria guardada en la caché con la misma interfaz que ModeloAgentes.iterar
+    fotogramas = {paso: k for k, paso in enumerate(trayectoria['pasos'].tolist())}
+    for paso, conteos in enumerate(trayectoria['conteos'], start=1):
+        k = fotogramas.get(paso)
+        if k is None:
+            yield Instantanea(paso, conteos, None, None, None)
+        else:
+            yield Instantanea(paso, conteos, trayectoria['x'][k], trayectoria['y'][k], trayectoria['estados'][k])
+
+
+@st.cache_resource(max_entries=8)
+def abrir_trayectoria(ruta, modificado):
+    # Un lector por corrida y versión en disco (``modificado``), compartido entre
+    # sesiones: LectorTrayectoria admite lecturas concurrentes
+    return LectorTrayectoria(ruta)
+
+
+def listar_trayectorias(directorio):
+    if not os.path.isdir(directorio):
+        return []
+    rutas = (os.path.join(directorio, nombre) for nombre in os.listdir(directorio))
+    return sorted((r for r in rutas if os.path.isfile(os.path.join(r, "meta.json"))), reverse=True)
+
+def mostrar_figura(destino, fig):
+    # El envío rasteriza la figura: suele ser la fase de dibujo más cara
+    with fase('dibujo.envio'):
+        destino.pyplot(fig)
+
+
+def panel_rendimiento(perfilador):
+    with st.expander("Rendimiento"):
+        resumen = perfilador.resumen()
+        if not resumen:
+            st.caption("Sin mediciones todavía. Activa «Medir rendimiento» y ejecuta una simulación.")
+            return
+        st.dataframe(
+            {
+                "Fase": list(resumen),
+                "Llamadas": [r['llamadas'] for r in resumen.values()],
+                "Total (s)": [round(r['total_s'], 4) for r in resumen.values()],
+                "Media (ms)": [round(r['media_s'] * 1e3, 3) for r in resumen.values()],
+                "p95 (ms)": [round(r['p95_s'] * 1e3, 3) for r in resumen.values()],
+                "Neta/llamada (KiB)": [round(r['bytes_netos_por_llamada'] / 2**10, 1) for r in resumen.values()],
+                "Pico medio (KiB)": [round(r['pico_bytes_medio'] / 2**10, 1) for r in resumen.values()],
+                "Pico máximo (KiB)": [round(r['pico_bytes_max'] / 2**10, 1) for r in resumen.values()],
+            },
+            hide_index=True, use_container_width=True,
+        )
+        st.caption("Memoria medida con tracemalloc: la neta es la que la fase deja asignada y el pico lo máximo "
+                   "que llegó a asignar por encima de su inicio. Con otras sesiones o corridas activas a la vez "
+                   "incluye también sus asignaciones.")
+        elegida = st.selectbox("Histograma de duraciones", list(resumen))
+        histograma = np.array(resumen[elegida]['histograma'])
+        usados = np.flatnonzero(histograma)
+        tramo = slice(usados[0], usados[-1] + 1)
+        etiquetas = [f"≤ {b * 1e3:.3g} ms" for b in BORDES_HISTOGRAMA] + [f"> {BORDES_HISTOGRAMA[-1]:g} s"]
+        st.bar_chart({"Llamadas": dict(zip(etiquetas[tramo], histograma[tramo].tolist()))})
+        col_json, col_limpiar = st.columns(2)
+        with col_json:
+            st.download_button("Exportar JSON", perfilador.a_json(), file_name="rendimiento.json",
+                               mime="application/json")
+        with col_limpiar:
+            if st.button("Reiniciar mediciones"):
+                perfilador.limpiar()
+                st.rerun()
+
+
+def ejecutar_agentes(trabajo, parametros, cache, directorio):
+    # Corre en un hilo de GestorTrabajos, sin llamadas a Streamlit: publica los
+    # conteos acumulados y una copia del último fotograma en cada día
+    p = parametros
+    dias = p['dias']
+    clave_cache = cache.clave('ModeloAgentes', p)
+    # Para guardar en disco hace falta el estado inicial: se simula aunque esté en caché
+    trayectoria = cache.obtener(clave_cache) if p['semilla'] is not None and directorio is None else None
+    # La grabación para la caché se estima antes de empezar: si no va a caber
+    # no se acumulan los fotogramas (x, y en float32 y estados en int8)
+    fotogramas = -(-dias // p['cada'])
+    tamaño = dias * 3 * 8 + fotogramas * (p['num_agentes'] * 9 + 8)
+    grabar = trayectoria is None and p['semilla'] is not None and cache.admite(tamaño)
+    grabacion = {'conteos': [], 'pasos': [], 'x': [], 'y': [], 'estados': []}
+    escritor = None
+    if trayectoria is None:
+        rng = np.random.default_rng(p['semilla']) if p['semilla'] is not None else None
+        modelo = ModeloAgentes(p['num_agentes'], p['tamaño'], p['radio_contagio'], p['beta'], p['gamma'],
+                               rng=rng, motor=p['motor'])
+        instantaneas = modelo.iterar(dias, cada=p['cada'])
+        if directorio is not None:
+            ruta = os.path.join(directorio, f"{time.strftime('%Y%m%d-%H%M%S')}_{p['num_agentes']}_agentes")
+            escritor = EscritorTrayectoria(ruta, p['num_agentes'], p)
+            escritor.agregar(Instantanea(0, modelo.contar_estados(), modelo.x, modelo.y, modelo.estados))
+    else:
+        instantaneas = reproducir_trayectoria(trayectoria)
+
+    # Las filas ya escritas no cambian: las vistas conteos[:paso] se publican sin copiar
+    conteos = np.zeros((dias, 3), dtype=np.int64)
+    ultima = None
+    try:
+        for instantanea in instantaneas:
+            paso = instantanea.paso
+            conteos[paso - 1] = instantanea.conteos
+            if escritor is not None:
+                escritor.agregar(instantanea)
+            if instantanea.x is not None:
+                ultima = Instantanea(paso, conteos[paso - 1], instantanea.x.astype(np.float32),
+                                     instantanea.y.astype(np.float32), instantanea.estados.copy())
+            if grabar:
+                grabacion['conteos'].append(instantanea.conteos)
+                if instantanea.x is not None:
+                    grabacion['pasos'].append(paso)
+                    grabacion['x'].append(ultima.x)
+                    grabacion['y'].append(ultima.y)
+                    grabacion['estados'].append(ultima.estados)
+            trabajo.informar(paso / dias, {'conteos': conteos[:paso], 'ultima': ultima})
+    finally:
+        # Si se cancela, lo grabado hasta ese día sigue siendo una trayectoria válida
+        if escritor is not None:
+            escritor.cerrar()
+    if grabar:
+        cache.guardar(clave_cache, {k: np.stack(v) for k, v in grabacion.items()})
+    return {'conteos': conteos, 'ultima': ultima, 'ruta': escritor.ruta if escritor is not None else None}
+
+
+def mostrar_resultados_agentes(conteos, titulo="Resultados finales"):
+    # Calcular métricas finales y avanzadas
+    dias = len(conteos)
+    num_s, num_i, num_r = (int(c) for c in conteos[-1])
+    total = num_s + num_i + num_r
+    max_infectados = int(conteos[:, INFECTADO].max())
+    dia_pico = int(np.argmax(conteos[:, INFECTADO])) + 1
+    porcentaje_max_infectados = 100 * max_infectados / total
+    porcentaje_final_s = 100 * num_s / total
+    porcentaje_final_i = 100 * num_i / total
+    porcentaje_final_r = 100 * num_r / total
+
+    # Mostrar resultados finales y avanzados
+    st.markdown("---")
+    st.markdown(f"<h3 style='color:#f9fafb; text-align:center;'>{titulo}</h3>", unsafe_allow_html=True)
+
+    kpi_col1, kpi_col2, kpi_col3 = st.columns(3)
+    with kpi_col1:
+        st.markdown(f"""
+            <div style="background-color:#0f172a; border-radius:0.75rem; border:1px solid #1e293b; padding:1rem; margin:0.5rem; text-align:center; box-shadow:0 4px 6px -1px rgba(0, 0, 0, 0.1);">
+                <p style="margin:0; font-size:1rem; font-weight:600; color:#e5e7eb;">Susceptibles</p>
+                <p style="margin:0; font-size:1.8rem; font-weight:700; color:#38bdf8;">{num_s}<br><span style="font-size:1rem;">({porcentaje_final_s:.1f}%)</span></p>
+            </div>
+            """, unsafe_allow_html=True)
+    with kpi_col2:
+        st.markdown(f"""
+            <div style="background-color:#0f172a; border-radius:0.75rem; border:1px solid #1e293b; padding:1rem; margin:0.5rem; text-align:center; box-shadow:0 4px 6px -1px rgba(0, 0, 0, 0.1);">
+                <p style="margin:0; font-size:1rem; font-weight:600; color:#e5e7eb;">Infectados</p>
+                <p style="margin:0; font-size:1.8rem; font-weight:700; color:#f97316;">{num_i}<br><span style="font-size:1rem;">({porcentaje_final_i:.1f}%)</span></p>
+            </div>
+            """, unsafe_allow_html=True)
+    with kpi_col3:
+        st.markdown(f"""
+            <div style="background-color:#0f172a; border-radius:0.75rem; border:1px solid #1e293b; padding:1rem; margin:0.5rem; text-align:center; box-shadow:0 4px 6px -1px rgba(0, 0, 0, 0.1);">
+                <p style="margin:0; font-size:1rem; font-weight:600; color:#e5e7eb;">Recuperados</p>
+                <p style="margin:0; font-size:1.8rem; font-weight:700; color:#22c55e;">{num_r}<br><span style="font-size:1rem;">({porcentaje_final_r:.1f}%)</span></p>
+            </div>
+            """, unsafe_allow_html=True)
+
+    # Métricas avanzadas
+    st.markdown("### Métricas avanzadas")
+    st.metric("Número máximo de infectados", max_infectados, f"{porcentaje_max_infectados:.1f}%")
+    st.metric("Día del pico de infección", dia_pico)
+    st.markdown("---")
+    kpi_col4, kpi_col5 = st.columns(2)
+    with kpi_col4:
+        st.metric("Días simulados", dias)
+    with kpi_col5:
+        st.metric("Agentes totales", total)
+    stats_cache = obtener_cache().estadisticas()
+    st.caption(
+        f"Caché de simulaciones: {stats_cache['aciertos']} aciertos, {stats_cache['fallos']} fallos, "
+        f"{stats_cache['entradas']} entradas ({stats_cache['bytes'] / 2**20:.1f} MiB)"
+    )
+
+
+def animacion_de_trabajo(trabajo):
+    # Una figura por corrida seguida, reutilizada en cada refresco del fragmento
+    id_anterior, animacion = st.session_state.get("animacion_trabajo", (None, None))
+    if id_anterior != trabajo.id:
+        if animacion is not None:
+            animacion.cerrar()
+        animacion = AnimacionAgentes(trabajo.parametros['parametros']['tamaño'])
+        st.session_state.animacion_trabajo = (trabajo.id, animacion)
+    return animacion
+
+
+def seguir_trabajo_agentes(trabajo):
+    # Mientras la corrida está activa solo este fragmento se vuelve a ejecutar,
+    # cada INTERVALO_SEGUIMIENTO segundos; el resto de la página sigue usable
+    activo_al_definir = trabajo.activo
+
+    @st.fragment(run_every=INTERVALO_SEGUIMIENTO if activo_al_definir else None)
+    def seguimiento():
+        consulta = trabajo.consultar()
+        if activo_al_definir and consulta.estado not in ('en_cola', 'ejecutando'):
+            # Terminó: una ejecución completa dibuja el resultado y deja de refrescar
+            st.rerun()
+        dias = trabajo.parametros['parametros']['dias']
+        parcial = consulta.parcial or {}
+        conteos = parcial.get('conteos')
+        if consulta.estado == 'en_cola':
+            en_cola, ejecutando = obtener_gestor().pendientes()
+            st.info(f"Simulación en cola: {ejecutando} en ejecución y {en_cola} esperando en el servidor.")
+        elif consulta.estado == 'ejecutando':
+            dia = 0 if conteos is None else len(conteos)
+            st.progress(consulta.progreso, text=f"Día {dia} de {dias}")
+        if trabajo.activo and st.button("Cancelar simulación", key=f"cancelar_{trabajo.id}"):
+            obtener_gestor().cancelar(trabajo.id)
+            st.rerun()
+
+        ultima = parcial.get('ultima')
+        if ultima is not None:
+            mostrar_figura(st, animacion_de_trabajo(trabajo).actualizar(ultima))
+
+        if consulta.estado == 'terminado':
+            if consulta.resultado['ruta'] is not None:
+                st.success(f"Trayectoria guardada en {consulta.resultado['ruta']}")
+            mostrar_resultados_agentes(consulta.resultado['conteos'])
+        elif consulta.estado == 'cancelado':
+            st.warning("Simulación cancelada.")
+            if conteos is not None and len(conteos):
+                mostrar_resultados_agentes(conteos, f"Resultados hasta el día {len(conteos)}")
+        elif consulta.estado == 'error':
+            st.error(f"La simulación falló: {consulta.error}")
+        elif conteos is not None and len(conteos):
+            st.line_chart({"Infectados": conteos[:, INFECTADO]}, height=200)
+
+    seguimiento()
+
+
+def animar_sir(trabajo, t, S, I, R, N, days, fps):
+    # Corre en un hilo de GestorTrabajos: marca el ritmo de la animación y
+    # publica el índice del fotograma que toca mostrar; el dibujo lo hace la sesión
+    total = len(t)
+    for i in programar_fotogramas(total, fps=fps):
+        trabajo.informar((i + 1) / total, {'indice': i})
+    return {'indice': total - 1}
+
+
+def curvas_de_trabajo(trabajo):
+    # Una figura por animación seguida, reutilizada en cada refresco del fragmento
+    id_anterior, curvas = st.session_state.get("curvas_trabajo", (None, None))
+    if id_anterior != trabajo.id:
+        if curvas is not None:
+            curvas.cerrar()
+        p = trabajo.parametros
+        curvas = AnimacionCurvas(p['t'], p['S'], p['I'], p['R'], p['N'], p['days'])
+        st.session_state.curvas_trabajo = (trabajo.id, curvas)
+    return curvas
+
+
+def mostrar_kpis_finales_sir(t, S, I, R, N):
+    st.subheader("Resultados finales")
+
+    kpi_col1, kpi_col2, kpi_col3, kpi_col4 = st.columns(4)
+
+    with kpi_col1:
+        st.metric(
+            label="Día pico de infección",
+            value=f"{t[np.argmax(I)]:.1f}",
+            help="Momento en el que se alcanza el número máximo de infectados simultáneos."
+        )
+
+    with kpi_col2:
+        st.metric(
+            label="Máximo infectados",
+            value=f"{int(np.max(I)):,}".replace(",", "."),
+            help="Cantidad máxima de personas infectadas al mismo tiempo."
+        )
+
+    with kpi_col3:
+        st.metric(
+            label="% Recuperados al final",
+            value=f"{(R[-1] / N) * 100:.1f}%",
+            help="Porcentaje de la población que acaba en el compartimento Recuperados."
+        )
+
+    with kpi_col4:
+        st.metric(
+            label="% Susceptibles al final",
+            value=f"{(S[-1] / N) * 100:.1f}%",
+            help="Porcentaje de la población que nunca se infectó."
+        )
+
+
+def seguir_animacion_sir(trabajo):
+    # Como seguir_trabajo_agentes: mientras la animación avanza solo se
+    # vuelve a ejecutar este fragmento y los controles de la página responden
+    activo_al_definir = trabajo.activo
+
+    @st.fragment(run_every=INTERVALO_ANIMACION if activo_al_definir else None)
+    def seguimiento():
+        consulta = trabajo.consultar()
+        if activo_al_definir and consulta.estado not in ('en_cola', 'ejecutando'):
+            st.rerun()
+        p = trabajo.parametros
+        t, S, I, R = p['t'], p['S'], p['I'], p['R']
+        i = (consulta.resultado or consulta.parcial or {'indice': 0})['indice']
+
+        if consulta.estado == 'terminado':
+            mostrar_kpis_finales_sir(t, S, I, R, p['N'])
+        elif consulta.estado == 'en_cola':
+            en_cola, ejecutando = obtener_gestor().pendientes()
+            st.info(f"Animación en cola: {ejecutando} simulaciones en ejecución y {en_cola} esperando en el servidor.")
+        elif consulta.estado == 'cancelado':
+            st.warning(f"Animación detenida en el día {int(t[i])}.")
+        elif consulta.estado == 'error':
+            st.error(f"La animación falló: {consulta.error}")
+        if trabajo.activo and st.button("Detener animación", key=f"detener_{trabajo.id}"):
+            obtener_gestor().cancelar(trabajo.id)
+            st.rerun()
+
+        mostrar_figura(st, curvas_de_trabajo(trabajo).actualizar(i))
+
+        # Tarjeta visual debajo de la gráfica, más compacta
+        st.markdown(
+            f"""
+            <div style="background-color:#0f172a; border-radius:0.75rem; border:1px solid #1e293b; padding:1rem; margin-top:0.5rem; display:flex; justify-content:center; align-items:center; gap:1rem; font-size:1.1rem;">
+                <span style="color:#e5e7eb;">Día actual: <span style="color:#22c55e; font-weight:700;">{int(t[i])}</span></span>
+                <span style="color:#e5e7eb;">| Infectados: <span style="color:#f59e0b; font-weight:700;">{int(I[i])}</span></span>
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
+
+    seguimiento()
+
+
+@st.cache_resource
+def precalentar_numba():
+    # Compila (o carga de disco) el núcleo una sola vez por proceso del servidor
+    return nucleo_numba.precalentar()
+
+
 # Estado de sesión
 if "page" not in st.session_state:
-    st.session_state.page = "Inicio"
+    # Un enlace con ?trabajo=... (o ?animacion=...) abre directamente la corrida en curso
+    if "trabajo" in st.query_params:
+        st.session_state.page = "Modelo de agentes"
+    elif "animacion" in st.query_params:
+        st.session_state.page = "Simulador"
+    else:
+        st.session_state.page = "Inicio"
+if "id_sesion" not in st.session_state:
+    st.session_state.id_sesion = uuid.uuid4().hex
+if "perfilador" not in st.session_state:
+    st.session_state.perfilador = Perfilador()
 
 # Crear columnas: sidebar y contenido principal
 col_sidebar, col_main = st.columns([1, 4], gap="large")
@@ -122,6 +515,17 @@ with col_sidebar:
         st.session_state.page = "Información"
     if st.button("Modelo de agentes", use_container_width=True):
         st.session_state.page = "Modelo de agentes"
+    if st.button("Reproducir corrida", use_container_width=True):
+        st.session_state.page = "Reproducción"
+    medir = st.checkbox("Medir rendimiento",
+                        help="Registra el tiempo y la memoria asignada de cada fase de las simulaciones y del dibujo.")
+    # Cada ejecución del script fija de nuevo el perfilador activo (o ninguno);
+    # al desmarcar la casilla se detiene el trazado de memoria, que es costoso
+    activar(st.session_state.perfilador if medir else None)
+    if not medir:
+        st.session_state.perfilador.detener()
+    # Se rellena al final para incluir las mediciones de esta ejecución
+    hueco_rendimiento = st.empty()
 
 with col_main:
     st.title("Simulador Epidemiológico SIR")
@@ -255,6 +659,29 @@ with col_main:
             value=160,
             help="Número de días que durará la simulación"
         )
+
+        with st.expander("Intervenciones"):
+            confinar = st.checkbox("Confinamiento", help="Reduce beta durante una ventana de días.")
+            col_conf1, col_conf2, col_conf3 = st.columns(3)
+            with col_conf1:
+                inicio_conf = st.number_input("Inicio (día)", min_value=0, value=30, disabled=not confinar)
+            with col_conf2:
+                fin_conf = st.number_input("Fin (día)", min_value=0, value=60, disabled=not confinar)
+            with col_conf3:
+                factor_conf = st.slider("Factor sobre beta", 0.0, 1.0, 0.5, disabled=not confinar)
+            vacunar = st.checkbox("Vacunación", help="Una fracción de los susceptibles pasa a recuperados cada día.")
+            col_vac1, col_vac2 = st.columns(2)
+            with col_vac1:
+                inicio_vac = st.number_input("Desde el día", min_value=0, value=20, disabled=not vacunar)
+            with col_vac2:
+                tasa_vac = st.number_input("Tasa diaria", min_value=0.0, max_value=1.0, value=0.01, format="%.3f",
+                                           disabled=not vacunar)
+        intervenciones = None
+        if confinar or vacunar:
+            intervenciones = Intervenciones(
+                vacunacion=[(inicio_vac, tasa_vac)] if vacunar else 0.0,
+                confinamientos=[(inicio_conf, fin_conf, factor_conf)] if confinar else (),
+            )
         
         # Validaciones
         errores = []
@@ -304,13 +731,19 @@ with col_main:
         # Limpiar resultados ANTES de mostrar botones
         if "clear_clicked" in st.session_state and st.session_state.clear_clicked:
             st.session_state.simulation_results = None
+            if st.session_state.get("trabajo_sir"):
+                obtener_gestor().cancelar(st.session_state.pop("trabajo_sir"))
+            st.query_params.pop("animacion", None)
             st.session_state.clear_clicked = False
             st.rerun()
         
         # Ejecutar simulación ANTES de mostrar botones
         if "run_clicked" in st.session_state and st.session_state.run_clicked:
             st.session_state.run_clicked = False
-            t, S, I, R = simulate_sir(N, I0, R0, beta, gamma, days)
+            t, S, I, R = obtener_cache().memorizar(
+                'simulate_sir', simulate_sir,
+                dict(N=N, I0=I0, R0=R0, beta=beta, gamma=gamma, days=days, intervenciones=intervenciones)
+            )
             st.session_state.simulation_results = {
                 't': t, 'S': S, 'I': I, 'R': R,
                 'N': N, 'days': days, 'modo': modo_visualizacion
@@ -402,106 +835,39 @@ with col_main:
                     for text in legend.get_texts():
                         text.set_color("#e5e7eb")
                     plt.tight_layout()
-                    st.pyplot(fig)
+                    mostrar_figura(st, fig)
 
                 
             else:  # Tiempo real
                 st.subheader("Simulación en tiempo real")
-                
-                # Placeholder para KPIs arriba de la gráfica
-                kpis_placeholder = st.empty()
-                
-                # Animación
-                chart_placeholder = st.empty()
-                
-                # Placeholder para información visual debajo de la gráfica
-                info_placeholder = st.empty()
-                
-                for i in range(len(t)):
-                    fig, ax = plt.subplots(figsize=(10, 4))
-
-                    # Estilo de la gráfica (colores y diseño idéntico)
-                    ax.plot(t[:i+1], S[:i+1], label="Susceptibles", color="#38bdf8", linewidth=3)
-                    ax.plot(t[:i+1], I[:i+1], label="Infectados", color="#f97316", linewidth=3)
-                    ax.plot(t[:i+1], R[:i+1], label="Recuperados", color="#22c55e", linewidth=3)
 
-                    # Fondo oscuro
-                    ax.set_facecolor("#020617")
-                    fig.patch.set_facecolor("#020617")
-
-                    # Color de los ejes, ticks y texto
-                    ax.tick_params(colors="#e5e7eb")
-                    ax.spines["bottom"].set_color("#475569")
-                    ax.spines["left"].set_color("#475569")
-                    ax.spines["top"].set_visible(False)
-                    ax.spines["right"].set_visible(False)
-                    ax.set_xlabel("Días", color="#e5e7eb")
-                    ax.set_ylabel("Número de personas", color="#e5e7eb")
-
-                    # Grid suave
-                    ax.grid(alpha=0.2, color="#64748b")
-
-                    # Leyenda estilizada
-                    legend = ax.legend(frameon=True, fancybox=True, shadow=True)
-                    legend.get_frame().set_facecolor("#1e293b")
-                    for text in legend.get_texts():
-                        text.set_color("#e5e7eb")
+                # Los fotogramas los marca un hilo de fondo: cambiar un control
+                # no interrumpe la animación ni la página espera a que termine
+                gestor = obtener_gestor()
+                trabajo = gestor.obtener(results.get('trabajo')) if results.get('trabajo') else None
+                if trabajo is None:
+                    anterior = st.session_state.get("trabajo_sir")
+                    if anterior:
+                        gestor.cancelar(anterior)
+                    # Propietario aparte: la animación no espera a una corrida de agentes de la misma sesión
+                    trabajo = gestor.enviar(
+                        f"{st.session_state.id_sesion}/sir", animar_sir,
+                        t=t, S=S, I=I, R=R, N=N, days=days, fps=FPS_ANIMACION,
+                    )
+                    results['trabajo'] = trabajo.id
+                    st.session_state.trabajo_sir = trabajo.id
+                    st.query_params["animacion"] = trabajo.id
+                seguir_animacion_sir(trabajo)
 
-                    # Rango de ejes
-                    ax.set_xlim(0, days)
-                    ax.set_ylim(0, N)
-
-                    chart_placeholder.pyplot(fig)
-                    plt.close(fig)
-
-                    
-                    # Tarjeta visual debajo de la gráfica, más compacta
-                    with info_placeholder.container():
-                        st.markdown(
-                            f"""
-                            <div style="background-color:#0f172a; border-radius:0.75rem; border:1px solid #1e293b; padding:1rem; margin-top:0.5rem; display:flex; justify-content:center; align-items:center; gap:1rem; font-size:1.1rem;">
-                                <span style="color:#e5e7eb;">Día actual: <span style="color:#22c55e; font-weight:700;">{int(t[i])}</span></span>
-                                <span style="color:#e5e7eb;">| Infectados: <span style="color:#f59e0b; font-weight:700;">{int(I[i])}</span></span>
-                            </div>
-                            """,
-                            unsafe_allow_html=True
-                        )
-                    
-                    time.sleep(0.05)
-                    
-                    if i == len(t) - 1:
-                        with kpis_placeholder.container():
-                            st.subheader("Resultados finales")
-                            
-                            kpi_col1, kpi_col2, kpi_col3, kpi_col4 = st.columns(4)
-                            
-                            with kpi_col1:
-                                st.metric(
-                                    label="Día pico de infección",
-                                    value=f"{peak_day:.1f}",
-                                    help="Momento en el que se alcanza el número máximo de infectados simultáneos."
-                                )
-                            
-                            with kpi_col2:
-                                st.metric(
-                                    label="Máximo infectados",
-                                    value=f"{int(max_infectados):,}".replace(",", "."),
-                                    help="Cantidad máxima de personas infectadas al mismo tiempo."
-                                )
-                            
-                            with kpi_col3:
-                                st.metric(
-                                    label="% Recuperados al final",
-                                    value=f"{porc_recuperados:.1f}%",
-                                    help="Porcentaje de la población que acaba en el compartimento Recuperados."
-                                )
-                            
-                            with kpi_col4:
-                                st.metric(
-                                    label="% Susceptibles al final",
-                                    value=f"{porc_susceptibles:.1f}%",
-                                    help="Porcentaje de la población que nunca se infectó."
-                                )
+        elif "animacion" in st.query_params:
+            # Tras recargar la página: la animación enviada sigue en el servidor
+            trabajo = obtener_gestor().obtener(st.query_params["animacion"])
+            if trabajo is not None:
+                st.session_state.trabajo_sir = trabajo.id
+                st.subheader("Simulación en tiempo real")
+                seguir_animacion_sir(trabajo)
+            else:
+                st.query_params.pop("animacion", None)
 
     elif st.session_state.page == "Información":
         st.header("Información del modelo SIR")
@@ -562,8 +928,8 @@ with col_main:
         - Asume población homogénea y completamente mezclada.
         - No considera demografía (nacimientos, muertes naturales).
         - Inmunidad permanente (no aplica a todas las enfermedades).
-        - No incluye medidas de intervención como vacunación o cuarentenas.
-        - Parámetros constantes en el tiempo.
+        - Las intervenciones se modelan de forma simple: el confinamiento solo escala beta y la vacunación es una tasa diaria sobre los susceptibles, con eficacia total.
+        - Gamma es constante en el tiempo.
         """)
 
     elif st.session_state.page == "Modelo de agentes":
@@ -576,114 +942,171 @@ with col_main:
         beta = st.slider("Probabilidad de contagio (β)", 0.0, 1.0, 0.3)
         gamma = st.slider("Probabilidad de recuperación (γ)", 0.0, 1.0, 0.1)
         dias = st.number_input("Días de simulación", min_value=1, value=100, step=1, help="Número de pasos (días) para la simulación")
+        semilla = st.number_input(
+            "Semilla (opcional)", min_value=0, value=None, step=1,
+            help="Con semilla la ejecución es reproducible y se guarda en la caché compartida: repetir el mismo escenario no vuelve a simular."
+        )
+        cada = st.number_input(
+            "Dibujar cada (días)", min_value=1, value=1, step=1,
+            help="Solo se dibujan las posiciones de los agentes cada k días; los totales se registran todos los días."
+        )
+        motor = st.radio(
+            "Motor de cálculo", ["numpy", "numba"], horizontal=True,
+            format_func=lambda m: {"numpy": "NumPy", "numba": "Numba (compilado)"}[m],
+            help="El motor compilado ejecuta el paso diario completo sin pasar por Python. "
+                 "Si Numba no está instalado se usa NumPy."
+        )
+        if motor == "numba":
+            if precalentar_numba():
+                st.caption("Núcleo Numba listo.")
+            else:
+                st.caption("Numba no está instalado: se usará el motor NumPy.")
+        solo_totales = st.checkbox(
+            "Solo totales (campo medio)",
+            help="Calibra un modelo SIR compartimental equivalente y lo integra en lugar de mover cada agente. "
+                 "Una corrida piloto corta con agentes indica cuánto se aparta la aproximación."
+        )
 
-        if st.button("Iniciar simulación"):
-            # Inicializar modelo de agentes
-            modelo_agentes = ModeloAgentes(num_agentes, tamaño, radio_contagio, beta, gamma)
+        guardar = st.checkbox(
+            "Guardar trayectoria en disco",
+            help=f"Guarda posiciones y estados en {DIRECTORIO_TRAYECTORIAS}/ para verla después en "
+                 "'Reproducir corrida' sin volver a simular."
+        )
 
-            # Placeholder para gráfica y métricas
-            chart_placeholder = st.empty()
+        iniciar = st.button("Iniciar simulación")
 
-            # Listas para registrar métricas por día
-            infectados_por_dia = []
-
-            # Simulación iterativa
-            for paso in range(dias):
-                modelo_agentes.mover_agentes()
-                modelo_agentes.contagiar()
-                modelo_agentes.recuperar()
-
-                # Registrar número de infectados en el paso actual
-                estados = modelo_agentes.obtener_estado()
-                infecc = sum(1 for s in estados if s[2] == 'I')
-                infectados_por_dia.append(infecc)
-
-                # Mostrar gráfica con estilo oscuro
-                x = [e[0] for e in estados]
-                y = [e[1] for e in estados]
-                c = [e[2] for e in estados]
-
-                # Colores alineados con SIR puro
-                colores = []
-                for estado in c:
-                    if estado == 'S':
-                        colores.append('#38bdf8')  # Azul claro
-                    elif estado == 'I':
-                        colores.append('#f97316')  # Naranja
-                    else:
-                        colores.append('#22c55e')  # Verde
-
-                fig, ax = plt.subplots(figsize=(10, 4))
-                ax.set_facecolor("#020617")
-                fig.patch.set_facecolor("#020617")
-                ax.scatter(x, y, c=colores, s=100)
-                ax.tick_params(colors="#e5e7eb")
-                ax.spines["bottom"].set_color("#475569")
-                ax.spines["left"].set_color("#475569")
-                ax.spines["top"].set_visible(False)
-                ax.spines["right"].set_visible(False)
-                ax.set_xlabel("X", color="#e5e7eb")
-                ax.set_ylabel("Y", color="#e5e7eb")
-                ax.set_xlim(0, tamaño)
-                ax.set_ylim(0, tamaño)
-                ax.set_title(f"Paso de simulación: {paso + 1}", color="#e5e7eb")
-                ax.grid(alpha=0.2, color="#64748b")
-                chart_placeholder.pyplot(fig)
-                plt.close(fig)
-
-                time.sleep(0.1)
-
-            # Calcular métricas finales y avanzadas
-            states_final = modelo_agentes.obtener_estado()
-            num_s = sum(1 for s in states_final if s[2] == 'S')
-            num_i = sum(1 for s in states_final if s[2] == 'I')
-            num_r = sum(1 for s in states_final if s[2] == 'R')
-            total = len(states_final)
-            max_infectados = max(infectados_por_dia)
-            dia_pico = infectados_por_dia.index(max_infectados) + 1
-            porcentaje_max_infectados = 100 * max_infectados / total
-            porcentaje_final_s = 100 * num_s / total
-            porcentaje_final_i = 100 * num_i / total
-            porcentaje_final_r = 100 * num_r / total
-
-            # Mostrar resultados finales y avanzados
-            st.markdown("---")
-            st.markdown("<h3 style='color:#f9fafb; text-align:center;'>Resultados finales</h3>", unsafe_allow_html=True)
+        if iniciar and solo_totales:
+            agregado = obtener_cache().memorizar(
+                'simular_agregado', simular_agregado,
+                dict(num_agentes=num_agentes, tamaño=tamaño, radio_contagio=radio_contagio,
+                     beta=beta, gamma=gamma, dias=dias, piloto=DIAS_PILOTO, semilla=semilla, motor=motor),
+                estocastico=True
+            )
+            texto_beta = f"β efectivo del modelo compartimental: {agregado.beta_efectivo:.3f}"
+            if gamma > 0:
+                texto_beta += f" (R₀ ≈ {agregado.beta_efectivo / gamma:.2f})"
+            st.info(texto_beta)
+            if agregado.divergencia is not None:
+                mensaje = (f"Divergencia frente a {min(DIAS_PILOTO, dias)} días piloto con agentes: "
+                           f"{100 * agregado.divergencia:.1f}% de la población")
+                if agregado.divergencia > UMBRAL_DIVERGENCIA:
+                    st.warning(mensaje + ". La movilidad local hace que la aproximación no sea fiable; use el modelo completo.")
+                else:
+                    st.success(mensaje)
 
             kpi_col1, kpi_col2, kpi_col3 = st.columns(3)
             with kpi_col1:
-                st.markdown(f"""
-                    <div style="background-color:#0f172a; border-radius:0.75rem; border:1px solid #1e293b; padding:1rem; margin:0.5rem; text-align:center; box-shadow:0 4px 6px -1px rgba(0, 0, 0, 0.1);">
-                        <p style="margin:0; font-size:1rem; font-weight:600; color:#e5e7eb;">Susceptibles</p>
-                        <p style="margin:0; font-size:1.8rem; font-weight:700; color:#38bdf8;">{num_s}<br><span style="font-size:1rem;">({porcentaje_final_s:.1f}%)</span></p>
-                    </div>
-                    """, unsafe_allow_html=True)
+                st.metric("Día del pico de infección", int(np.argmax(agregado.I)))
             with kpi_col2:
-                st.markdown(f"""
-                    <div style="background-color:#0f172a; border-radius:0.75rem; border:1px solid #1e293b; padding:1rem; margin:0.5rem; text-align:center; box-shadow:0 4px 6px -1px rgba(0, 0, 0, 0.1);">
-                        <p style="margin:0; font-size:1rem; font-weight:600; color:#e5e7eb;">Infectados</p>
-                        <p style="margin:0; font-size:1.8rem; font-weight:700; color:#f97316;">{num_i}<br><span style="font-size:1rem;">({porcentaje_final_i:.1f}%)</span></p>
-                    </div>
-                    """, unsafe_allow_html=True)
+                st.metric("Número máximo de infectados", int(np.max(agregado.I)))
             with kpi_col3:
-                st.markdown(f"""
-                    <div style="background-color:#0f172a; border-radius:0.75rem; border:1px solid #1e293b; padding:1rem; margin:0.5rem; text-align:center; box-shadow:0 4px 6px -1px rgba(0, 0, 0, 0.1);">
-                        <p style="margin:0; font-size:1rem; font-weight:600; color:#e5e7eb;">Recuperados</p>
-                        <p style="margin:0; font-size:1.8rem; font-weight:700; color:#22c55e;">{num_r}<br><span style="font-size:1rem;">({porcentaje_final_r:.1f}%)</span></p>
-                    </div>
-                    """, unsafe_allow_html=True)
+                st.metric("% Recuperados al final", f"{100 * agregado.R[-1] / num_agentes:.1f}%")
 
-            # Métricas avanzadas
-            st.markdown("### Métricas avanzadas")
-            st.metric("Número máximo de infectados", max_infectados, f"{porcentaje_max_infectados:.1f}%")
-            st.metric("Día del pico de infección", dia_pico)
-            st.markdown("---")
-            kpi_col4, kpi_col5 = st.columns(2)
-            with kpi_col4:
-                st.metric("Días simulados", dias)
-            with kpi_col5:
-                st.metric("Agentes totales", total)
+            curvas = AnimacionCurvas(agregado.t, agregado.S, agregado.I, agregado.R, num_agentes, dias)
+            mostrar_figura(st, curvas.actualizar(len(agregado.t) - 1))
+            curvas.cerrar()
 
+        elif iniciar:
+            gestor = obtener_gestor()
+            anterior = st.session_state.get("trabajo_agentes")
+            if anterior:
+                # Cada sesión sigue una sola corrida: la nueva sustituye a la anterior
+                gestor.cancelar(anterior)
+            trabajo = gestor.enviar(
+                st.session_state.id_sesion, ejecutar_agentes,
+                parametros=dict(
+                    num_agentes=num_agentes, tamaño=tamaño, radio_contagio=radio_contagio,
+                    beta=beta, gamma=gamma, dias=dias, semilla=semilla, cada=cada, motor=motor
+                ),
+                cache=obtener_cache(), directorio=DIRECTORIO_TRAYECTORIAS if guardar else None,
+            )
+            st.session_state.trabajo_agentes = trabajo.id
+            # Con el id en la URL, recargar la página vuelve a conectar con la corrida
+            st.query_params["trabajo"] = trabajo.id
 
+        if not (iniciar and solo_totales):
+            id_trabajo = st.session_state.get("trabajo_agentes") or st.query_params.get("trabajo")
+            trabajo = obtener_gestor().obtener(id_trabajo) if id_trabajo else None
+            if trabajo is not None:
+                st.session_state.trabajo_agentes = trabajo.id
+                seguir_trabajo_agentes(trabajo)
+            elif id_trabajo:
+                st.session_state.pop("trabajo_agentes", None)
+                st.query_params.pop("trabajo", None)
+                st.info("La corrida enlazada ya no está disponible en el servidor.")
+
+
+    elif st.session_state.page == "Reproducción":
+        st.header("Reproducción de corridas guardadas")
+        st.write(
+            "Muestra una corrida del modelo de agentes ya calculada, guardada desde esta aplicación o con "
+            "`python cli.py agentes --trayectoria DIRECTORIO`. Solo se leen del disco los días que se dibujan."
+        )
+
+        guardadas = listar_trayectorias(DIRECTORIO_TRAYECTORIAS)
+        ruta = st.selectbox(
+            "Corrida guardada", guardadas, index=None, format_func=os.path.basename,
+            placeholder="Elige una corrida" if guardadas else f"No hay corridas en {DIRECTORIO_TRAYECTORIAS}/"
+        )
+        ruta_manual = st.text_input("O ruta de un directorio de trayectoria")
+        ruta = ruta_manual.strip() or ruta
+
+        lector = None
+        if ruta:
+            try:
+                lector = abrir_trayectoria(ruta, os.path.getmtime(os.path.join(ruta, "meta.json")))
+            except (OSError, ValueError, KeyError) as error:
+                st.error(f"No se pudo abrir la trayectoria {ruta}: {error}")
+
+        if lector is not None and len(lector) == 0:
+            st.warning("La corrida no contiene posiciones de agentes.")
+        elif lector is not None:
+            parametros = lector.parametros
+            tamaño = parametros.get("tamaño") or float(max(lector[-1].x.max(), lector[-1].y.max()))
+            st.caption(", ".join(f"{k} = {v}" for k, v in parametros.items()))
+
+            pasos = lector.pasos
+            if len(pasos) > 1:
+                dia = st.slider("Día", int(pasos[0]), int(pasos[-1]), int(pasos[0]))
+            else:
+                dia = int(pasos[0])
+            k = lector.indice_de_dia(dia)
+            with st.expander("Opciones de dibujo"):
+                max_puntos = st.number_input(
+                    "Puntos dibujados como máximo", min_value=100, value=MAX_PUNTOS_DISPERSION, step=500,
+                    help="Con más agentes se dibuja una submuestra que conserva la proporción de cada estado."
+                )
+                umbral_densidad = st.number_input(
+                    "Mapa de densidad a partir de (agentes)", min_value=100, value=UMBRAL_DENSIDAD, step=1000,
+                    help="Por encima de este número se dibuja la densidad de cada estado en lugar de puntos."
+                )
+            reproducir = st.button("Reproducir desde este día")
+
+            chart_placeholder = st.empty()
+            animacion_agentes = AnimacionAgentes(tamaño, max_puntos=max_puntos, umbral_densidad=umbral_densidad)
+            if reproducir:
+                # Solo se decodifican los fotogramas que el reloj de la animación llega a mostrar
+                for j in programar_fotogramas(len(lector) - k, FPS_ANIMACION):
+                    mostrar_figura(chart_placeholder, animacion_agentes.actualizar(lector[k + j]))
+                k = len(lector) - 1
+            else:
+                mostrar_figura(chart_placeholder, animacion_agentes.actualizar(lector[k]))
+            animacion_agentes.cerrar()
+
+            conteos = np.asarray(lector.conteos)
+            dia_mostrado = int(pasos[k])
+            num_s, num_i, num_r = (int(c) for c in conteos[dia_mostrado])
+            kpi_col1, kpi_col2, kpi_col3 = st.columns(3)
+            with kpi_col1:
+                st.metric("Susceptibles", num_s)
+            with kpi_col2:
+                st.metric("Infectados", num_i)
+            with kpi_col3:
+                st.metric("Recuperados", num_r)
 
+            curvas = AnimacionCurvas(np.arange(len(conteos)), *conteos.T, lector.num_agentes, len(conteos) - 1)
+            mostrar_figura(st, curvas.actualizar(dia_mostrado))
+            curvas.cerrar()
 
+with hueco_rendimiento.container():
+    panel_rendimiento(st.session_state.perfilador)
@@ -0,0 +1,191 @@
+import datetime
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+
+from modelo_sir import simulate_sir, simulate_sir_batch, SimuladorSIR
+from modelo_agentes import ModeloAgentes
+import nucleo_numba
+
+# Densidad de agentes por unidad de área de la configuración por defecto de
+# la aplicación (100 agentes en 50 x 50); el área escala con N para mantenerla
+DENSIDAD_AGENTES = 0.4
+
+CONFIG_COMPLETA = {
+    'sir_dias': [160, 1000, 10000],
+    'sir_metodos': ['euler', 'rk4', 'rk45'],
+    'lote_escenarios': [100, 10000],
+    'lote_dias': 160,
+    'llamadas_repetidas': 10000,
+    'agentes_n': [1000, 10000, 100000],
+    'agentes_radios': [0.5, 1.0, 2.0],
+    'agentes_dias': [20, 100],
+    'agentes_modos': [
+        ('rejilla', 'sincrona', 'numpy'), ('rejilla', 'secuencial', 'numpy'), ('fuerza_bruta', 'sincrona', 'numpy'),
+        ('rejilla', 'sincrona', 'numba'), ('rejilla', 'secuencial', 'numba'),
+    ],
+}
+
+CONFIG_RAPIDA = {
+    'sir_dias': [160],
+    'sir_metodos': ['euler', 'rk45'],
+    'lote_escenarios': [1000],
+    'lote_dias': 160,
+    'llamadas_repetidas': 1000,
+    'agentes_n': [1000, 10000],
+    'agentes_radios': [1.0],
+    'agentes_dias': [20],
+    'agentes_modos': [('rejilla', 'sincrona', 'numpy'), ('rejilla', 'secuencial', 'numpy'), ('rejilla', 'sincrona', 'numba')],
+}
+
+# La búsqueda por fuerza bruta es O(I·N) por paso: se omite por encima de este tamaño
+MAX_AGENTE_PASOS_FUERZA_BRUTA = 2 * 10**6
+
+
+def _medir(funcion, repeticiones=1):
+    # Mejor tiempo de pared de varias repeticiones y pico de memoria de una ejecución aparte
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    tracemalloc.start()
+    funcion()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(tiempos), pico
+
+
+def _commit_actual():
+    try:
+        salida = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return salida.stdout.strip() or None
+
+
+def metadatos():
+    """Entorno de la ejecución, para comparar resultados entre commits."""
+    return {
+        'fecha': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': _commit_actual(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'plataforma': platform.platform(),
+        'procesador': platform.processor(),
+    }
+
+
+def benchmark_sir(config):
+    """Genera un resultado por caso de simulate_sir, simulate_sir_batch y SimuladorSIR."""
+    for metodo in config['sir_metodos']:
+        for dias in config['sir_dias']:
+            segundos, pico = _medir(lambda: simulate_sir(1000, 1, 0, 0.3, 0.1, dias, metodo=metodo), repeticiones=3)
+            yield {
+                'caso': 'simulate_sir', 'metodo': metodo, 'dias': dias,
+                'segundos': segundos, 'pasos_por_segundo': dias / segundos, 'memoria_pico_bytes': pico,
+            }
+    for escenarios in config['lote_escenarios']:
+        dias = config['lote_dias']
+        betas = np.linspace(0.1, 1.0, escenarios)
+        segundos, pico = _medir(lambda: simulate_sir_batch(1000, 1, 0, betas, 0.1, dias), repeticiones=3)
+        yield {
+            'caso': 'simulate_sir_batch', 'metodo': 'euler', 'dias': dias, 'escenarios': escenarios,
+            'segundos': segundos, 'pasos_por_segundo': dias / segundos,
+            'escenario_pasos_por_segundo': escenarios * dias / segundos, 'memoria_pico_bytes': pico,
+        }
+    # Muchas llamadas pequeñas: asignación de arrays por llamada frente a buffers reutilizados
+    llamadas = config['llamadas_repetidas']
+    simulador = SimuladorSIR(160)
+    for caso, funcion in (
+        ('simulate_sir_repetido', lambda: simulate_sir(1000, 1, 0, 0.3, 0.1, 160)),
+        ('SimuladorSIR_repetido', lambda: simulador.simular(1000, 1, 0, 0.3, 0.1)),
+    ):
+        def ejecutar():
+            for _ in range(llamadas):
+                funcion()
+
+        segundos, pico = _medir(ejecutar)
+        yield {
+            'caso': caso, 'metodo': 'euler', 'dias': 160, 'llamadas': llamadas,
+            'segundos': segundos, 'llamadas_por_segundo': llamadas / segundos, 'memoria_pico_bytes': pico,
+        }
+
+
+def benchmark_agentes(config):
+    """Genera un resultado por combinación de N, radio, días y modo de ModeloAgentes."""
+    # La compilación del núcleo no forma parte de lo que se mide
+    nucleo_numba.precalentar()
+    for n in config['agentes_n']:
+        tamaño = float(np.sqrt(n / DENSIDAD_AGENTES))
+        for radio in config['agentes_radios']:
+            for dias in config['agentes_dias']:
+                for busqueda, actualizacion, motor in config['agentes_modos']:
+                    if busqueda == 'fuerza_bruta' and n * dias > MAX_AGENTE_PASOS_FUERZA_BRUTA:
+                        continue
+                    if motor == 'numba' and not nucleo_numba.DISPONIBLE:
+                        continue
+
+                    def ejecutar():
+                        modelo = ModeloAgentes(n, tamaño, radio, 0.3, 0.1, busqueda=busqueda,
+                                               actualizacion=actualizacion, motor=motor,
+                                               rng=np.random.default_rng(0))
+                        modelo.simular(dias)
+
+                    segundos, pico = _medir(ejecutar)
+                    yield {
+                        'caso': 'ModeloAgentes', 'busqueda': busqueda, 'actualizacion': actualizacion, 'motor': motor,
+                        'num_agentes': n, 'tamaño': tamaño, 'radio_contagio': radio, 'dias': dias,
+                        'segundos': segundos, 'pasos_por_segundo': dias / segundos,
+                        'agente_pasos_por_segundo': n * dias / segundos, 'memoria_pico_bytes': pico,
+                    }
+
+
+def ejecutar_benchmarks(rapido=False, progreso=None):
+    """
+    Ejecuta la batería de benchmarks de ambos simuladores.
+
+    Parámetros:
+    rapido : bool
+        Usa una configuración reducida, apta para comprobar regresiones en
+        cada commit.
+    progreso : callable o None
+        Se llama con cada resultado a medida que se obtiene.
+
+    Retorna:
+    dict
+        'metadatos' del entorno y lista de 'resultados'.
+    """
+    config = CONFIG_RAPIDA if rapido else CONFIG_COMPLETA
+    resultados = []
+    for grupo in (benchmark_sir, benchmark_agentes):
+        for resultado in grupo(config):
+            resultados.append(resultado)
+            if progreso is not None:
+                progreso(resultado)
+    return {'metadatos': metadatos(), 'configuracion': 'rapida' if rapido else 'completa', 'resultados': resultados}
+
+
+def _identidad(resultado):
+    return tuple(sorted((k, v) for k, v in resultado.items()
+                        if k not in ('segundos', 'memoria_pico_bytes') and 'por_segundo' not in k))
+
+
+def comparar(anterior, actual):
+    """
+    Empareja los casos comunes de dos ejecuciones y devuelve la razón de tiempos.
+
+    Retorna:
+    list de (caso, segundos_anterior, segundos_actual, razon)
+        ``razon`` > 1 indica que el caso es ahora más lento.
+    """
+    previos = {_identidad(r): r for r in anterior['resultados']}
+    filas = []
+    for r in actual['resultados']:
+        previo = previos.get(_identidad(r))
+        if previo is not None:
+            filas.append((dict(_identidad(r)), previo['segundos'], r['segundos'], r['segundos'] / previo['segundos']))
+    return filas
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import numbers
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def _normalizar(valor):
+    # Representación canónica: mismos parámetros -> misma clave, sin importar
+    # el tipo numérico concreto (1000, 1000.0, np.int64(1000)...)
+    if isinstance(valor, dict):
+        return {str(k): _normalizar(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple, np.ndarray)):
+        return [_normalizar(v) for v in valor]
+    if isinstance(valor, (bool, np.bool_)):
+        return bool(valor)
+    if isinstance(valor, numbers.Real):
+        return float(valor)
+    return valor
+
+
+def tamaño_en_bytes(valor):
+    """Estimación del tamaño en memoria de un resultado (arrays, tuplas, dicts)."""
+    if isinstance(valor, np.ndarray):
+        return valor.nbytes
+    if isinstance(valor, dict):
+        return sum(tamaño_en_bytes(v) for v in valor.values())
+    if isinstance(valor, (list, tuple)):
+        return sum(tamaño_en_bytes(v) for v in valor)
+    return sys.getsizeof(valor)
+
+
+def _congelar(valor):
+    # Los resultados se comparten entre sesiones: los arrays se guardan de
+    # solo lectura (una copia propia si eran vistas de otro array, que su
+    # dueño podría seguir modificando) para que nadie corrompa la caché
+    if isinstance(valor, np.ndarray):
+        congelado = valor if valor.base is None else valor.copy()
+        congelado.flags.writeable = False
+        return congelado
+    if isinstance(valor, dict):
+        return {k: _congelar(v) for k, v in valor.items()}
+    if isinstance(valor, tuple) and hasattr(valor, '_fields'):
+        return type(valor)(*(_congelar(v) for v in valor))
+    if isinstance(valor, (list, tuple)):
+        return type(valor)(_congelar(v) for v in valor)
+    return valor
+
+
+class CacheSimulaciones:
+    """
+    Caché LRU de resultados de simulación acotada en entradas y en bytes.
+
+    Las claves son un hash canónico del nombre del simulador y de sus
+    parámetros. Es segura entre hilos, así que una única instancia puede
+    compartirse entre todas las sesiones de la aplicación. Los arrays
+    guardados son de solo lectura: quien necesite modificar un resultado
+    debe copiarlo antes.
+    """
+
+    def __init__(self, max_entradas=256, max_bytes=256 * 2**20):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    @staticmethod
+    def clave(nombre, parametros):
+        """Hash SHA-256 del nombre del simulador y sus parámetros canonizados."""
+        texto = json.dumps([nombre, _normalizar(parametros)], sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+    def obtener(self, clave):
+        """Devuelve el resultado guardado o None, y actualiza los contadores."""
+        with self._lock:
+            if clave in self._entradas:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return self._entradas[clave][0]
+            self.fallos += 1
+            return None
+
+    def admite(self, tamaño):
+        """True si un resultado de ``tamaño`` bytes cabe en la caché."""
+        return tamaño <= self.max_bytes
+
+    def guardar(self, clave, valor):
+        """
+        Guarda un resultado y expulsa los menos usados si se superan los límites.
+
+        Retorna el valor con sus arrays ya de solo lectura, que es el que
+        recibirán los siguientes aciertos.
+        """
+        tamaño = tamaño_en_bytes(valor)
+        if not self.admite(tamaño):
+            return valor
+        valor = _congelar(valor)
+        with self._lock:
+            if clave in self._entradas:
+                self._bytes -= self._entradas.pop(clave)[1]
+            self._entradas[clave] = (valor, tamaño)
+            self._bytes += tamaño
+            while len(self._entradas) > self.max_entradas or self._bytes > self.max_bytes:
+                _, (_, liberado) = self._entradas.popitem(last=False)
+                self._bytes -= liberado
+        return valor
+
+    def memorizar(self, nombre, funcion, parametros, estocastico=False):
+        """
+        Devuelve ``funcion(**parametros)`` usando la caché.
+
+        Las simulaciones estocásticas solo se guardan si ``parametros``
+        incluye una ``semilla`` distinta de None; sin semilla cada ejecución
+        es distinta y se calcula siempre.
+        """
+        if estocastico and parametros.get('semilla') is None:
+            return funcion(**parametros)
+        clave = self.clave(nombre, parametros)
+        valor = self.obtener(clave)
+        if valor is None:
+            valor = self.guardar(clave, funcion(**parametros))
+        return valor
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+
+    def estadisticas(self):
+        """Contadores de aciertos y fallos y ocupación actual."""
+        with self._lock:
+            return {
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'entradas': len(self._entradas),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
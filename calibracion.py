@@ -0,0 +1,260 @@
+"""
+Ajuste de beta y gamma del modelo SIR a series observadas.
+
+El ajuste se hace en dos fases:
+
+1. Búsqueda global gruesa: una rejilla de valores de beta y gamma se
+   simula de una vez como lote con SimuladorSIR.
+2. Refinamiento local con Nelder-Mead en escala logarítmica (que mantiene
+   los parámetros positivos) sobre simulaciones escalares que reutilizan
+   buffers.
+
+Los ajustes anteriores se guardan por clave (por ejemplo, la región). Al
+recalibrar una clave conocida se omite la rejilla y Nelder-Mead parte del
+ajuste previo, que en series que cambian poco de un día a otro converge en
+pocas decenas de evaluaciones.
+"""
+import json
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from modelo_sir import SimuladorSIR
+
+# Series observables con las que se puede comparar el modelo
+SERIES = ('I', 'R', 'casos')
+
+ResultadoCalibracion = namedtuple(
+    'ResultadoCalibracion',
+    ['beta', 'gamma', 'error', 'evaluaciones_rejilla', 'evaluaciones_refinamiento', 'segundos', 'desde_cache'],
+)
+ResultadoCalibracion.__doc__ = """
+Resultado del ajuste de una serie.
+
+beta, gamma : float
+    Parámetros ajustados.
+error : float
+    Suma de cuadrados de los residuos dividida por la suma de cuadrados de
+    la serie observada.
+evaluaciones_rejilla, evaluaciones_refinamiento : int
+    Simulaciones hechas en la búsqueda gruesa (0 si se partió de la caché)
+    y en Nelder-Mead.
+segundos : float
+    Tiempo de pared del ajuste.
+desde_cache : bool
+    True si el refinamiento partió de un ajuste anterior.
+"""
+
+
+def _serie_modelo(S, I, R, serie):
+    # Serie comparable con los datos a partir de la salida del simulador;
+    # 'casos' son los contagios nuevos de cada día (0 el día inicial)
+    if serie == 'I':
+        return I
+    if serie == 'R':
+        return R
+    casos = np.zeros_like(S)
+    casos[..., 1:] = S[..., :-1] - S[..., 1:]
+    return casos
+
+
+def nelder_mead(funcion, x0, paso, tolerancia=1e-8, max_evaluaciones=400):
+    """
+    Minimiza ``funcion`` con el método símplex de Nelder-Mead.
+
+    Parámetros:
+    funcion : callable
+        Recibe un array de parámetros y devuelve un float.
+    x0 : array
+        Punto inicial.
+    paso : float o array
+        Desplazamiento de cada vértice inicial respecto a ``x0``.
+    tolerancia : float
+        Se detiene cuando la diferencia de valores entre el mejor y el peor
+        vértice y el tamaño del símplex quedan por debajo de ella.
+    max_evaluaciones : int
+
+    Retorna:
+    x, valor, evaluaciones
+    """
+    x0 = np.asarray(x0, dtype=float)
+    n = x0.size
+    simplex = np.vstack([x0, x0 + np.diag(np.broadcast_to(paso, (n,)))])
+    valores = np.array([funcion(x) for x in simplex])
+    evaluaciones = n + 1
+    while evaluaciones < max_evaluaciones:
+        orden = np.argsort(valores)
+        simplex, valores = simplex[orden], valores[orden]
+        if (valores[-1] - valores[0] <= tolerancia
+                and np.max(np.abs(simplex[1:] - simplex[0])) <= np.sqrt(tolerancia)):
+            break
+        centroide = simplex[:-1].mean(axis=0)
+        reflejado = centroide + (centroide - simplex[-1])
+        f_reflejado = funcion(reflejado)
+        evaluaciones += 1
+        if f_reflejado < valores[0]:
+            expandido = centroide + 2 * (centroide - simplex[-1])
+            f_expandido = funcion(expandido)
+            evaluaciones += 1
+            if f_expandido < f_reflejado:
+                simplex[-1], valores[-1] = expandido, f_expandido
+            else:
+                simplex[-1], valores[-1] = reflejado, f_reflejado
+        elif f_reflejado < valores[-2]:
+            simplex[-1], valores[-1] = reflejado, f_reflejado
+        else:
+            # Contracción hacia el mejor de los dos: el reflejado o el peor vértice
+            if f_reflejado < valores[-1]:
+                contraido = centroide + 0.5 * (reflejado - centroide)
+            else:
+                contraido = centroide + 0.5 * (simplex[-1] - centroide)
+            f_contraido = funcion(contraido)
+            evaluaciones += 1
+            if f_contraido < min(f_reflejado, valores[-1]):
+                simplex[-1], valores[-1] = contraido, f_contraido
+            else:
+                # Encogimiento de todo el símplex hacia el mejor vértice
+                simplex[1:] = simplex[0] + 0.5 * (simplex[1:] - simplex[0])
+                valores[1:] = [funcion(x) for x in simplex[1:]]
+                evaluaciones += n
+    mejor = int(np.argmin(valores))
+    return simplex[mejor], float(valores[mejor]), evaluaciones
+
+
+class CalibradorSIR:
+    """
+    Ajusta beta y gamma de simulate_sir (Euler diario) a series observadas.
+
+    Parámetros:
+    serie : {'I', 'R', 'casos'}
+        Qué se observa: infectados activos, recuperados acumulados o casos
+        nuevos por día.
+    limites_beta, limites_gamma : (float, float)
+        Intervalos de búsqueda; la rejilla es logarítmica dentro de ellos y
+        el refinamiento no sale de ellos.
+    puntos_rejilla : int
+        Valores por parámetro en la búsqueda gruesa (puntos_rejilla² simulaciones).
+    tolerancia, max_evaluaciones :
+        Criterios de parada de Nelder-Mead.
+    ruta_cache : str o None
+        Archivo JSON donde se leen y guardan los ajustes por clave.
+    """
+
+    def __init__(self, serie='I', limites_beta=(0.01, 3.0), limites_gamma=(0.01, 1.0), puntos_rejilla=40,
+                 tolerancia=1e-10, max_evaluaciones=400, ruta_cache=None):
+        if serie not in SERIES:
+            raise ValueError(f"serie debe ser una de {SERIES}, no {serie!r}")
+        self.serie = serie
+        self.limites = np.log([limites_beta, limites_gamma])
+        self.puntos_rejilla = puntos_rejilla
+        self.tolerancia = tolerancia
+        self.max_evaluaciones = max_evaluaciones
+        self.ruta_cache = ruta_cache
+        self.ajustes = {}
+        if ruta_cache and os.path.exists(ruta_cache):
+            with open(ruta_cache, encoding='utf-8') as f:
+                self.ajustes = {clave: tuple(valor) for clave, valor in json.load(f).items()}
+        self._simuladores = {}
+
+    def _simulador(self, dias, escenarios=None):
+        # Los simuladores (y sus buffers) se reutilizan entre series de la misma longitud
+        clave = (dias, escenarios)
+        if clave not in self._simuladores:
+            self._simuladores[clave] = SimuladorSIR(dias, escenarios=escenarios)
+        return self._simuladores[clave]
+
+    def _busqueda_rejilla(self, observado, N, I0, R0, escala):
+        dias = len(observado) - 1
+        m = self.puntos_rejilla
+        log_beta, log_gamma = np.meshgrid(np.linspace(*self.limites[0], m), np.linspace(*self.limites[1], m))
+        log_beta, log_gamma = log_beta.ravel(), log_gamma.ravel()
+        # Euler diario con beta grande puede divergir: esos puntos quedan con error infinito
+        with np.errstate(over='ignore', invalid='ignore'):
+            _, S, I, R = self._simulador(dias, m * m).simular(N, I0, R0, np.exp(log_beta), np.exp(log_gamma))
+            errores = np.sum((_serie_modelo(S, I, R, self.serie) - observado) ** 2, axis=1) / escala
+        errores = np.nan_to_num(errores, nan=np.inf)
+        mejor = int(np.argmin(errores))
+        paso = (self.limites[:, 1] - self.limites[:, 0]) / (m - 1)
+        return np.array([log_beta[mejor], log_gamma[mejor]]), paso, m * m
+
+    def calibrar(self, observado, N, I0=None, R0=0, clave=None):
+        """
+        Ajusta beta y gamma a una serie diaria.
+
+        Parámetros:
+        observado : array (dias + 1,)
+            Serie observada desde el día 0.
+        N : float
+            Población.
+        I0 : float o None
+            Infectados iniciales; por defecto ``observado[0]`` si la serie es 'I'.
+        R0 : float
+            Recuperados iniciales.
+        clave : hashable o None
+            Identificador de la serie (región, etc.). Si ya hay un ajuste
+            con esa clave se usa como punto de partida, y el resultado se
+            guarda con ella.
+
+        Retorna:
+        ResultadoCalibracion
+        """
+        inicio = time.perf_counter()
+        observado = np.asarray(observado, dtype=float)
+        if I0 is None:
+            if self.serie != 'I':
+                raise ValueError("I0 es obligatorio si la serie observada no es 'I'")
+            I0 = observado[0]
+        escala = max(float(np.sum(observado ** 2)), 1e-300)
+        clave_cache = None if clave is None else str(clave)
+
+        previo = self.ajustes.get(clave_cache)
+        if previo is not None:
+            x0 = np.log(previo)
+            paso = np.full(2, 0.05)
+            evaluaciones_rejilla = 0
+        else:
+            x0, paso, evaluaciones_rejilla = self._busqueda_rejilla(observado, N, I0, R0, escala)
+
+        simulador = self._simulador(len(observado) - 1)
+
+        def error(x):
+            x = np.clip(x, self.limites[:, 0], self.limites[:, 1])
+            with np.errstate(over='ignore', invalid='ignore'):
+                _, S, I, R = simulador.simular(N, I0, R0, np.exp(x[0]), np.exp(x[1]))
+                valor = float(np.sum((_serie_modelo(S, I, R, self.serie) - observado) ** 2)) / escala
+            return valor if np.isfinite(valor) else np.inf
+
+        x, valor, evaluaciones = nelder_mead(error, x0, paso, self.tolerancia, self.max_evaluaciones)
+        beta, gamma = np.exp(np.clip(x, self.limites[:, 0], self.limites[:, 1]))
+        if clave_cache is not None:
+            self.ajustes[clave_cache] = (float(beta), float(gamma))
+        return ResultadoCalibracion(float(beta), float(gamma), valor, evaluaciones_rejilla, evaluaciones,
+                                    time.perf_counter() - inicio, previo is not None)
+
+    def calibrar_regiones(self, series, poblaciones, I0=None, R0=0):
+        """
+        Ajusta varias series identificadas por clave.
+
+        Parámetros:
+        series : dict de clave -> array
+        poblaciones : dict de clave -> float, o un float común
+        I0, R0 : dict de clave -> float, un float común o (solo I0) None
+
+        Retorna:
+        dict de clave -> ResultadoCalibracion
+        """
+        def valor(parametro, clave):
+            return parametro[clave] if isinstance(parametro, dict) else parametro
+
+        return {
+            clave: self.calibrar(observado, valor(poblaciones, clave), valor(I0, clave), valor(R0, clave), clave)
+            for clave, observado in series.items()
+        }
+
+    def guardar_cache(self):
+        """Escribe los ajustes conocidos en ``ruta_cache``."""
+        if self.ruta_cache:
+            with open(self.ruta_cache, 'w', encoding='utf-8') as f:
+                json.dump(self.ajustes, f, indent=2)
@@ -0,0 +1,91 @@
+from collections import namedtuple
+
+import numpy as np
+
+from modelo_sir import simulate_sir
+from modelo_agentes import ModeloAgentes
+
+ResultadoAgregado = namedtuple(
+    'ResultadoAgregado',
+    ['t', 'S', 'I', 'R', 'beta_efectivo', 'conteos_piloto', 'divergencia'],
+)
+ResultadoAgregado.__doc__ = """
+Resultado de la aproximación de campo medio del modelo de agentes.
+
+t, S, I, R : array
+    Curvas del modelo SIR compartimental equivalente.
+beta_efectivo : float
+    Tasa de transmisión calibrada para simulate_sir.
+conteos_piloto : array (dias_piloto + 1, 3) o None
+    Totales S, I, R de la corrida piloto con agentes.
+divergencia : float o None
+    Máxima diferencia absoluta entre piloto y campo medio en S, I o R,
+    como fracción de la población.
+"""
+
+
+def area_contacto_media(radio, tamaño):
+    """
+    Área media de la intersección entre el círculo de contagio y el área cuadrada.
+
+    Con el centro uniforme en un cuadrado de lado L y radio r <= L, el área
+    media es pi*r^2 - 8*r^3/(3*L) + r^4/(2*L^2): el círculo completo menos lo
+    que queda fuera cerca de los bordes.
+    """
+    r = min(radio, tamaño)
+    return np.pi * r**2 - 8 * r**3 / (3 * tamaño) + r**4 / (2 * tamaño**2)
+
+
+def beta_efectivo(num_agentes, tamaño, radio_contagio, beta):
+    """
+    Tasa de transmisión del SIR compartimental equivalente al modelo de agentes.
+
+    Con agentes repartidos uniformemente, un infectado dado está dentro del
+    radio de un susceptible con probabilidad p = área_media / tamaño^2, y
+    cada contacto contagia con probabilidad beta. La fuerza de infección
+    sobre un susceptible es beta * p * I, que en la forma beta_ef * I / N
+    del modelo SIR da beta_ef = beta * p * N.
+    """
+    p = area_contacto_media(radio_contagio, tamaño) / tamaño**2
+    return beta * p * num_agentes
+
+
+def simular_agregado(num_agentes, tamaño, radio_contagio, beta, gamma, dias, piloto=10, semilla=None,
+                     **opciones_modelo):
+    """
+    Totales S, I, R del modelo de agentes mediante su aproximación de campo medio.
+
+    Se inicializan los agentes (coste O(N)) solo para obtener las condiciones
+    iniciales, se calibra beta_efectivo y se integra el SIR compartimental.
+    Después se simulan ``piloto`` días con agentes para medir cuánto se
+    aparta la aproximación del modelo completo.
+
+    Parámetros:
+    num_agentes, tamaño, radio_contagio, beta, gamma :
+        Igual que en ModeloAgentes.
+    dias : int
+        Días a simular.
+    piloto : int
+        Días de la corrida piloto con agentes (0 para omitirla).
+    semilla : int o None
+        Semilla del generador de los agentes.
+    opciones_modelo :
+        Argumentos adicionales de ModeloAgentes para la corrida piloto.
+
+    Retorna:
+    ResultadoAgregado
+    """
+    modelo = ModeloAgentes(num_agentes, tamaño, radio_contagio, beta, gamma,
+                           rng=np.random.default_rng(semilla), **opciones_modelo)
+    S0, I0, R0 = (int(c) for c in modelo.contar_estados())
+    beta_ef = beta_efectivo(num_agentes, tamaño, radio_contagio, beta)
+    t, S, I, R = simulate_sir(num_agentes, I0, R0, beta_ef, gamma, dias)
+
+    conteos_piloto = None
+    divergencia = None
+    dias_piloto = min(piloto, dias)
+    if dias_piloto > 0:
+        conteos_piloto = modelo.simular(dias_piloto)
+        curvas = np.stack([S, I, R], axis=1)[:dias_piloto + 1]
+        divergencia = float(np.max(np.abs(conteos_piloto - curvas)) / num_agentes)
+    return ResultadoAgregado(t, S, I, R, beta_ef, conteos_piloto, divergencia)
@@ -0,0 +1,338 @@
+"""
+Punto de entrada de línea de órdenes para ejecutar los simuladores sin interfaz.
+
+Ejemplos:
+    python cli.py sir --N 1000 --I0 1 --beta 0.3 --gamma 0.1 --dias 160 --salida sir.csv
+    python cli.py sir --escenario confinamiento.json   # {"intervenciones": {"confinamientos": [[30, 60, 0.4]]}}
+    python cli.py agentes --escenario escenario.json --semilla 7 --salida agentes.npz
+    python cli.py agentes --num-agentes 100000 --tamaño 500 --trayectoria corrida/ --comprimir zstd
+    python cli.py agentes --num-agentes 1000000 --red watts_strogatz --grado-medio 10
+    python cli.py bench --rapido --salida bench.json --comparar bench_anterior.json
+    python cli.py agentes --num-agentes 20000 --tamaño 200 --perfil perfil.json
+    python cli.py calibrar --datos regiones.csv --poblaciones poblaciones.json --cache ajustes.json
+"""
+import argparse
+import csv
+import json
+import sys
+
+import numpy as np
+
+from modelo_sir import simulate_sir, METODOS, CriterioParada
+from modelo_agentes import ModeloAgentes
+from modelo_paralelo import ModeloAgentesParalelo
+from campo_medio import simular_agregado
+from trayectorias import grabar_trayectoria, COMPRESIONES
+from calibracion import CalibradorSIR, SERIES
+from intervenciones import Intervenciones
+from instrumentacion import perfilando
+from redes import erdos_renyi, watts_strogatz
+import benchmark
+
+# Valores por defecto, iguales a los de la aplicación
+DEFECTOS_PARADA = {'umbral_infectados': None, 'epsilon_parada': None, 'ventana_parada': 7}
+DEFECTOS_SIR = {
+    'N': 1000, 'I0': 1, 'R0': 0, 'beta': 0.3, 'gamma': 0.1, 'dias': 160, 'metodo': 'euler', **DEFECTOS_PARADA,
+    'intervenciones': None,
+}
+DEFECTOS_AGENTES = {
+    'num_agentes': 100, 'tamaño': 50.0, 'radio_contagio': 1.0, 'beta': 0.3, 'gamma': 0.1, 'dias': 100,
+    'semilla': None, 'busqueda': 'rejilla', 'actualizacion': None, 'motor': 'numpy',
+    'agregado': False, 'piloto': 10, 'trabajadores': None, 'red': None, 'grado_medio': 10, 'reconexion': 0.1,
+    **DEFECTOS_PARADA, 'intervenciones': None,
+}
+
+
+def _parametros(args, defectos):
+    # Prioridad: valores por defecto < archivo de escenario < opciones explícitas
+    parametros = dict(defectos)
+    if args.escenario:
+        with open(args.escenario, encoding='utf-8') as f:
+            escenario = json.load(f)
+        desconocidos = set(escenario) - set(defectos)
+        if desconocidos:
+            raise SystemExit(f"Parámetros desconocidos en {args.escenario}: {', '.join(sorted(desconocidos))}")
+        parametros.update(escenario)
+    for clave in defectos:
+        valor = getattr(args, clave, None)
+        if valor is not None:
+            parametros[clave] = valor
+    return parametros
+
+
+def _criterio_parada(p):
+    # Sin umbral ni epsilon no hay parada anticipada (ni siquiera por extinción)
+    if p['umbral_infectados'] is None and p['epsilon_parada'] is None:
+        return None
+    return CriterioParada(p['umbral_infectados'], p['epsilon_parada'], p['ventana_parada'])
+
+
+def _intervenciones(p):
+    # En el escenario JSON: {"beta": [[dia, valor], ...], "vacunacion": tasa o
+    # [[dia, tasa], ...], "confinamientos": [[inicio, fin, factor], ...]}
+    if not p['intervenciones']:
+        return None
+    try:
+        return Intervenciones(**p['intervenciones'])
+    except TypeError as error:
+        raise SystemExit(f"Intervenciones no válidas: {error}")
+
+
+def _informar_parada(parada):
+    if parada.motivo != 'horizonte':
+        print(f"Parada anticipada el día {parada.dia}: {parada.motivo}")
+
+
+def guardar_resultados(ruta, columnas, parametros):
+    """
+    Escribe series diarias en CSV, NPZ o JSON según la extensión de ``ruta``.
+
+    columnas : dict de nombre -> array, todas de la misma longitud.
+    """
+    if ruta.endswith('.npz'):
+        np.savez_compressed(ruta, **columnas, parametros=json.dumps(parametros))
+    elif ruta.endswith('.json'):
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump({'parametros': parametros, **{k: np.asarray(v).tolist() for k, v in columnas.items()}}, f)
+    else:
+        with open(ruta, 'w', newline='', encoding='utf-8') as f:
+            escritor = csv.writer(f)
+            escritor.writerow(list(columnas))
+            escritor.writerows(zip(*(np.asarray(v).tolist() for v in columnas.values())))
+
+
+def _resumen(S, I, R):
+    pico = int(np.argmax(I))
+    return f"Día pico: {pico}, máximo infectados: {I[pico]:.1f}, final S/I/R: {S[-1]:.1f}/{I[-1]:.1f}/{R[-1]:.1f}"
+
+
+def orden_sir(args):
+    p = _parametros(args, DEFECTOS_SIR)
+    criterio = _criterio_parada(p)
+    intervenciones = _intervenciones(p)
+    if criterio is not None and intervenciones is not None:
+        raise SystemExit("La parada anticipada no admite intervenciones")
+    resultado = simulate_sir(p['N'], p['I0'], p['R0'], p['beta'], p['gamma'], p['dias'], metodo=p['metodo'],
+                             parada=criterio, intervenciones=intervenciones)
+    t, S, I, R = resultado[:4]
+    if args.salida:
+        guardar_resultados(args.salida, {'dia': t, 'S': S, 'I': I, 'R': R}, p)
+    print(_resumen(S, I, R))
+    if criterio is not None:
+        _informar_parada(resultado[4])
+
+
+def orden_agentes(args):
+    p = _parametros(args, DEFECTOS_AGENTES)
+    criterio = _criterio_parada(p)
+    if args.trayectoria and (p['agregado'] or p['trabajadores']):
+        raise SystemExit("--trayectoria solo está disponible con el modelo de agentes de un proceso")
+    if criterio is not None and (p['agregado'] or p['trabajadores'] or args.trayectoria):
+        raise SystemExit("La parada anticipada solo está disponible con el modelo de agentes de un proceso "
+                         "y sin --trayectoria")
+    intervenciones = _intervenciones(p)
+    if p['red'] and (p['agregado'] or p['trabajadores']):
+        raise SystemExit("--red solo está disponible con el modelo de agentes de un proceso")
+    if intervenciones is not None and (p['agregado'] or p['trabajadores'] or criterio is not None):
+        raise SystemExit("Las intervenciones solo están disponibles con el modelo de agentes de un proceso "
+                         "y sin parada anticipada")
+    if p['agregado']:
+        orden_agentes_agregado(p, args.salida)
+        return
+    if p['trabajadores']:
+        modelo = ModeloAgentesParalelo(p['num_agentes'], p['tamaño'], p['radio_contagio'], p['beta'], p['gamma'],
+                                       trabajadores=p['trabajadores'], semilla=p['semilla'])
+    else:
+        rng = np.random.default_rng(p['semilla']) if p['semilla'] is not None else None
+        red = None
+        if p['red'] == 'erdos_renyi':
+            red = erdos_renyi(p['num_agentes'], p['grado_medio'], p['semilla'])
+        elif p['red'] == 'watts_strogatz':
+            red = watts_strogatz(p['num_agentes'], p['grado_medio'], p['reconexion'], p['semilla'])
+        modelo = ModeloAgentes(p['num_agentes'], p['tamaño'], p['radio_contagio'], p['beta'], p['gamma'],
+                               busqueda=p['busqueda'], actualizacion=p['actualizacion'], motor=p['motor'], rng=rng,
+                               red=red, intervenciones=intervenciones)
+    if args.trayectoria:
+        conteos = grabar_trayectoria(modelo, p['dias'], args.trayectoria, cada=args.cada, parametros=p,
+                                     formato='arrow' if args.comprimir else 'crudo', compresion=args.comprimir)
+    elif criterio is not None:
+        conteos, parada = modelo.simular(p['dias'], parada=criterio)
+    else:
+        conteos = modelo.simular(p['dias'])
+    S, I, R = conteos.T
+    if args.salida:
+        guardar_resultados(args.salida, {'dia': np.arange(len(conteos)), 'S': S, 'I': I, 'R': R}, p)
+    print(_resumen(S, I, R))
+    if criterio is not None:
+        _informar_parada(parada)
+
+
+def orden_agentes_agregado(p, salida):
+    resultado = simular_agregado(p['num_agentes'], p['tamaño'], p['radio_contagio'], p['beta'], p['gamma'],
+                                 p['dias'], piloto=p['piloto'], semilla=p['semilla'],
+                                 busqueda=p['busqueda'], actualizacion=p['actualizacion'], motor=p['motor'])
+    if salida:
+        guardar_resultados(salida, {'dia': resultado.t, 'S': resultado.S, 'I': resultado.I, 'R': resultado.R},
+                           {**p, 'beta_efectivo': resultado.beta_efectivo, 'divergencia': resultado.divergencia})
+    print(_resumen(resultado.S, resultado.I, resultado.R))
+    print(f"Beta efectivo: {resultado.beta_efectivo:.4f}")
+    if resultado.divergencia is not None:
+        print(f"Divergencia frente a {min(p['piloto'], p['dias'])} días piloto con agentes: "
+              f"{100 * resultado.divergencia:.1f}% de la población")
+
+
+def orden_bench(args):
+    def progreso(r):
+        descripcion = ', '.join(f"{k}={v}" for k, v in r.items()
+                                if k not in ('segundos', 'memoria_pico_bytes') and 'por_segundo' not in k)
+        print(f"{r['segundos']:9.4f} s  {r['memoria_pico_bytes'] / 2**20:8.1f} MiB  {descripcion}", file=sys.stderr)
+
+    informe = benchmark.ejecutar_benchmarks(rapido=args.rapido, progreso=progreso)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(informe, f, indent=2)
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            anterior = json.load(f)
+        for caso, previo, actual, razon in benchmark.comparar(anterior, informe):
+            marca = '  <-- más lento' if razon > 1.1 else ''
+            print(f"{razon:6.2f}x  {previo:9.4f} s -> {actual:9.4f} s  {caso}{marca}")
+
+
+def leer_series(ruta):
+    """
+    Lee un CSV con una columna por serie (cabecera con su clave) y una fila por día.
+
+    Retorna:
+    dict de clave -> array
+    """
+    with open(ruta, newline='', encoding='utf-8') as f:
+        filas = list(csv.reader(f))
+    claves, datos = filas[0], np.array(filas[1:], dtype=float)
+    return {clave: datos[:, k] for k, clave in enumerate(claves)}
+
+
+def orden_calibrar(args):
+    series = leer_series(args.datos)
+    if args.poblaciones:
+        with open(args.poblaciones, encoding='utf-8') as f:
+            poblaciones = json.load(f)
+        faltan = set(series) - set(poblaciones)
+        if faltan:
+            raise SystemExit(f"Faltan poblaciones para: {', '.join(sorted(faltan))}")
+    elif args.N:
+        poblaciones = args.N
+    else:
+        raise SystemExit("Indique --N o --poblaciones")
+
+    calibrador = CalibradorSIR(serie=args.serie, ruta_cache=args.cache)
+    resultados = calibrador.calibrar_regiones(series, poblaciones, I0=args.I0)
+    calibrador.guardar_cache()
+    for clave, r in resultados.items():
+        print(f"{clave}: beta={r.beta:.4f} gamma={r.gamma:.4f} error={r.error:.2e} "
+              f"evaluaciones={r.evaluaciones_rejilla}+{r.evaluaciones_refinamiento} {r.segundos:.3f} s"
+              f"{' (desde caché)' if r.desde_cache else ''}")
+    total = sum(r.segundos for r in resultados.values())
+    evaluaciones = sum(r.evaluaciones_rejilla + r.evaluaciones_refinamiento for r in resultados.values())
+    print(f"{len(resultados)} series en {total:.2f} s, {evaluaciones} simulaciones", file=sys.stderr)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump({clave: r._asdict() for clave, r in resultados.items()}, f, indent=2)
+
+
+def _opciones_parada(parser):
+    parser.add_argument('--umbral-infectados', dest='umbral_infectados', type=float,
+                        help="Detiene la simulación cuando los infectados bajan de este valor y no crecen")
+    parser.add_argument('--epsilon-parada', dest='epsilon_parada', type=float,
+                        help="Detiene la simulación cuando ningún compartimento cambia más de epsilon·N "
+                             "en --ventana-parada días")
+    parser.add_argument('--ventana-parada', dest='ventana_parada', type=int, help="Días de la ventana (7)")
+
+
+def _opcion_perfil(parser):
+    parser.add_argument('--perfil', help="Archivo JSON con el tiempo y la memoria asignada de cada fase")
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(description="Simulador epidemiológico SIR sin interfaz gráfica")
+    sub = parser.add_subparsers(dest='orden', required=True)
+
+    sir = sub.add_parser('sir', help="Modelo SIR determinista")
+    sir.add_argument('--escenario', help="Archivo JSON con los parámetros")
+    sir.add_argument('--N', type=float, help="Población total")
+    sir.add_argument('--I0', type=float, help="Infectados iniciales")
+    sir.add_argument('--R0', type=float, help="Recuperados iniciales")
+    sir.add_argument('--beta', type=float, help="Tasa de transmisión")
+    sir.add_argument('--gamma', type=float, help="Tasa de recuperación")
+    sir.add_argument('--dias', type=int, help="Días a simular")
+    sir.add_argument('--metodo', choices=METODOS, help="Integrador")
+    _opciones_parada(sir)
+    sir.add_argument('--salida', help="Archivo de resultados (.csv, .npz o .json)")
+    _opcion_perfil(sir)
+    sir.set_defaults(funcion=orden_sir)
+
+    agentes = sub.add_parser('agentes', help="Modelo basado en agentes")
+    agentes.add_argument('--escenario', help="Archivo JSON con los parámetros")
+    agentes.add_argument('--num-agentes', dest='num_agentes', type=int, help="Número de agentes")
+    agentes.add_argument('--tamaño', '--tamano', dest='tamaño', type=float, help="Lado del área")
+    agentes.add_argument('--radio', dest='radio_contagio', type=float, help="Radio de contagio")
+    agentes.add_argument('--beta', type=float, help="Probabilidad de contagio por contacto y día")
+    agentes.add_argument('--gamma', type=float, help="Probabilidad de recuperación por día")
+    agentes.add_argument('--dias', type=int, help="Días a simular")
+    agentes.add_argument('--semilla', type=int, help="Semilla del generador aleatorio")
+    agentes.add_argument('--busqueda', choices=ModeloAgentes.BUSQUEDAS, help="Búsqueda de contactos")
+    agentes.add_argument('--actualizacion', choices=ModeloAgentes.ACTUALIZACIONES,
+                         help="Semántica del contagio (por defecto secuencial; sincrona con --red)")
+    agentes.add_argument('--motor', choices=ModeloAgentes.MOTORES,
+                         help="Motor de cálculo del paso diario (numba si está instalado)")
+    agentes.add_argument('--agregado', action='store_true', default=None,
+                         help="Solo totales: aproximación de campo medio con modelo_sir")
+    agentes.add_argument('--piloto', type=int, help="Días de la corrida piloto con agentes en modo --agregado")
+    agentes.add_argument('--trabajadores', type=int,
+                         help="Procesos con descomposición de dominio (contagio síncrono, motor NumPy)")
+    agentes.add_argument('--red', choices=('erdos_renyi', 'watts_strogatz'),
+                         help="Contagio por una red de contactos aleatoria en lugar de por distancia")
+    agentes.add_argument('--grado-medio', dest='grado_medio', type=int, help="Contactos medios por agente en --red")
+    agentes.add_argument('--reconexion', type=float, help="Probabilidad de reconexión de watts_strogatz")
+    _opciones_parada(agentes)
+    agentes.add_argument('--salida', help="Archivo de resultados (.csv, .npz o .json)")
+    agentes.add_argument('--trayectoria', help="Directorio donde guardar posiciones y estados para reproducirlos")
+    agentes.add_argument('--cada', type=int, default=1, help="Días entre fotogramas guardados en --trayectoria")
+    agentes.add_argument('--comprimir', choices=[c for c in COMPRESIONES if c],
+                         help="Guarda la trayectoria en Arrow comprimido en lugar de binario crudo")
+    _opcion_perfil(agentes)
+    agentes.set_defaults(funcion=orden_agentes)
+
+    bench = sub.add_parser('bench', help="Batería de benchmarks")
+    bench.add_argument('--rapido', action='store_true', help="Configuración reducida")
+    bench.add_argument('--salida', help="Archivo JSON de resultados")
+    bench.add_argument('--comparar', help="JSON de una ejecución anterior con el que comparar")
+    bench.set_defaults(funcion=orden_bench)
+
+    calibrar = sub.add_parser('calibrar', help="Ajuste de beta y gamma a series observadas")
+    calibrar.add_argument('--datos', required=True, help="CSV con una columna por región y una fila por día")
+    calibrar.add_argument('--serie', choices=SERIES, default='I',
+                          help="Qué contienen los datos: infectados activos, recuperados o casos nuevos")
+    calibrar.add_argument('--N', type=float, help="Población común a todas las regiones")
+    calibrar.add_argument('--poblaciones', help="JSON con la población de cada región")
+    calibrar.add_argument('--I0', type=float, help="Infectados iniciales (por defecto el primer dato de 'I')")
+    calibrar.add_argument('--cache', help="JSON de ajustes anteriores para partir de ellos y actualizarlos")
+    calibrar.add_argument('--salida', help="Archivo JSON de resultados")
+    _opcion_perfil(calibrar)
+    calibrar.set_defaults(funcion=orden_calibrar)
+    return parser
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    if not getattr(args, 'perfil', None):
+        args.funcion(args)
+        return
+    with perfilando() as perfilador:
+        args.funcion(args)
+    perfilador.exportar(args.perfil)
+    print(f"Perfil escrito en {args.perfil}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
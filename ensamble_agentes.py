@@ -0,0 +1,106 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+from modelo_agentes import ModeloAgentes
+
+ResultadoEnsamble = namedtuple(
+    'ResultadoEnsamble',
+    ['conteos', 'media', 'niveles', 'cuantiles', 'dia_pico', 'pico_infectados'],
+)
+ResultadoEnsamble.__doc__ = """
+Resumen de un ensamble de réplicas del modelo de agentes.
+
+conteos : array (replicas, dias + 1, 3)
+    Agentes S, I y R por réplica y día.
+media : array (dias + 1, 3)
+    Media de los conteos entre réplicas.
+niveles : tuple de float
+    Niveles de los cuantiles calculados.
+cuantiles : array (len(niveles), dias + 1, 3)
+    Bandas de cuantiles por día y estado.
+dia_pico : array (replicas,)
+    Día del máximo de infectados en cada réplica.
+pico_infectados : array (replicas,)
+    Máximo de infectados en cada réplica.
+"""
+
+
+def _ejecutar_replica(parametros, dias, semilla):
+    # Cada réplica tiene su propio Generator; solo devuelve los totales diarios
+    rng = np.random.default_rng(semilla)
+    modelo = ModeloAgentes(**parametros, rng=rng)
+    return modelo.simular(dias).astype(np.int32)
+
+
+def resumir_ensamble(conteos, niveles=(0.05, 0.5, 0.95)):
+    """
+    Agrega los conteos de un ensamble en media, cuantiles y distribución del pico.
+
+    Parámetros:
+    conteos : array (replicas, dias + 1, 3)
+        Agentes S, I y R por réplica y día.
+    niveles : tuple de float
+        Niveles de los cuantiles a calcular.
+
+    Retorna:
+    ResultadoEnsamble
+    """
+    conteos = np.asarray(conteos)
+    infectados = conteos[:, :, 1]
+    return ResultadoEnsamble(
+        conteos=conteos,
+        media=conteos.mean(axis=0),
+        niveles=tuple(niveles),
+        cuantiles=np.quantile(conteos, niveles, axis=0),
+        dia_pico=np.argmax(infectados, axis=1),
+        pico_infectados=infectados.max(axis=1),
+    )
+
+
+def ejecutar_ensamble(num_agentes, tamaño, radio_contagio, beta, gamma, dias, replicas=200,
+                      semilla=None, procesos=None, niveles=(0.05, 0.5, 0.95), **opciones_modelo):
+    """
+    Ejecuta réplicas independientes del modelo de agentes en un pool de procesos.
+
+    Cada réplica recibe una semilla hija de ``SeedSequence(semilla).spawn``,
+    de modo que el ensamble completo es reproducible a partir de la semilla
+    maestra sin importar cuántos procesos lo ejecuten ni en qué orden.
+
+    Parámetros:
+    num_agentes, tamaño, radio_contagio, beta, gamma :
+        Igual que en ModeloAgentes.
+    dias : int
+        Días simulados por réplica.
+    replicas : int
+        Número de réplicas.
+    semilla : int o None
+        Semilla maestra. Con None cada ejecución es distinta.
+    procesos : int o None
+        Procesos del pool (por defecto, todos los núcleos). Con 1 las
+        réplicas se ejecutan en el proceso actual.
+    niveles : tuple de float
+        Niveles de los cuantiles a calcular.
+    opciones_modelo :
+        Argumentos adicionales de ModeloAgentes (busqueda, actualizacion...).
+
+    Retorna:
+    ResultadoEnsamble
+    """
+    parametros = dict(
+        num_agentes=num_agentes, tamaño=tamaño, radio_contagio=radio_contagio,
+        beta=beta, gamma=gamma, **opciones_modelo,
+    )
+    semillas = np.random.SeedSequence(semilla).spawn(replicas)
+    procesos = procesos or os.cpu_count() or 1
+    if procesos == 1:
+        conteos = [_ejecutar_replica(parametros, dias, s) for s in semillas]
+    else:
+        # Lotes grandes amortizan el envío de tareas; varios por proceso equilibran la carga
+        lote = max(1, replicas // (4 * procesos))
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            conteos = list(pool.map(_ejecutar_replica, repeat(parametros), repeat(dias), semillas, chunksize=lote))
+    return resumir_ensamble(np.stack(conteos), niveles)
@@ -0,0 +1,237 @@
+"""
+Instrumentación opcional de las fases calientes de las simulaciones.
+
+El código de los simuladores marca sus fases con ``with fase('nombre'):``.
+Sin un Perfilador activo, ``fase`` devuelve siempre el mismo contexto nulo
+compartido y el coste es una consulta a una ContextVar. Dentro de
+``with perfilando() as perfilador:`` cada fase registra su tiempo de pared
+y la memoria que asigna, medida con ``tracemalloc`` (que también ve los
+buffers de datos de NumPy): los bytes netos que deja asignados al terminar
+y el pico de bytes por encima del inicio de la fase, que incluye lo que se
+asigna y se libera dentro de ella. ``tracemalloc`` solo está en marcha
+mientras algún Perfilador traza, porque encarece cada asignación. Sus
+cuentas son del proceso entero: con otras sesiones o hilos asignando a la
+vez, la memoria de una fase incluye también la suya.
+
+Las duraciones se acumulan en un histograma logarítmico de tamaño fijo,
+así que el perfilador ocupa lo mismo tras diez pasos que tras un millón.
+
+El perfilador activo es propio del hilo (y de la tarea asyncio): cada
+sesión de la aplicación y cada trabajador en segundo plano mide por
+separado.
+"""
+import contextvars
+import json
+import math
+import threading
+import time
+import tracemalloc
+import weakref
+from bisect import bisect_right
+from contextlib import contextmanager, nullcontext
+
+# Bordes de los cubos del histograma de duraciones en segundos: cuatro cubos
+# por década entre 1 µs y 100 s, más un cubo por debajo y otro por encima
+BORDES_HISTOGRAMA = tuple(10.0 ** (k / 4) for k in range(-24, 9))
+
+_NULO = nullcontext()
+_ACTIVO = contextvars.ContextVar('perfilador_activo', default=None)
+# Fase abierta más interna del contexto, para propagar picos de memoria
+_ABIERTA = contextvars.ContextVar('fase_abierta', default=None)
+
+# Perfiladores que están trazando; tracemalloc se detiene cuando no queda
+# ninguno, salvo que ya estuviera en marcha antes del primero
+_TRAZADORES = weakref.WeakSet()
+_CERROJO_TRAZADO = threading.Lock()
+_TRAZADO_PROPIO = False
+
+
+class EstadisticaFase:
+    """Acumulado de las mediciones de una fase."""
+
+    def __init__(self):
+        self.llamadas = 0
+        self.total = 0.0
+        self.minimo = math.inf
+        self.maximo = 0.0
+        self.bytes_netos = 0
+        self.pico_bytes_max = 0
+        self.pico_bytes_total = 0
+        self.histograma = [0] * (len(BORDES_HISTOGRAMA) + 1)
+
+    def registrar(self, duracion, bytes_netos, pico_bytes):
+        self.llamadas += 1
+        self.total += duracion
+        self.minimo = min(self.minimo, duracion)
+        self.maximo = max(self.maximo, duracion)
+        self.bytes_netos += bytes_netos
+        self.pico_bytes_max = max(self.pico_bytes_max, pico_bytes)
+        self.pico_bytes_total += pico_bytes
+        self.histograma[bisect_right(BORDES_HISTOGRAMA, duracion)] += 1
+
+    def cuantil(self, q):
+        """Cuantil aproximado: borde superior del cubo que lo contiene (acotado por el máximo)."""
+        if not self.llamadas:
+            return 0.0
+        objetivo = q * self.llamadas
+        acumulado = 0
+        for k, cuenta in enumerate(self.histograma):
+            acumulado += cuenta
+            if acumulado >= objetivo and cuenta:
+                superior = BORDES_HISTOGRAMA[k] if k < len(BORDES_HISTOGRAMA) else self.maximo
+                return min(superior, self.maximo)
+        return self.maximo
+
+    def resumen(self):
+        """Diccionario serializable con totales, cuantiles e histograma."""
+        return {
+            'llamadas': self.llamadas,
+            'total_s': self.total,
+            'media_s': self.total / self.llamadas if self.llamadas else 0.0,
+            'minimo_s': self.minimo if self.llamadas else 0.0,
+            'maximo_s': self.maximo,
+            'p50_s': self.cuantil(0.5),
+            'p95_s': self.cuantil(0.95),
+            'bytes_netos': self.bytes_netos,
+            'bytes_netos_por_llamada': self.bytes_netos / self.llamadas if self.llamadas else 0.0,
+            'pico_bytes_max': self.pico_bytes_max,
+            'pico_bytes_medio': self.pico_bytes_total / self.llamadas if self.llamadas else 0.0,
+            'histograma': list(self.histograma),
+        }
+
+
+class _Medicion:
+    __slots__ = ('estadistica', 'inicio', 'memoria', 'pico', 'token')
+
+    def __init__(self, estadistica):
+        self.estadistica = estadistica
+
+    def __enter__(self):
+        # reset_peak es global: antes de reiniciarlo se pasa el pico visto
+        # hasta ahora a la fase que contiene a esta, si la hay
+        self.memoria, pico = tracemalloc.get_traced_memory()
+        padre = _ABIERTA.get()
+        if padre is not None:
+            padre.pico = max(padre.pico, pico)
+        tracemalloc.reset_peak()
+        self.pico = self.memoria
+        self.token = _ABIERTA.set(self)
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duracion = time.perf_counter() - self.inicio
+        memoria, pico = tracemalloc.get_traced_memory()
+        self.pico = max(self.pico, pico)
+        _ABIERTA.reset(self.token)
+        padre = _ABIERTA.get()
+        if padre is not None:
+            padre.pico = max(padre.pico, self.pico)
+        self.estadistica.registrar(duracion, memoria - self.memoria, self.pico - self.memoria)
+
+
+def _iniciar_trazado(perfilador):
+    global _TRAZADO_PROPIO
+    with _CERROJO_TRAZADO:
+        if not _TRAZADORES and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _TRAZADO_PROPIO = True
+        _TRAZADORES.add(perfilador)
+
+
+def _detener_trazado(perfilador):
+    global _TRAZADO_PROPIO
+    with _CERROJO_TRAZADO:
+        _TRAZADORES.discard(perfilador)
+        if not _TRAZADORES and _TRAZADO_PROPIO:
+            tracemalloc.stop()
+            _TRAZADO_PROPIO = False
+
+
+class Perfilador:
+    """
+    Recoge mediciones por fase mientras está activo (ver ``perfilando``).
+
+    ``fases`` es un dict de nombre -> EstadisticaFase en orden de primera
+    aparición. Los nombres llevan como prefijo el componente medido
+    ('agentes.', 'sir.', 'dibujo.').
+
+    ``tracemalloc`` se pone en marcha al activarlo y se detiene con
+    ``detener`` (``perfilando`` lo hace al salir del bloque). Si se mide
+    una fase sin trazado, su memoria cuenta como 0.
+
+    Un hilo de fondo puede seguir registrando fases mientras otro pide el
+    resumen: las fases nuevas se crean bajo un cerrojo y ``resumen`` trabaja
+    sobre una copia de la lista de fases.
+    """
+
+    def __init__(self):
+        self.fases = {}
+        self._cerrojo = threading.Lock()
+
+    def fase(self, nombre):
+        estadistica = self.fases.get(nombre)
+        if estadistica is None:
+            with self._cerrojo:
+                estadistica = self.fases.setdefault(nombre, EstadisticaFase())
+        return _Medicion(estadistica)
+
+    def resumen(self):
+        """dict de nombre de fase -> resumen de EstadisticaFase."""
+        with self._cerrojo:
+            fases = list(self.fases.items())
+        return {nombre: estadistica.resumen() for nombre, estadistica in fases}
+
+    def a_json(self):
+        return json.dumps({'bordes_histograma_s': BORDES_HISTOGRAMA, 'fases': self.resumen()}, indent=2)
+
+    def exportar(self, ruta):
+        """Escribe el resumen y los bordes del histograma en un archivo JSON."""
+        with open(ruta, 'w', encoding='utf-8') as f:
+            f.write(self.a_json())
+
+    def limpiar(self):
+        with self._cerrojo:
+            self.fases.clear()
+
+    def detener(self):
+        """Deja de trazar memoria para este perfilador; las mediciones se conservan."""
+        _detener_trazado(self)
+
+
+def fase(nombre):
+    """Contexto que mide la fase ``nombre`` si hay un Perfilador activo."""
+    perfilador = _ACTIVO.get()
+    return _NULO if perfilador is None else perfilador.fase(nombre)
+
+
+def activar(perfilador):
+    """
+    Deja ``perfilador`` (o None para ninguno) como activo en el contexto
+    actual sin bloque ``with``; útil en scripts que se reejecutan de
+    principio a fin, como la aplicación de Streamlit. Activarlo pone en
+    marcha el trazado de memoria, que sigue hasta ``perfilador.detener()``.
+    """
+    if perfilador is not None:
+        _iniciar_trazado(perfilador)
+    _ACTIVO.set(perfilador)
+
+
+@contextmanager
+def perfilando(perfilador=None):
+    """
+    Activa un Perfilador (uno nuevo si no se indica) dentro del bloque.
+
+    Ejemplo:
+        with perfilando() as perfilador:
+            modelo.simular(100)
+        perfilador.exportar('perfil.json')
+    """
+    perfilador = Perfilador() if perfilador is None else perfilador
+    _iniciar_trazado(perfilador)
+    token = _ACTIVO.set(perfilador)
+    try:
+        yield perfilador
+    finally:
+        _ACTIVO.reset(token)
+        perfilador.detener()
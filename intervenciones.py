@@ -0,0 +1,137 @@
+"""
+Calendarios de intervenciones: beta por tramos, vacunación y confinamientos.
+
+Una Intervenciones describe los cambios por días; compilar_intervenciones
+la convierte una sola vez en un Calendario con un valor de beta y de tasa de
+vacunación por día. Los simuladores solo indexan esos arrays en su bucle
+temporal, así que un lote de escenarios con intervenciones distintas se
+integra igual de vectorizado que un lote con parámetros constantes.
+
+El valor del día d rige en el intervalo [d, d + 1) y en todos sus subpasos.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+Intervenciones = namedtuple('Intervenciones', ['beta', 'vacunacion', 'confinamientos'],
+                            defaults=((), 0.0, ()))
+Intervenciones.__doc__ = """
+Cambios de parámetros a lo largo de una simulación.
+
+beta : secuencia de (dia, valor)
+    Beta por tramos: desde ``dia`` la tasa de transmisión pasa a ser
+    ``valor``. Antes del primer tramo se usa el beta del simulador.
+vacunacion : float o secuencia de (dia, tasa)
+    Fracción de los susceptibles que se vacunan (pasan a R) por día; una
+    constante desde el día 0 o una tasa por tramos (0 antes del primero).
+confinamientos : secuencia de (inicio, fin, factor)
+    En los días ``inicio <= d < fin`` beta se multiplica por ``factor``.
+    Los factores de ventanas solapadas se multiplican.
+"""
+
+Calendario = namedtuple('Calendario', ['beta', 'vacunacion'])
+Calendario.__doc__ = """
+Intervenciones compiladas a un valor por día.
+
+beta : array (..., dias)
+    Tasa de transmisión efectiva de cada día (confinamientos incluidos).
+vacunacion : array (..., dias)
+    Tasa de vacunación de cada día.
+
+Las dimensiones iniciales (escenarios) pueden faltar en uno de los dos
+arrays si es común a todos los escenarios.
+"""
+
+
+def _rellenar(listas, ancho):
+    # Listas de tuplas de longitud variable (una por escenario) a un array
+    # (escenarios, máximo de elementos, ancho) rellenado con NaN
+    longitudes = np.array([len(lista) for lista in listas], dtype=np.int64)
+    tabla = np.full((len(listas), longitudes.max(initial=0), ancho), np.nan)
+    planos = [tupla for lista in listas for tupla in lista]
+    if planos:
+        # Una sola conversión para todos los escenarios
+        inicio = np.repeat(np.cumsum(longitudes) - longitudes, longitudes)
+        tabla[np.repeat(np.arange(len(listas)), longitudes), np.arange(len(planos)) - inicio] = planos
+    return tabla
+
+
+def _por_tramos(listas, dias, inicial):
+    # Valor de cada escenario y día según sus tramos (dia, valor) y máscara
+    # de los días anteriores al primer tramo. Se recorre el j-ésimo tramo de
+    # todos los escenarios a la vez; el relleno NaN nunca se cumple
+    tabla = _rellenar([sorted(lista) if len(lista) > 1 else lista for lista in listas], 2)
+    dia = np.arange(dias)
+    serie = np.full((len(listas), dias), inicial, dtype=float)
+    sin_tramo = np.ones((len(listas), dias), dtype=bool)
+    for j in range(tabla.shape[1]):
+        desde = dia >= tabla[:, j, :1]
+        serie = np.where(desde, tabla[:, j, 1:], serie)
+        sin_tramo &= ~desde
+    return serie, sin_tramo
+
+
+def _factor_confinamientos(listas, dias):
+    tabla = _rellenar(listas, 3)
+    dia = np.arange(dias)
+    factor = np.ones((len(listas), dias))
+    for j in range(tabla.shape[1]):
+        dentro = (dia >= tabla[:, j, :1]) & (dia < tabla[:, j, 1:2])
+        factor = np.where(dentro, factor * tabla[:, j, 2:], factor)
+    return factor
+
+
+def compilar_intervenciones(intervenciones, beta, dias):
+    """
+    Compila intervenciones a arrays diarios.
+
+    Parámetros:
+    intervenciones : Intervenciones, secuencia de Intervenciones o Calendario
+        Con una secuencia cada elemento es un escenario. Un Calendario ya
+        compilado se devuelve recortado a ``dias``.
+    beta : float o array
+        Beta de partida, que rige antes del primer tramo de beta.
+    dias : int
+        Días del calendario.
+
+    Retorna:
+    Calendario
+        ``beta`` tiene forma ``broadcast(forma de beta, (escenarios,)) + (dias,)``
+        (sin el eje de escenarios si ``intervenciones`` es una sola).
+    """
+    if isinstance(intervenciones, Calendario):
+        beta_dia, vacunacion = (np.asarray(a, dtype=float) for a in intervenciones)
+        if min(beta_dia.shape[-1], vacunacion.shape[-1]) < dias:
+            raise ValueError(f"El calendario cubre menos de {dias} días")
+        return Calendario(beta_dia[..., :dias], vacunacion[..., :dias])
+    una = isinstance(intervenciones, Intervenciones)
+    lista = [intervenciones] if una else list(intervenciones)
+    valores, usa_base = _por_tramos([i.beta for i in lista], dias, 0.0)
+    factor = _factor_confinamientos([i.confinamientos for i in lista], dias)
+    # Una vacunación constante equivale a un único tramo desde el día 0
+    vacunacion, _ = _por_tramos(
+        [[(0, i.vacunacion)] if np.ndim(i.vacunacion) == 0 else i.vacunacion for i in lista], dias, 0.0
+    )
+    base = np.asarray(beta, dtype=float)[..., None]
+    if una:
+        valores, usa_base, factor, vacunacion = valores[0], usa_base[0], factor[0], vacunacion[0]
+    return Calendario(np.where(usa_base, base, valores) * factor, vacunacion)
+
+
+def dias_de_cambio(calendario):
+    """Días (> 0) en los que cambia beta o la vacunación de algún escenario."""
+    cambia = np.zeros(0, dtype=bool)
+    for serie in calendario:
+        serie = np.reshape(serie, (-1, np.shape(serie)[-1]))
+        diferente = np.any(serie[:, 1:] != serie[:, :-1], axis=0)
+        cambia = diferente if cambia.size == 0 else cambia | diferente
+    return np.flatnonzero(cambia) + 1
+
+
+def horizonte(intervenciones):
+    """Primer día a partir del cual una Intervenciones ya no cambia nada."""
+    dias = [dia for dia, _ in intervenciones.beta]
+    dias += [d for inicio, fin, _ in intervenciones.confinamientos for d in (inicio, fin)]
+    if np.ndim(intervenciones.vacunacion):
+        dias += [dia for dia, _ in intervenciones.vacunacion]
+    return max([int(d) for d in dias] + [0]) + 1
@@ -1,5 +1,64 @@
+import heapq
+from collections import namedtuple
+
 import numpy as np
 
+from modelo_sir import Parada, VigilanteParada
+from intervenciones import Calendario, compilar_intervenciones, horizonte
+from rejilla_espacial import RejillaEspacial
+from redes import como_red
+from instrumentacion import fase
+import nucleo_numba
+
+# Códigos compactos de estado (int8) y su equivalencia con las letras de la API
+SUSCEPTIBLE = 0
+INFECTADO = 1
+RECUPERADO = 2
+LETRAS_ESTADO = np.array(['S', 'I', 'R'])
+
+Instantanea = namedtuple('Instantanea', ['paso', 'conteos', 'x', 'y', 'estados'])
+Instantanea.__doc__ = """
+Estado del modelo tras un paso de ModeloAgentes.iterar.
+
+paso : int
+    Número de paso (1 para el primer día simulado).
+conteos : array (3,)
+    Agentes S, I y R tras el paso.
+x, y, estados : array o None
+    Vistas de solo lectura de las posiciones y estados del modelo, o None
+    en los pasos sin instantánea completa. Las vistas reflejan el estado
+    interno y cambian en el paso siguiente: hay que copiarlas para
+    conservarlas.
+"""
+
+
+def _solo_lectura(arreglo):
+    vista = arreglo.view()
+    vista.flags.writeable = False
+    return vista
+
+
+def estado_inicial(num_agentes, tamaño, rng):
+    """
+    Posiciones y estados iniciales de los agentes.
+
+    Retorna:
+    x, y : array de float64
+        Posiciones uniformes en el área.
+    estados : array de int8
+        La mayoría S, alrededor de un 10 % I y unos pocos R.
+    """
+    # Crear agentes en posiciones aleatorias
+    x = rng.uniform(0, tamaño, num_agentes)
+    y = rng.uniform(0, tamaño, num_agentes)
+    # Estado inicial: la mayoría S, algunos I, pocos R
+    u_infectado = rng.random(num_agentes)
+    u_recuperado = rng.random(num_agentes)
+    estados = np.full(num_agentes, SUSCEPTIBLE, dtype=np.int8)
+    estados[u_recuperado < 0.05] = RECUPERADO
+    estados[u_infectado < 0.1] = INFECTADO
+    return x, y, estados
+
 class Agente:
     def __init__(self, x, y, estado):
         self.x = x
@@ -7,51 +66,332 @@ class Agente:
         self.estado = estado  # 'S', 'I', 'R'
 
 class ModeloAgentes:
-    def __init__(self, num_agentes, tamaño, radio_contagio, beta, gamma):
+    """
+    Modelo SIR basado en agentes que se mueven en un área cuadrada.
+
+    Los agentes se almacenan como estructura de arreglos: las posiciones en
+    ``self.x`` y ``self.y`` (float64) y los estados en ``self.estados`` (int8
+    con los códigos SUSCEPTIBLE, INFECTADO y RECUPERADO). El movimiento, el
+    recorte a los bordes y la recuperación se hacen sobre los arreglos
+    completos.
+
+    La búsqueda de contactos usa por defecto una rejilla uniforme de celdas
+    de lado ``radio_contagio`` que se reconstruye tras cada movimiento
+    (``busqueda='rejilla'``); con ``busqueda='fuerza_bruta'`` se compara cada
+    infectado con todos los agentes, útil para validar la rejilla.
+
+    ``actualizacion`` elige la semántica del contagio. En modo
+    ``'secuencial'`` (por defecto sin ``red``) los infectados se recorren en orden de
+    índice y los contagios se aplican en el acto, así que un agente
+    contagiado en el mismo paso puede contagiar a otros. En modo
+    ``'sincrona'`` se reúnen todos los pares (infectado, susceptible) dentro
+    del radio, se sortean los ensayos de Bernoulli en una sola llamada y los
+    nuevos estados se aplican juntos al final: el paso queda vectorizado y
+    no depende del orden de los agentes.
+
+    Los números aleatorios salen de ``rng``: un ``np.random.Generator``
+    propio del modelo o, si no se indica, el estado global de ``np.random``.
+
+    Con ``motor='numba'`` el paso diario completo (``paso``) se ejecuta en un
+    núcleo compilado con la rejilla de celdas. Si Numba no está instalado, o
+    la búsqueda es por fuerza bruta, se usa el motor NumPy sin avisar; el
+    motor efectivo queda en ``self.motor``.
+
+    Con ``red`` (una RedContactos de redes.py, o cualquier CSR con
+    ``indptr`` e ``indices``) los contactos no dependen de la distancia: un
+    infectado solo puede contagiar a sus vecinos en la red, que se recorren
+    con una sola pasada vectorizada por día; por eso con red la actualización
+    por defecto es ``'sincrona'`` (``'secuencial'`` recorre los infectados
+    uno a uno en Python y con redes grandes es decenas de veces más lenta,
+    pero se admite si se pide). Los agentes siguen moviéndose
+    (las posiciones solo sirven para dibujarlos), ``radio_contagio`` y
+    ``busqueda`` se ignoran y ``self.busqueda`` pasa a ser ``'red'``. La red
+    se puede cambiar entre pasos con ``actualizar_red``.
+
+    ``intervenciones`` (una Intervenciones o un Calendario de
+    intervenciones.py) hace que beta dependa del día y añade vacunación:
+    cada susceptible pasa a recuperado con probabilidad igual a la tasa de
+    vacunación del día. El calendario se compila una vez al crear el modelo
+    y el día actual se lleva en ``self.dia``; pasado el último cambio rigen
+    los últimos valores.
+    """
+
+    BUSQUEDAS = ('rejilla', 'fuerza_bruta')
+    ACTUALIZACIONES = ('secuencial', 'sincrona')
+    MOTORES = ('numpy', 'numba')
+
+    # Infectados por bloque al calcular distancias por fuerza bruta
+    BLOQUE_FUERZA_BRUTA = 256
+
+    def __init__(self, num_agentes, tamaño, radio_contagio, beta, gamma, busqueda='rejilla',
+                 actualizacion=None, rng=None, motor='numpy', red=None, intervenciones=None):
+        if busqueda not in self.BUSQUEDAS:
+            raise ValueError(f"Búsqueda desconocida: {busqueda!r}. Opciones: {', '.join(self.BUSQUEDAS)}")
+        if actualizacion is None:
+            actualizacion = 'secuencial' if red is None else 'sincrona'
+        if actualizacion not in self.ACTUALIZACIONES:
+            raise ValueError(f"Actualización desconocida: {actualizacion!r}. Opciones: {', '.join(self.ACTUALIZACIONES)}")
+        if motor not in self.MOTORES:
+            raise ValueError(f"Motor desconocido: {motor!r}. Opciones: {', '.join(self.MOTORES)}")
         self.num_agentes = num_agentes
         self.tamaño = tamaño
         self.radio_contagio = radio_contagio
         self.beta = beta
         self.gamma = gamma
-        self.agentes = []
+        self.busqueda = busqueda
+        self.actualizacion = actualizacion
+        self.rng = np.random if rng is None else rng
+        self.dia = 0
+        self.calendario = None
+        if intervenciones is not None:
+            if isinstance(intervenciones, Calendario):
+                dias = np.shape(intervenciones.beta)[-1]
+            else:
+                dias = horizonte(intervenciones)
+            self.calendario = compilar_intervenciones(intervenciones, beta, dias)
+            if self.calendario.beta.ndim != 1 or self.calendario.beta.size == 0:
+                raise ValueError("ModeloAgentes necesita un calendario de un solo escenario y al menos un día")
+        self.red = self._validar_red(red) if red is not None else None
+        if self.red is not None:
+            self.busqueda = 'red'
+        self.rejilla = RejillaEspacial(tamaño, radio_contagio) if self.busqueda == 'rejilla' else None
+        if motor == 'numba' and nucleo_numba.DISPONIBLE and self.rejilla is not None:
+            self.motor = 'numba'
+            self._nucleo = nucleo_numba.NucleoNumba(num_agentes, tamaño, radio_contagio,
+                                                    self.rejilla.lado_celda, self.rejilla.celdas_por_eje)
+        else:
+            self.motor = 'numpy'
+            self._nucleo = None
         self._inicializar_agentes()
-    
+
+    def _validar_red(self, red):
+        red = como_red(red)
+        if red.num_nodos != self.num_agentes:
+            raise ValueError(f"La red tiene {red.num_nodos} nodos y el modelo {self.num_agentes} agentes")
+        return red
+
+    def actualizar_red(self, red):
+        """Sustituye la red de contactos (modo red) a partir del siguiente contagio."""
+        if self.red is None:
+            raise ValueError("Solo se puede cambiar la red de un modelo creado con red=")
+        self.red = self._validar_red(red)
+
+    def _parametros_del_dia(self):
+        # (beta, tasa de vacunación) vigentes en el día actual
+        if self.calendario is None:
+            return self.beta, 0.0
+        d = min(self.dia, self.calendario.beta.size - 1)
+        return float(self.calendario.beta[d]), float(self.calendario.vacunacion[d])
+
     def _inicializar_agentes(self):
-        # Crear agentes en posiciones aleatorias
-        for _ in range(self.num_agentes):
-            x = np.random.uniform(0, self.tamaño)
-            y = np.random.uniform(0, self.tamaño)
-            # Estado inicial: la mayoría S, algunos I, pocos R
-            if np.random.random() < 0.1:
-                estado = 'I'
-            elif np.random.random() < 0.05:
-                estado = 'R'
-            else:
-                estado = 'S'
-            self.agentes.append(Agente(x, y, estado))
-    
+        self.x, self.y, self.estados = estado_inicial(self.num_agentes, self.tamaño, self.rng)
+        self._actualizar_rejilla()
+
+    def _actualizar_rejilla(self):
+        if self.rejilla is not None:
+            with fase('agentes.rejilla'):
+                self.rejilla.reconstruir(self.x, self.y)
+        self._rejilla_vigente = True
+
+    @property
+    def agentes(self):
+        """Vista de compatibilidad: lista de objetos Agente (copia)."""
+        letras = LETRAS_ESTADO[self.estados]
+        return [Agente(x, y, e) for x, y, e in zip(self.x.tolist(), self.y.tolist(), letras.tolist())]
+
     def mover_agentes(self):
-        for agente in self.agentes:
-            agente.x += np.random.uniform(-1, 1)
-            agente.y += np.random.uniform(-1, 1)
+        n = self.num_agentes
+        with fase('agentes.movimiento'):
+            self.x += self.rng.uniform(-1, 1, n)
+            self.y += self.rng.uniform(-1, 1, n)
             # Mantener dentro del área
-            agente.x = np.clip(agente.x, 0, self.tamaño)
-            agente.y = np.clip(agente.y, 0, self.tamaño)
-    
+            np.clip(self.x, 0, self.tamaño, out=self.x)
+            np.clip(self.y, 0, self.tamaño, out=self.y)
+        self._actualizar_rejilla()
+
+    def _indice_contactos(self):
+        # Red o rejilla: ambas responden a vecinos(i) y pares(origenes)
+        return self.red if self.red is not None else self.rejilla
+
+    def _vecinos(self, i):
+        # Agentes a distancia menor que el radio de contagio del agente i
+        # (o vecinos en la red de contactos)
+        indice = self._indice_contactos()
+        if indice is not None:
+            return indice.vecinos(i)
+        dx = self.x - self.x[i]
+        dy = self.y - self.y[i]
+        cercanos = np.flatnonzero(dx * dx + dy * dy < self.radio_contagio ** 2)
+        return cercanos[cercanos != i]
+
+    def _pares_contacto(self, origenes):
+        # Todos los pares (origen, vecino) dentro del radio de contagio (o en la red)
+        indice = self._indice_contactos()
+        if indice is not None:
+            return indice.pares(origenes)
+        radio2 = self.radio_contagio ** 2
+        lista_o = []
+        lista_d = []
+        for k in range(0, origenes.size, self.BLOQUE_FUERZA_BRUTA):
+            bloque = origenes[k:k + self.BLOQUE_FUERZA_BRUTA]
+            dx = self.x[None, :] - self.x[bloque, None]
+            dy = self.y[None, :] - self.y[bloque, None]
+            fila, d = np.nonzero(dx * dx + dy * dy < radio2)
+            o = bloque[fila]
+            lista_o.append(o[o != d])
+            lista_d.append(d[o != d])
+        return np.concatenate(lista_o), np.concatenate(lista_d)
+
     def contagiar(self):
-        for i, agente in enumerate(self.agentes):
-            if agente.estado == 'I':
-                for j, otro in enumerate(self.agentes):
-                    if i != j and otro.estado == 'S':
-                        distancia = np.sqrt((agente.x - otro.x)**2 + (agente.y - otro.y)**2)
-                        if distancia < self.radio_contagio:
-                            if np.random.random() < self.beta:
-                                otro.estado = 'I'
-    
+        if not self._rejilla_vigente:
+            self._actualizar_rejilla()
+        with fase('agentes.contagio'):
+            if self.actualizacion == 'sincrona':
+                self._contagiar_sincrono()
+            else:
+                self._contagiar_secuencial()
+
+    def _contagiar_sincrono(self):
+        infectados = np.flatnonzero(self.estados == INFECTADO)
+        if infectados.size == 0:
+            return
+        _, destino = self._pares_contacto(infectados)
+        destino = destino[self.estados[destino] == SUSCEPTIBLE]
+        exitos = self.rng.random(destino.size) < self._parametros_del_dia()[0]
+        self.estados[destino[exitos]] = INFECTADO
+
+    def _contagiar_secuencial(self):
+        # Recorre los infectados en orden de índice; un agente contagiado en
+        # este mismo paso también contagia si su índice aún no se ha visitado.
+        infectados = np.flatnonzero(self.estados == INFECTADO)
+        if infectados.size == 0:
+            return
+        beta = self._parametros_del_dia()[0]
+        indice = self._indice_contactos()
+        if indice is not None:
+            # Vecinos de todos los infectados iniciales en una sola consulta
+            origen, destino = indice.pares(infectados)
+            orden = np.argsort(origen, kind='stable')
+            destino = destino[orden]
+            limites = np.searchsorted(origen[orden], np.append(infectados, self.num_agentes))
+        nuevos = []
+        p = 0
+        while p < infectados.size or nuevos:
+            if nuevos and (p == infectados.size or nuevos[0] < infectados[p]):
+                i = heapq.heappop(nuevos)
+                vecinos = self._vecinos(i)
+            else:
+                i = infectados[p]
+                if indice is not None:
+                    vecinos = destino[limites[p]:limites[p + 1]]
+                else:
+                    vecinos = self._vecinos(i)
+                p += 1
+            candidatos = vecinos[self.estados[vecinos] == SUSCEPTIBLE]
+            contagiados = candidatos[self.rng.random(candidatos.size) < beta]
+            self.estados[contagiados] = INFECTADO
+            for c in contagiados[contagiados > i].tolist():
+                heapq.heappush(nuevos, c)
+
     def recuperar(self):
-        for agente in self.agentes:
-            if agente.estado == 'I' and np.random.random() < self.gamma:
-                agente.estado = 'R'
-    
+        with fase('agentes.recuperacion'):
+            infectados = np.flatnonzero(self.estados == INFECTADO)
+            recuperados = infectados[self.rng.random(infectados.size) < self.gamma]
+            self.estados[recuperados] = RECUPERADO
+
+    def vacunar(self):
+        tasa = self._parametros_del_dia()[1]
+        if tasa <= 0:
+            return
+        with fase('agentes.vacunacion'):
+            susceptibles = np.flatnonzero(self.estados == SUSCEPTIBLE)
+            self.estados[susceptibles[self.rng.random(susceptibles.size) < tasa]] = RECUPERADO
+
+    def paso(self):
+        """Avanza un día: mover, contagiar, recuperar y vacunar."""
+        if self._nucleo is None:
+            self.mover_agentes()
+            self.contagiar()
+            self.recuperar()
+        else:
+            semilla = int(self.rng.random() * 2**32)
+            with fase('agentes.nucleo_numba'):
+                self._nucleo.paso(self.x, self.y, self.estados, self._parametros_del_dia()[0], self.gamma, semilla,
+                                  self.actualizacion == 'sincrona')
+            # El núcleo mueve los agentes con su propia lista de celdas; la rejilla
+            # de NumPy solo se reconstruye si alguien llama después a contagiar()
+            self._rejilla_vigente = False
+        self.vacunar()
+        self.dia += 1
+
+    def contar_estados(self):
+        """Número de agentes en cada estado, en el orden (S, I, R)."""
+        return np.bincount(self.estados, minlength=3)
+
+    def simular(self, dias, parada=None):
+        """
+        Avanza el modelo ``dias`` pasos registrando solo los totales.
+
+        Parámetros:
+        dias : int
+            Número de pasos a simular.
+        parada : CriterioParada o None
+            Si se indica, el modelo deja de avanzar en cuanto se cumple el
+            criterio. Los días restantes se completan con la recuperación
+            esperada de los infectados que quedan, sin nuevos contagios
+            (exacto tras la extinción), y el modelo queda en el día de parada.
+
+        Retorna:
+        conteos : array (dias + 1, 3)
+            Agentes S, I y R al inicio (fila 0) y tras cada día.
+        parada : Parada
+            Solo si se pasó ``parada``: motivo y día de la parada.
+        """
+        if parada is not None and self.calendario is not None:
+            raise ValueError("La parada anticipada no admite intervenciones")
+        conteos = np.zeros((dias + 1, 3), dtype=np.int64)
+        conteos[0] = self.contar_estados()
+        vigilante = VigilanteParada(parada, self.num_agentes, conteos[:, 0]) if parada is not None else None
+        for instantanea in self.iterar(dias, cada=0):
+            conteos[instantanea.paso] = instantanea.conteos
+            if vigilante is not None and vigilante.revisar(*conteos.T, instantanea.paso):
+                break
+        if vigilante is None:
+            return conteos
+        dia, motivo = vigilante.resultado(dias)
+        k = int(dia[0])
+        S_k, I_k, R_k = conteos[k]
+        I_cola = np.rint(I_k * (1 - self.gamma) ** np.arange(1, dias - k + 1)).astype(np.int64)
+        conteos[k + 1:, SUSCEPTIBLE] = S_k
+        conteos[k + 1:, INFECTADO] = I_cola
+        conteos[k + 1:, RECUPERADO] = R_k + I_k - I_cola
+        return conteos, Parada(str(motivo[0]), k)
+
+    def iterar(self, dias, cada=1):
+        """
+        Generador que avanza el modelo día a día y entrega una Instantanea por paso.
+
+        Parámetros:
+        dias : int
+            Número de pasos a simular.
+        cada : int
+            Cada cuántos pasos se incluyen posiciones y estados completos (el
+            último paso siempre los incluye). Con 0 solo se entregan conteos.
+
+        Retorna:
+        generador de Instantanea
+        """
+        for paso in range(1, dias + 1):
+            self.paso()
+            with fase('agentes.extraccion'):
+                conteos = self.contar_estados()
+                if cada and (paso % cada == 0 or paso == dias):
+                    instantanea = Instantanea(paso, conteos, _solo_lectura(self.x), _solo_lectura(self.y),
+                                              _solo_lectura(self.estados))
+                else:
+                    instantanea = Instantanea(paso, conteos, None, None, None)
+            yield instantanea
+
     def obtener_estado(self):
-        return [(agente.x, agente.y, agente.estado) for agente in self.agentes]
+        letras = LETRAS_ESTADO[self.estados]
+        return list(zip(self.x.tolist(), self.y.tolist(), letras.tolist()))
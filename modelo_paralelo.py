@@ -0,0 +1,301 @@
+import multiprocessing as mp
+import os
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from modelo_agentes import SUSCEPTIBLE, INFECTADO, RECUPERADO, estado_inicial
+from rejilla_espacial import RejillaEspacial
+
+
+def _dividir_en_teselas(trabajadores, tamaño, radio):
+    # Rejilla px x py lo más cuadrada posible; cada tesela debe medir al
+    # menos el radio de contagio (el halo solo llega a teselas vecinas) y al
+    # menos 1 (un agente solo puede migrar a una tesela adyacente por día)
+    minimo = max(radio, 1.0)
+    for p in range(trabajadores, 0, -1):
+        px = int(np.sqrt(p))
+        while p % px:
+            px -= 1
+        py = p // px
+        if tamaño / max(px, py) >= minimo:
+            return px, py
+    return 1, 1
+
+
+def _capacidad_bordes(n, tamaño, px, py, radio):
+    # Agentes esperados a menos de max(radio, 1) del perímetro de una tesela
+    # (los que pueden emigrar en un día o entrar en el halo) con población
+    # uniforme, más holgura para las fluctuaciones. Un desbordamiento no es
+    # un error: simular repite la ejecución con el doble de capacidad.
+    ancho = max(radio, 1.0)
+    esperados = n * 2 * (tamaño / px + tamaño / py) * ancho / tamaño**2
+    return int(min(n, np.ceil(1.5 * esperados + 6 * np.sqrt(esperados) + 64)))
+
+
+class _Compartidos:
+    """
+    Arrays de NumPy sobre bloques de memoria compartida con nombre.
+
+    Los buzones de migración ('salida') y de halo tienen ``capacidad`` filas
+    por tesela en lugar de ``n``, así que su tamaño crece con el perímetro
+    total de las teselas y no con trabajadores x agentes.
+    """
+
+    ESQUEMA = ('x', 'y', 'estados', 'tesela', 'salida', 'n_salida', 'halo', 'n_halo', 'conteos')
+
+    def __init__(self, n, teselas, dias, capacidad, nombres=None):
+        formas = {
+            'x': ((n,), np.float64),
+            'y': ((n,), np.float64),
+            'estados': ((n,), np.int8),
+            'tesela': ((n,), np.int32),
+            'salida': ((teselas, capacidad), np.int32),
+            'n_salida': ((teselas,), np.int64),
+            'halo': ((teselas, capacidad), np.int32),
+            'n_halo': ((teselas,), np.int64),
+            'conteos': ((dias + 1, teselas, 3), np.int64),
+        }
+        self.bloques = {}
+        self.arrays = {}
+        for clave in self.ESQUEMA:
+            forma, tipo = formas[clave]
+            tamaño = max(int(np.prod(forma)) * np.dtype(tipo).itemsize, 1)
+            if nombres is None:
+                bloque = shared_memory.SharedMemory(create=True, size=tamaño)
+            else:
+                bloque = shared_memory.SharedMemory(name=nombres[clave])
+            self.bloques[clave] = bloque
+            self.arrays[clave] = np.ndarray(forma, dtype=tipo, buffer=bloque.buf)
+
+    @property
+    def bytes(self):
+        """Memoria compartida reservada, en bytes."""
+        return sum(bloque.size for bloque in self.bloques.values())
+
+    def desbordado(self):
+        """True si algún buzón necesitó más filas que su capacidad."""
+        capacidad = self.arrays['salida'].shape[1]
+        return bool((self.arrays['n_salida'] > capacidad).any() or (self.arrays['n_halo'] > capacidad).any())
+
+    def nombres(self):
+        return {clave: bloque.name for clave, bloque in self.bloques.items()}
+
+    def cerrar(self, liberar=False):
+        self.arrays.clear()
+        for bloque in self.bloques.values():
+            bloque.close()
+            if liberar:
+                bloque.unlink()
+
+
+def _trabajador(w, nombres, n, dias, capacidad, px, py, tamaño, radio, beta, gamma, semilla, barrera):
+    compartidos = _Compartidos(n, px * py, dias, capacidad, nombres)
+    a = compartidos.arrays
+    x, y, estados, tesela = a['x'], a['y'], a['estados'], a['tesela']
+    rng = np.random.default_rng(semilla)
+
+    ancho_x = tamaño / px
+    ancho_y = tamaño / py
+    tx, ty = divmod(w, py)
+    x0, x1 = tx * ancho_x, (tx + 1) * ancho_x
+    y0, y1 = ty * ancho_y, (ty + 1) * ancho_y
+    vecinas = [
+        vx * py + vy
+        for vx in range(max(tx - 1, 0), min(tx + 1, px - 1) + 1)
+        for vy in range(max(ty - 1, 0), min(ty + 1, py - 1) + 1)
+        if (vx, vy) != (tx, ty)
+    ]
+    # Índice solo de la tesela y su halo: su coste no depende del área total
+    rejilla = RejillaEspacial(tamaño, radio, ventana=(x0 - radio, x1 + radio, y0 - radio, y1 + radio))
+
+    def tesela_de(px_, py_):
+        cx = np.minimum((px_ / ancho_x).astype(np.int32), px - 1)
+        cy = np.minimum((py_ / ancho_y).astype(np.int32), py - 1)
+        return cx * py + cy
+
+    propios = np.flatnonzero(tesela == w)
+    a['conteos'][0, w] = np.bincount(estados[propios], minlength=3)
+    try:
+        # Nadie modifica ``tesela`` hasta que todos hayan leído su reparto inicial
+        barrera.wait()
+        for dia in range(1, dias + 1):
+            # 1. Movimiento de los agentes propios y publicación de los que emigran
+            k = propios.size
+            x[propios] = np.clip(x[propios] + rng.uniform(-1, 1, k), 0, tamaño)
+            y[propios] = np.clip(y[propios] + rng.uniform(-1, 1, k), 0, tamaño)
+            destino = tesela_de(x[propios], y[propios])
+            sale = destino != w
+            emigrantes = propios[sale]
+            tesela[emigrantes] = destino[sale]
+            # Si no cabe se publica solo el número: tras la barrera todos lo
+            # ven y abandonan el mismo día
+            if emigrantes.size <= capacidad:
+                a['salida'][w, :emigrantes.size] = emigrantes
+            a['n_salida'][w] = emigrantes.size
+            propios = propios[~sale]
+            barrera.wait()
+            if (a['n_salida'] > capacidad).any():
+                break
+
+            # 2. Recepción de inmigrantes y publicación de la banda de halo
+            llegadas = [a['salida'][v, :a['n_salida'][v]] for v in vecinas]
+            if llegadas:
+                llegadas = np.concatenate(llegadas).astype(np.int64)
+                propios = np.concatenate([propios, llegadas[tesela[llegadas] == w]])
+            px_, py_ = x[propios], y[propios]
+            borde = (px_ - x0 < radio) | (x1 - px_ < radio) | (py_ - y0 < radio) | (y1 - py_ < radio)
+            banda = propios[borde]
+            if banda.size <= capacidad:
+                a['halo'][w, :banda.size] = banda
+            a['n_halo'][w] = banda.size
+            barrera.wait()
+            if (a['n_halo'] > capacidad).any():
+                break
+
+            # 3. Contagio síncrono: solo se leen estados ajenos, se deciden los propios
+            ajenos = np.concatenate([a['halo'][v, :a['n_halo'][v]] for v in vecinas] or [propios[:0]])
+            # El halo de una vecina incluye sus otros bordes: solo interesa lo
+            # que cae a menos de ``radio`` de esta tesela
+            hx, hy = x[ajenos], y[ajenos]
+            cerca = (hx > x0 - radio) & (hx < x1 + radio) & (hy > y0 - radio) & (hy < y1 + radio)
+            local = np.concatenate([propios, ajenos[cerca]]).astype(np.int64)
+            estado_local = estados[local]
+            fuentes = np.flatnonzero(estado_local == INFECTADO)
+            nuevos = local[:0]
+            if fuentes.size:
+                rejilla.reconstruir(x[local], y[local])
+                _, d = rejilla.pares(fuentes)
+                d = d[(d < propios.size) & (estado_local[d] == SUSCEPTIBLE)]
+                nuevos = local[d[rng.random(d.size) < beta]]
+            barrera.wait()
+
+            # 4. Aplicación de contagios y recuperación de los agentes propios
+            estados[nuevos] = INFECTADO
+            infectados = propios[estados[propios] == INFECTADO]
+            estados[infectados[rng.random(infectados.size) < gamma]] = RECUPERADO
+            a['conteos'][dia, w] = np.bincount(estados[propios], minlength=3)
+    except threading.BrokenBarrierError:
+        # Otro trabajador falló y el coordinador abortó la barrera
+        pass
+    finally:
+        del x, y, estados, tesela, a
+        compartidos.cerrar()
+
+
+class ModeloAgentesParalelo:
+    """
+    Modelo de agentes con descomposición de dominio en varios procesos.
+
+    El área ``tamaño x tamaño`` se divide en teselas, una por proceso. Las
+    posiciones y los estados viven en memoria compartida; cada trabajador
+    mueve, contagia y recupera solo a los agentes de su tesela. Los agentes
+    que cruzan un borde se publican en un buzón de salida y la tesela vecina
+    los adopta; los agentes a menos de ``radio_contagio`` de un borde se
+    publican como halo para que las teselas vecinas los vean como posibles
+    contagiadores. Los conteos S/I/R diarios de cada tesela se suman en el
+    coordinador.
+
+    El contagio usa la semántica síncrona de ModeloAgentes, la única
+    independiente del orden de los agentes. Cada tesela tiene su propio
+    Generator (hijo de ``SeedSequence(semilla)``), así que una ejecución es
+    reproducible para una semilla y un número de trabajadores dados.
+
+    Los buzones se dimensionan para la población esperada cerca de los
+    bordes de cada tesela; si un día no basta, la ejecución se repite desde
+    el principio con el doble de capacidad y las mismas semillas, de modo
+    que el resultado no depende de la capacidad. ``memoria_compartida``
+    guarda los bytes reservados en la última llamada a ``simular``.
+    """
+
+    def __init__(self, num_agentes, tamaño, radio_contagio, beta, gamma, trabajadores=None, semilla=None):
+        self.num_agentes = num_agentes
+        self.tamaño = tamaño
+        self.radio_contagio = radio_contagio
+        self.beta = beta
+        self.gamma = gamma
+        self.px, self.py = _dividir_en_teselas(trabajadores or os.cpu_count() or 1, tamaño, radio_contagio)
+        self.trabajadores = self.px * self.py
+        self._semillas = np.random.SeedSequence(semilla)
+        rng = np.random.default_rng(self._semillas.spawn(1)[0])
+        self.x, self.y, self.estados = estado_inicial(num_agentes, tamaño, rng)
+        self.capacidad_bordes = _capacidad_bordes(num_agentes, tamaño, self.px, self.py, radio_contagio)
+        self.memoria_compartida = 0
+
+    def contar_estados(self):
+        """Número de agentes en cada estado, en el orden (S, I, R)."""
+        return np.bincount(self.estados, minlength=3)
+
+    def simular(self, dias):
+        """
+        Avanza el modelo ``dias`` pasos en paralelo registrando solo los totales.
+
+        Retorna:
+        conteos : array (dias + 1, 3)
+            Agentes S, I y R al inicio (fila 0) y tras cada día.
+        """
+        semillas = self._semillas.spawn(self.trabajadores)
+        while True:
+            conteos = self._ejecutar(dias, semillas)
+            if conteos is not None:
+                return conteos
+            self.capacidad_bordes = min(2 * self.capacidad_bordes, self.num_agentes)
+
+    def _ejecutar(self, dias, semillas):
+        # Una ejecución completa con la capacidad actual; None si desbordó
+        n = self.num_agentes
+        compartidos = _Compartidos(n, self.trabajadores, dias, self.capacidad_bordes)
+        self.memoria_compartida = compartidos.bytes
+        try:
+            a = compartidos.arrays
+            a['x'][:] = self.x
+            a['y'][:] = self.y
+            a['estados'][:] = self.estados
+            cx = np.minimum((self.x / (self.tamaño / self.px)).astype(np.int32), self.px - 1)
+            cy = np.minimum((self.y / (self.tamaño / self.py)).astype(np.int32), self.py - 1)
+            a['tesela'][:] = cx * self.py + cy
+
+            contexto = mp.get_context('spawn')
+            barrera = contexto.Barrier(self.trabajadores)
+            procesos = [
+                contexto.Process(
+                    target=_trabajador,
+                    args=(w, compartidos.nombres(), n, dias, self.capacidad_bordes, self.px, self.py,
+                          float(self.tamaño), float(self.radio_contagio), self.beta, self.gamma,
+                          semillas[w], barrera),
+                    daemon=True,
+                )
+                for w in range(self.trabajadores)
+            ]
+            for proceso in procesos:
+                proceso.start()
+            self._esperar(procesos, barrera)
+
+            if compartidos.desbordado():
+                del a
+                return None
+            conteos = a['conteos'].sum(axis=1)
+            self.x = a['x'].copy()
+            self.y = a['y'].copy()
+            self.estados = a['estados'].copy()
+            del a
+        finally:
+            compartidos.cerrar(liberar=True)
+        return conteos
+
+    @staticmethod
+    def _esperar(procesos, barrera):
+        # Si un trabajador muere los demás quedarían bloqueados en la barrera
+        pendientes = list(procesos)
+        while pendientes:
+            for proceso in list(pendientes):
+                proceso.join(timeout=0.1)
+                if proceso.exitcode is None:
+                    continue
+                pendientes.remove(proceso)
+                if proceso.exitcode != 0:
+                    barrera.abort()
+                    for otro in pendientes:
+                        otro.join()
+                    raise RuntimeError(f"Un trabajador terminó con código {proceso.exitcode}")
@@ -1,9 +1,249 @@
+from collections import namedtuple
+
 import numpy as np
 
-def simulate_sir(N, I0, R0, beta, gamma, days):
+from intervenciones import Calendario, compilar_intervenciones, dias_de_cambio
+from instrumentacion import fase
+
+# Métodos de integración disponibles en simulate_sir
+METODOS = ('euler', 'rk4', 'rk45')
+
+# Motivos de parada; el código de cada motivo es su posición en la tupla
+MOTIVOS_PARADA = ('horizonte', 'extincion', 'umbral', 'estacionario')
+
+CriterioParada = namedtuple('CriterioParada', ['umbral_infectados', 'epsilon', 'ventana'], defaults=(None, None, 7))
+CriterioParada.__doc__ = """
+Condiciones para detener una simulación antes del horizonte.
+
+La extinción (ningún infectado) siempre detiene la simulación. Además:
+
+umbral_infectados : float o None
+    Se detiene cuando los infectados están por debajo de este valor y no
+    crecen respecto al día anterior.
+epsilon : float o None
+    Se detiene cuando ningún compartimento ha cambiado más de
+    ``epsilon * N`` en los últimos ``ventana`` días.
+ventana : int
+    Días de la ventana del criterio estacionario.
+"""
+
+Parada = namedtuple('Parada', ['motivo', 'dia'])
+Parada.__doc__ = """
+Motivo y día de parada de una simulación (arrays por escenario en lote).
+
+motivo : str
+    Uno de MOTIVOS_PARADA; 'horizonte' si se simularon todos los días.
+dia : int
+    Último día simulado; el resto de la serie se completa analíticamente.
+"""
+
+# Tabla de Butcher de Dormand-Prince 5(4) para el método adaptativo
+_DP_A = (
+    (),
+    (1/5,),
+    (3/40, 9/40),
+    (44/45, -56/15, 32/9),
+    (19372/6561, -25360/2187, 64448/6561, -212/729),
+    (9017/3168, -355/33, 46732/5247, 49/176, -5103/18656),
+    (35/384, 0.0, 500/1113, 125/192, -2187/6784, 11/84),
+)
+_DP_B5 = np.array([35/384, 0.0, 500/1113, 125/192, -2187/6784, 11/84, 0.0])
+_DP_B4 = np.array([5179/57600, 0.0, 7571/16695, 393/640, -92097/339200, 187/2100, 1/40])
+_DP_E = _DP_B5 - _DP_B4
+
+
+def _derivadas(S, I, N, beta, gamma, vacunacion=None):
+    # La fuerza de infección se calcula una sola vez por evaluación
+    fuerza = beta * S * I / N
+    recuperacion = gamma * I
+    if vacunacion is None:
+        return -fuerza, fuerza - recuperacion, recuperacion
+    vacunados = vacunacion * S
+    return -fuerza - vacunados, fuerza - recuperacion, recuperacion + vacunados
+
+
+def _paso_rk4(S, I, R, h, N, beta, gamma, vacunacion=None):
+    k1 = _derivadas(S, I, N, beta, gamma, vacunacion)
+    k2 = _derivadas(S + h/2 * k1[0], I + h/2 * k1[1], N, beta, gamma, vacunacion)
+    k3 = _derivadas(S + h/2 * k2[0], I + h/2 * k2[1], N, beta, gamma, vacunacion)
+    k4 = _derivadas(S + h * k3[0], I + h * k3[1], N, beta, gamma, vacunacion)
+    return tuple(
+        y + h/6 * (a + 2*b + 2*c + d)
+        for y, a, b, c, d in zip((S, I, R), k1, k2, k3, k4)
+    )
+
+
+class VigilanteParada:
+    """
+    Evalúa un CriterioParada día a día sobre series (escenarios, días + 1) o
+    (días + 1,) y recuerda en qué día y por qué se detuvo cada escenario.
+    """
+
+    def __init__(self, criterio, N, S):
+        self.criterio = criterio
+        self.N = np.ravel(N)
+        filas = S.reshape(-1, S.shape[-1]).shape[0]
+        self.dia = np.full(filas, -1, dtype=np.int64)
+        self.codigo = np.zeros(filas, dtype=np.int64)
+
+    def revisar(self, S, I, R, i):
+        """Registra las paradas del día ``i``; True si ya no queda ningún escenario activo."""
+        S, I, R = (a.reshape(-1, a.shape[-1]) for a in (S, I, R))
+        codigo = np.where(I[:, i] <= 0, MOTIVOS_PARADA.index('extincion'), 0)
+        umbral = self.criterio.umbral_infectados
+        if umbral is not None:
+            bajo = (codigo == 0) & (I[:, i] < umbral) & (I[:, i] <= I[:, i - 1])
+            codigo[bajo] = MOTIVOS_PARADA.index('umbral')
+        v = self.criterio.ventana
+        if self.criterio.epsilon is not None and i >= v:
+            cambio = np.maximum.reduce([np.abs(X[:, i] - X[:, i - v]) for X in (S, I, R)])
+            quieto = (codigo == 0) & (cambio < self.criterio.epsilon * self.N)
+            codigo[quieto] = MOTIVOS_PARADA.index('estacionario')
+        nuevos = (self.dia < 0) & (codigo > 0)
+        self.dia[nuevos] = i
+        self.codigo[nuevos] = codigo[nuevos]
+        return bool(np.all(self.dia >= 0))
+
+    def resultado(self, ultimo_dia):
+        """Arrays (dia, motivo) por escenario; los no detenidos llegan a ``ultimo_dia``."""
+        dia = np.where(self.dia >= 0, self.dia, ultimo_dia)
+        motivo = np.array(MOTIVOS_PARADA)[self.codigo]
+        return dia, motivo
+
+
+def _completar_cola(t, S, I, R, N, beta, gamma, dia):
+    # Rellena cada escenario tras su día de parada con la solución del SIR
+    # linealizado con S constante: I(τ) = I_k·e^{rτ}, r = beta·S_k/N - gamma.
+    # Es exacta sin infectados y muy precisa cuando quedan pocos. Los
+    # escenarios se agrupan por día de parada para calcular solo la cola.
+    S, I, R = (a.reshape(-1, a.shape[-1]) for a in (S, I, R))
+    N, beta, gamma = (np.broadcast_to(np.ravel(a), dia.shape) for a in (N, beta, gamma))
+    for k in np.unique(dia[dia < len(t) - 1]):
+        filas = np.flatnonzero(dia == k)
+        Sk, Ik, Rk = (X[filas, k][:, None] for X in (S, I, R))
+        contagio = beta[filas, None] * Sk / N[filas, None]
+        r = contagio - gamma[filas, None]
+        tau = t[k + 1:] - t[k]
+        crecimiento = np.exp(r * tau)
+        # (e^{rτ} - 1)/r, con límite τ cuando r = 0
+        nulo = r == 0
+        integral = (crecimiento - 1) / np.where(nulo, 1.0, r)
+        if nulo.any():
+            integral[nulo[:, 0]] = tau
+        I_cola = Ik * crecimiento
+        nuevos = contagio * Ik * integral
+        S[filas, k + 1:] = Sk - nuevos
+        I[filas, k + 1:] = I_cola
+        R[filas, k + 1:] = Rk + Ik + nuevos - I_cola
+
+
+def _integrar_fijo(S, I, R, y0, N, beta, gamma, metodo, pasos_por_dia, vigilante=None, calendario=None):
+    # Euler o RK4 con paso fijo; se registra un valor por día. Con calendario
+    # beta y la vacunación del día son una columna de arrays ya compilados
+    S_act, I_act, R_act = y0
+    h = 1.0 / pasos_por_dia
+    activos = Ellipsis
+    vacunacion = None
+    for i in range(1, S.shape[-1]):
+        if calendario is not None:
+            beta = calendario.beta[..., i - 1]
+            vacunacion = calendario.vacunacion[..., i - 1]
+        for _ in range(pasos_por_dia):
+            if metodo == 'euler':
+                dS, dI, dR = _derivadas(S_act, I_act, N, beta, gamma, vacunacion)
+                S_act = S_act + dS * h
+                I_act = I_act + dI * h
+                R_act = R_act + dR * h
+            else:
+                S_act, I_act, R_act = _paso_rk4(S_act, I_act, R_act, h, N, beta, gamma, vacunacion)
+        S[activos, i] = S_act
+        I[activos, i] = I_act
+        R[activos, i] = R_act
+        if vigilante is None:
+            continue
+        if vigilante.revisar(S, I, R, i):
+            return
+        if S.ndim == 2:
+            # En lote, los escenarios ya detenidos dejan de integrarse
+            sigue = vigilante.dia[activos] < 0
+            if not sigue.all():
+                activos = np.flatnonzero(vigilante.dia < 0)
+                S_act, I_act, R_act, N, beta, gamma = (a[sigue] for a in (S_act, I_act, R_act, N, beta, gamma))
+
+
+def _integrar_rk45(t, S, I, R, y0, N, beta, gamma, rtol, atol, vigilante=None, calendario=None):
+    # Dormand-Prince con control de error; los valores en la malla diaria se
+    # obtienen por interpolación de Hermite cúbica dentro de cada paso aceptado.
+    # Con calendario ningún paso cruza un día en que cambian los parámetros:
+    # dentro de cada paso son constantes y el control de error no se degrada
+    vacunacion = None
+    cambios = [np.inf]
+    if calendario is not None and len(t) > 1:
+        cambios = [float(d) for d in dias_de_cambio(calendario)] + [np.inf]
+        beta = calendario.beta[..., 0]
+        vacunacion = calendario.vacunacion[..., 0]
+
+    def f(y):
+        return np.array(_derivadas(y[0], y[1], N, beta, gamma, vacunacion))
+
+    y = np.array(y0, dtype=float)
+    t_act = t[0]
+    h = min(0.1, t[-1] - t[0]) if t[-1] > t[0] else 0.0
+    k_ini = f(y)
+    siguiente = 1
+    c = 0
+    while siguiente < len(t):
+        h = min(h, t[-1] - t_act)
+        hasta_cambio = cambios[c] - t_act <= h
+        if hasta_cambio:
+            h = cambios[c] - t_act
+        k = [k_ini]
+        for fila in _DP_A[1:]:
+            k.append(f(y + h * sum(a * kj for a, kj in zip(fila, k))))
+        y_nuevo = y + h * sum(b * kj for b, kj in zip(_DP_B5, k) if b)
+        error = h * sum(e * kj for e, kj in zip(_DP_E, k) if e)
+        escala = atol + rtol * np.maximum(np.abs(y), np.abs(y_nuevo))
+        norma = float(np.max(np.abs(error) / escala))
+        if norma <= 1.0:
+            t_nuevo = t_act + h
+            while siguiente < len(t) and t[siguiente] <= t_nuevo + 1e-12 * max(1.0, t_nuevo):
+                theta = (t[siguiente] - t_act) / h
+                h00 = (1 + 2*theta) * (1 - theta)**2
+                h10 = theta * (1 - theta)**2
+                h01 = theta**2 * (3 - 2*theta)
+                h11 = theta**2 * (theta - 1)
+                interp = h00 * y + h10 * h * k[0] + h01 * y_nuevo + h11 * h * k[6]
+                S[..., siguiente] = interp[0]
+                I[..., siguiente] = interp[1]
+                R[..., siguiente] = interp[2]
+                if vigilante is not None and vigilante.revisar(S, I, R, siguiente):
+                    return
+                siguiente += 1
+            t_act = t_nuevo
+            y = y_nuevo
+            k_ini = k[6]  # FSAL: la última etapa es la derivada en el nuevo punto
+            if hasta_cambio:
+                t_act = cambios[c]
+                c += 1
+                dia = int(t_act)
+                beta = calendario.beta[..., dia]
+                vacunacion = calendario.vacunacion[..., dia]
+                k_ini = f(y)
+        factor = 5.0 if norma == 0 else min(5.0, max(0.2, 0.9 * norma ** -0.2))
+        h *= factor
+
+
+def _validar_intervenciones(intervenciones, parada):
+    # La cola analítica de la parada anticipada supone parámetros constantes
+    if intervenciones is not None and parada is not None:
+        raise ValueError("La parada anticipada no admite intervenciones")
+
+
+def simulate_sir(N, I0, R0, beta, gamma, days, metodo='euler', pasos_por_dia=1, rtol=1e-6, atol=1e-6,
+                 parada=None, intervenciones=None):
     """
     Simula el modelo SIR determinista.
-    
+
     Parámetros:
     N : int
         Población total.
@@ -17,7 +257,23 @@ def simulate_sir(N, I0, R0, beta, gamma, days):
         Tasa de recuperación.
     days : int
         Número de días a simular.
-        
+    metodo : str
+        Integrador: 'euler' (Euler explícito, por defecto), 'rk4'
+        (Runge-Kutta clásico de paso fijo) o 'rk45' (Dormand-Prince
+        adaptativo con control de error).
+    pasos_por_dia : int
+        Subpasos por día para 'euler' y 'rk4'. La salida sigue siendo diaria.
+    rtol, atol : float
+        Tolerancias relativa y absoluta del método 'rk45'.
+    parada : CriterioParada o None
+        Si se indica, la integración se detiene en cuanto se cumple el
+        criterio y los días restantes se completan con la solución
+        linealizada (la forma de la salida no cambia).
+    intervenciones : Intervenciones, Calendario o None
+        Beta por tramos, vacunación y confinamientos (ver intervenciones.py).
+        Se compilan una vez a valores diarios antes de integrar. No se
+        combina con ``parada``.
+
     Retorna:
     t : array
         Vector de tiempo.
@@ -27,7 +283,17 @@ def simulate_sir(N, I0, R0, beta, gamma, days):
         Infectados por día.
     R : array
         Recuperados por día.
+    parada : Parada
+        Solo si se pasó ``parada``: motivo y día de la parada.
     """
+    if metodo not in METODOS:
+        raise ValueError(f"Método desconocido: {metodo!r}. Opciones: {', '.join(METODOS)}")
+    _validar_intervenciones(intervenciones, parada)
+    calendario = None
+    if intervenciones is not None:
+        with fase('sir.intervenciones'):
+            calendario = compilar_intervenciones(intervenciones, beta, days)
+
     S0 = N - I0 - R0
 
     dt = 1.0  # paso de tiempo en días
@@ -35,16 +301,393 @@ def simulate_sir(N, I0, R0, beta, gamma, days):
     S = np.zeros(len(t))
     I = np.zeros(len(t))
     R = np.zeros(len(t))
-    
+
     S[0] = S0
     I[0] = I0
     R[0] = R0
-    
-    for i in range(1, len(t)):
-        dS = -beta * S[i-1] * I[i-1] / N
-        dI = beta * S[i-1] * I[i-1] / N - gamma * I[i-1]
-        dR = gamma * I[i-1]
-        S[i] = S[i-1] + dS * dt
-        I[i] = I[i-1] + dI * dt
-        R[i] = R[i-1] + dR * dt
+
+    vigilante = VigilanteParada(parada, N, S) if parada is not None else None
+    with fase('sir.integracion'):
+        if metodo == 'rk45':
+            _integrar_rk45(t, S, I, R, (S0, I0, R0), N, beta, gamma, rtol, atol, vigilante, calendario)
+        else:
+            _integrar_fijo(S, I, R, (S[0], I[0], R[0]), N, beta, gamma, metodo, pasos_por_dia, vigilante,
+                           calendario)
+    if vigilante is None:
+        return t, S, I, R
+    dia, motivo = vigilante.resultado(len(t) - 1)
+    with fase('sir.cola'):
+        _completar_cola(t, S, I, R, N, beta, gamma, dia)
+    return t, S, I, R, Parada(str(motivo[0]), int(dia[0]))
+
+
+def simulate_sir_batch(N, I0, R0, beta, gamma, days, metodo='euler', pasos_por_dia=1, rtol=1e-6, atol=1e-6,
+                       parada=None, intervenciones=None):
+    """
+    Simula muchos escenarios SIR a la vez con un único bucle temporal.
+
+    Los parámetros poblacionales y epidemiológicos pueden ser escalares o
+    arrays; se combinan por broadcasting y cada combinación es un escenario.
+    Todos los escenarios avanzan juntos, de modo que el coste del bucle en
+    Python es el mismo para uno que para diez mil escenarios.
+
+    Parámetros:
+    N, I0, R0, beta, gamma : float o array
+        Igual que en simulate_sir, uno por escenario.
+    days : int
+        Número de días a simular (común a todos los escenarios).
+    metodo, pasos_por_dia, rtol, atol :
+        Igual que en simulate_sir. Con 'rk45' el paso es común y se ajusta
+        al error del escenario más exigente.
+    parada : CriterioParada o None
+        Igual que en simulate_sir. Cada escenario se completa desde su
+        propio día de parada y el bucle termina cuando todos se detienen.
+    intervenciones : Intervenciones, secuencia de Intervenciones, Calendario o None
+        Igual que en simulate_sir. Una secuencia aporta un eje de
+        escenarios más que se combina por broadcasting con los parámetros
+        (por ejemplo, ``beta[:, None]`` y k intervenciones dan
+        ``len(beta) * k`` escenarios). No se combina con ``parada``.
+
+    Retorna:
+    t : array
+        Vector de tiempo.
+    S : array (escenarios, días + 1)
+        Susceptibles por escenario y día.
+    I : array (escenarios, días + 1)
+        Infectados por escenario y día.
+    R : array (escenarios, días + 1)
+        Recuperados por escenario y día.
+    parada : Parada
+        Solo si se pasó ``parada``: arrays de motivos y días por escenario.
+    """
+    if metodo not in METODOS:
+        raise ValueError(f"Método desconocido: {metodo!r}. Opciones: {', '.join(METODOS)}")
+    _validar_intervenciones(intervenciones, parada)
+
+    forma = np.broadcast_shapes(*(np.shape(a) for a in (N, I0, R0, beta, gamma)))
+    calendario = None
+    if intervenciones is not None:
+        with fase('sir_lote.intervenciones'):
+            calendario = compilar_intervenciones(intervenciones, np.broadcast_to(beta, forma), days)
+            forma = calendario.beta.shape[:-1]
+            calendario = Calendario(*(
+                np.broadcast_to(a, forma + (days,)).reshape(-1, days) for a in calendario
+            ))
+    N, I0, R0, beta, gamma = (
+        np.ravel(np.broadcast_to(a, forma)).astype(float) for a in (N, I0, R0, beta, gamma)
+    )
+    S0 = N - I0 - R0
+
+    dt = 1.0  # paso de tiempo en días
+    t = np.linspace(0, days, int(days/dt) + 1)
+    S = np.zeros((len(N), len(t)))
+    I = np.zeros((len(N), len(t)))
+    R = np.zeros((len(N), len(t)))
+
+    S[:, 0] = S0
+    I[:, 0] = I0
+    R[:, 0] = R0
+
+    vigilante = VigilanteParada(parada, N, S) if parada is not None else None
+    with fase('sir_lote.integracion'):
+        if metodo == 'rk45':
+            _integrar_rk45(t, S, I, R, (S0, I0, R0), N, beta, gamma, rtol, atol, vigilante, calendario)
+        else:
+            _integrar_fijo(S, I, R, (S0, I0, R0), N, beta, gamma, metodo, pasos_por_dia, vigilante, calendario)
+    if vigilante is None:
+        return t, S, I, R
+    dia, motivo = vigilante.resultado(len(t) - 1)
+    with fase('sir_lote.cola'):
+        _completar_cola(t, S, I, R, N, beta, gamma, dia)
+    return t, S, I, R, Parada(motivo, dia)
+
+
+def _euler_en_sitio(S, I, R, N, beta, gamma, pasos_por_dia, trabajo):
+    # Euler para un lote sin arrays temporales: el estado vive en tres
+    # vectores contiguos y la fuerza de infección se calcula una vez por paso
+    # en un buffer de trabajo. Mismo orden de operaciones que _derivadas, así
+    # que el resultado coincide bit a bit con _integrar_fijo.
+    s, i, r, fuerza, recuperacion, dI = trabajo
+    s[:] = S[:, 0]
+    i[:] = I[:, 0]
+    r[:] = R[:, 0]
+    h = 1.0 / pasos_por_dia
+    for k in range(1, S.shape[-1]):
+        for _ in range(pasos_por_dia):
+            np.multiply(beta, s, out=fuerza)
+            fuerza *= i
+            fuerza /= N
+            np.multiply(gamma, i, out=recuperacion)
+            np.subtract(fuerza, recuperacion, out=dI)
+            if h != 1.0:
+                fuerza *= h
+                recuperacion *= h
+                dI *= h
+            s -= fuerza
+            i += dI
+            r += recuperacion
+        S[:, k] = s
+        I[:, k] = i
+        R[:, k] = r
+
+
+def _euler_escalar(S, I, R, N, beta, gamma, pasos_por_dia):
+    # Un solo escenario con floats de Python, mucho más baratos que los
+    # escalares de NumPy; mismas operaciones y resultado que _integrar_fijo
+    s, i, r = float(S[0]), float(I[0]), float(R[0])
+    N, beta, gamma = float(N), float(beta), float(gamma)
+    h = 1.0 / pasos_por_dia
+    for k in range(1, len(S)):
+        for _ in range(pasos_por_dia):
+            fuerza = beta * s * i / N
+            recuperacion = gamma * i
+            s = s + -fuerza * h
+            i = i + (fuerza - recuperacion) * h
+            r = r + recuperacion * h
+        S[k] = s
+        I[k] = i
+        R[k] = r
+
+
+class SimuladorSIR:
+    """
+    Simulador SIR determinista con buffers de salida reutilizables.
+
+    Para ejecutar muchísimos escenarios pequeños: la malla de tiempo y los
+    arrays de salida se reservan una sola vez y cada llamada a ``simular``
+    los sobrescribe. Por defecto se devuelven vistas de esos buffers, que
+    cambian en la siguiente llamada; con ``copiar=True`` se devuelven copias.
+
+    Parámetros:
+    days : int
+        Número de días a simular.
+    escenarios : int o None
+        None para un escenario escalar como simulate_sir, o número de
+        escenarios de cada lote como simulate_sir_batch.
+    metodo, pasos_por_dia, rtol, atol :
+        Igual que en simulate_sir. Con 'euler' el paso se hace en sitio, sin
+        arrays temporales en lote y con floats de Python en modo escalar.
+    """
+
+    def __init__(self, days, escenarios=None, metodo='euler', pasos_por_dia=1, rtol=1e-6, atol=1e-6):
+        if metodo not in METODOS:
+            raise ValueError(f"Método desconocido: {metodo!r}. Opciones: {', '.join(METODOS)}")
+        self.metodo = metodo
+        self.pasos_por_dia = pasos_por_dia
+        self.rtol = rtol
+        self.atol = atol
+        self.escenarios = escenarios
+        dt = 1.0  # paso de tiempo en días
+        self.t = np.linspace(0, days, int(days/dt) + 1)
+        self.t.flags.writeable = False
+        forma = (3, len(self.t)) if escenarios is None else (3, escenarios, len(self.t))
+        self.salida = np.zeros(forma)
+        self._trabajo = None if escenarios is None else np.empty((6, escenarios))
+
+    def simular(self, N, I0, R0, beta, gamma, out=None, copiar=False):
+        """
+        Simula un escenario (o un lote) sobre los buffers del simulador.
+
+        Parámetros:
+        N, I0, R0, beta, gamma :
+            Igual que en simulate_sir, o arrays de ``escenarios`` elementos
+            (o escalares, por broadcasting) en modo lote.
+        out : array o None
+            Array (3, días + 1) o (3, escenarios, días + 1) donde escribir
+            S, I, R en lugar del buffer propio.
+        copiar : bool
+            Devuelve copias en lugar de vistas.
+
+        Retorna:
+        t, S, I, R : arrays como los de simulate_sir o simulate_sir_batch.
+        """
+        salida = self.salida if out is None else out
+        if salida.shape != self.salida.shape:
+            raise ValueError(f"out debe tener forma {self.salida.shape}, no {salida.shape}")
+        S, I, R = salida
+        if self.escenarios is not None:
+            N, I0, R0, beta, gamma = (
+                np.broadcast_to(np.asarray(a, dtype=float), (self.escenarios,)) for a in (N, I0, R0, beta, gamma)
+            )
+        S[..., 0] = N - I0 - R0
+        I[..., 0] = I0
+        R[..., 0] = R0
+        if self.metodo == 'rk45':
+            _integrar_rk45(self.t, S, I, R, (S[..., 0], I[..., 0], R[..., 0]), N, beta, gamma, self.rtol, self.atol)
+        elif self.metodo == 'euler' and self.escenarios is not None:
+            _euler_en_sitio(S, I, R, N, beta, gamma, self.pasos_por_dia, self._trabajo)
+        elif self.metodo == 'euler':
+            _euler_escalar(S, I, R, N, beta, gamma, self.pasos_por_dia)
+        else:
+            y0 = (S[..., 0], I[..., 0], R[..., 0]) if self.escenarios is not None else (S[0], I[0], R[0])
+            _integrar_fijo(S, I, R, y0, N, beta, gamma, self.metodo, self.pasos_por_dia)
+        if copiar:
+            return self.t.copy(), S.copy(), I.copy(), R.copy()
+        return self.t, S, I, R
+
+
+# Métodos del motor estocástico y tamaño de población a partir del cual
+# 'auto' pasa de Gillespie exacto a tau-leaping
+METODOS_ESTOCASTICOS = ('auto', 'gillespie', 'tau')
+UMBRAL_GILLESPIE = 2000
+# Infectados por debajo de los cuales tau-leaping da pasos exactos de SSA
+UMBRAL_CRITICO_TAU = 10
+
+
+def _gillespie(t, S, I, R, N, beta, gamma, rng):
+    # SSA exacto, vectorizado sobre réplicas: en cada iteración cada réplica
+    # activa avanza un evento. El estado en un día de la malla es el vigente
+    # justo antes del primer evento posterior a ese día.
+    replicas, n_t = S.shape
+    s, i, r = S[:, 0].copy(), I[:, 0].copy(), R[:, 0].copy()
+    t_act = np.zeros(replicas)
+    siguiente = np.ones(replicas, dtype=np.int64)
+    filas = np.arange(replicas)
+    activas = siguiente < n_t
+    while activas.any():
+        a_inf = beta * s * i / N
+        a_total = a_inf + gamma * i
+        extintas = activas & (a_total == 0)
+        with np.errstate(divide='ignore'):
+            t_nuevo = t_act + rng.exponential(1.0, replicas) / a_total
+        t_nuevo[extintas] = np.inf
+        while True:
+            registrar = activas & (siguiente < n_t)
+            registrar[registrar] = t[siguiente[registrar]] < t_nuevo[registrar]
+            if not registrar.any():
+                break
+            S[filas[registrar], siguiente[registrar]] = s[registrar]
+            I[filas[registrar], siguiente[registrar]] = i[registrar]
+            R[filas[registrar], siguiente[registrar]] = r[registrar]
+            siguiente[registrar] += 1
+        activas &= siguiente < n_t
+        infeccion = activas & (rng.random(replicas) * a_total < a_inf)
+        recuperacion = activas & ~infeccion
+        s -= infeccion
+        i += infeccion
+        i -= recuperacion
+        r += recuperacion
+        t_act = t_nuevo
+
+
+def _tau_leaping(t, S, I, R, N, beta, gamma, rng, epsilon):
+    # Tau-leaping con selección adaptativa del paso (Cao, Gillespie y Petzold,
+    # 2006) y saltos binomiales, que nunca dejan compartimentos negativos. El
+    # paso se recorta para caer exactamente en cada día de la malla. Con menos
+    # de UMBRAL_CRITICO_TAU infectados las reacciones son críticas: un salto
+    # mantendría la presión de contagio después de la última recuperación, así
+    # que esas réplicas dan pasos exactos de SSA, un evento cada vez.
+    replicas, n_t = S.shape
+    s, i, r = S[:, 0].copy(), I[:, 0].copy(), R[:, 0].copy()
+    t_act = np.zeros(replicas)
+    siguiente = np.ones(replicas, dtype=np.int64)
+    filas = np.arange(replicas)
+    activas = siguiente < n_t
+    while activas.any():
+        a_inf = beta * s * i / N
+        a_rec = gamma * i
+        # Ambas especies reactivas participan en una reacción de orden 2 (g = 2)
+        cota_s = np.maximum(epsilon * s / 2, 1.0)
+        cota_i = np.maximum(epsilon * i / 2, 1.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tau = np.minimum.reduce([
+                cota_s / a_inf, cota_s**2 / a_inf,
+                cota_i / np.abs(a_inf - a_rec), cota_i**2 / (a_inf + a_rec),
+            ])
+            critica = activas & (i < UMBRAL_CRITICO_TAU)
+            espera = rng.exponential(1.0, replicas) / (a_inf + a_rec)
+        tau = np.where(critica, espera, np.nan_to_num(tau, nan=np.inf))
+        hasta_dia = np.full(replicas, np.inf)
+        hasta_dia[activas] = t[siguiente[activas]] - t_act[activas]
+        tau = np.where(activas, np.minimum(tau, hasta_dia), 0.0)
+        salto = np.where(critica, 0.0, tau)
+        contagios = rng.binomial(s, -np.expm1(-beta * i / N * salto))
+        recuperaciones = rng.binomial(i, -np.expm1(-gamma * salto))
+        # Paso exacto: como mucho un evento antes del siguiente día de la malla
+        evento = critica & (espera < hasta_dia)
+        infeccion = evento & (rng.random(replicas) * (a_inf + a_rec) < a_inf)
+        contagios += infeccion
+        recuperaciones += evento & ~infeccion
+        s -= contagios
+        i += contagios - recuperaciones
+        r += recuperaciones
+        t_act += tau
+        # Sin infectados el estado ya no cambia: se rellena el resto de la malla
+        extintas = activas & (i == 0)
+        registrar = activas & ((tau == hasta_dia) & ~evento | extintas)
+        for fila in filas[extintas]:
+            S[fila, siguiente[fila]:] = s[fila]
+            I[fila, siguiente[fila]:] = i[fila]
+            R[fila, siguiente[fila]:] = r[fila]
+        registrar &= ~extintas
+        S[filas[registrar], siguiente[registrar]] = s[registrar]
+        I[filas[registrar], siguiente[registrar]] = i[registrar]
+        R[filas[registrar], siguiente[registrar]] = r[registrar]
+        siguiente[registrar] += 1
+        activas &= ~extintas & (siguiente < n_t)
+
+
+def simulate_sir_estocastico(N, I0, R0, beta, gamma, days, replicas=1, metodo='auto', semilla=None,
+                             epsilon=0.03):
+    """
+    Simula el modelo SIR estocástico de población bien mezclada.
+
+    Los contagios ocurren con tasa beta*S*I/N y las recuperaciones con tasa
+    gamma*I, como en simulate_sir, pero cada evento cambia los
+    compartimentos en una persona. Todas las réplicas avanzan juntas en el
+    mismo bucle.
+
+    Parámetros:
+    N, I0, R0 : int
+        Población total, infectados y recuperados iniciales.
+    beta, gamma : float
+        Tasas de transmisión y de recuperación.
+    days : int
+        Número de días a simular.
+    replicas : int
+        Número de réplicas independientes.
+    metodo : str
+        'gillespie' (SSA exacto, para N pequeño), 'tau' (tau-leaping
+        adaptativo, para N grande) o 'auto', que elige según UMBRAL_GILLESPIE.
+    semilla : int, SeedSequence, Generator o None
+        Origen de los números aleatorios.
+    epsilon : float
+        Cambio relativo máximo de las propensiones por salto en 'tau'.
+
+    Retorna:
+    t : array
+        Vector de tiempo, el mismo que el de simulate_sir.
+    S, I, R : array de int (replicas, días + 1)
+        Compartimentos por réplica y día.
+    """
+    if metodo not in METODOS_ESTOCASTICOS:
+        raise ValueError(f"Método desconocido: {metodo!r}. Opciones: {', '.join(METODOS_ESTOCASTICOS)}")
+    if metodo == 'auto':
+        metodo = 'gillespie' if N <= UMBRAL_GILLESPIE else 'tau'
+    rng = np.random.default_rng(semilla)
+
+    dt = 1.0  # paso de tiempo en días
+    t = np.linspace(0, days, int(days/dt) + 1)
+    S = np.zeros((replicas, len(t)), dtype=np.int64)
+    I = np.zeros((replicas, len(t)), dtype=np.int64)
+    R = np.zeros((replicas, len(t)), dtype=np.int64)
+
+    S[:, 0] = int(N) - int(I0) - int(R0)
+    I[:, 0] = int(I0)
+    R[:, 0] = int(R0)
+
+    if metodo == 'gillespie':
+        _gillespie(t, S, I, R, N, beta, gamma, rng)
+    else:
+        _tau_leaping(t, S, I, R, N, beta, gamma, rng, epsilon)
     return t, S, I, R
+
+
+def probabilidad_extincion(I, R, N, fraccion=0.05):
+    """
+    Fracción de réplicas en las que el brote se extingue sin llegar a epidemia.
+
+    Una réplica cuenta como extinción temprana si al final no quedan
+    infectados y el tamaño final del brote (R) no supera ``fraccion`` de N.
+    """
+    return float(np.mean((I[:, -1] == 0) & (R[:, -1] <= fraccion * N)))
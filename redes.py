@@ -0,0 +1,147 @@
+"""
+Redes de contactos en formato CSR para ModeloAgentes y generadores de
+grafos estándar.
+
+Una red no dirigida de n nodos se guarda como dos arrays: ``indices``
+contiene los vecinos de todos los nodos uno tras otro y los de i están en
+``indices[indptr[i]:indptr[i + 1]]``. Cada arista aparece en las dos
+direcciones. Los generadores son vectorizados y construyen redes de
+millones de nodos y aristas en segundos; eliminan lazos y aristas repetidas,
+así que el número de aristas puede quedar ligeramente por debajo del
+nominal.
+"""
+import numpy as np
+
+
+class RedContactos:
+    """
+    Grafo no dirigido en formato CSR con la misma interfaz de consulta que
+    RejillaEspacial (``vecinos`` y ``pares``).
+
+    El constructor comprueba que el CSR esté bien formado y lanza ValueError
+    si no.
+    """
+
+    def __init__(self, indptr, indices):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices)
+        self.num_nodos = len(self.indptr) - 1
+        self._validar()
+
+    def _validar(self):
+        # Un CSR mal formado fallaría mucho después, o daría vecinos equivocados sin avisar
+        if self.indptr.ndim != 1 or self.num_nodos < 0:
+            raise ValueError("indptr debe ser un array de una dimensión con al menos un elemento")
+        if self.indices.ndim != 1 or (self.indices.size and not np.issubdtype(self.indices.dtype, np.integer)):
+            raise ValueError("indices debe ser un array de enteros de una dimensión")
+        if self.indptr[0] != 0 or self.indptr[-1] != len(self.indices):
+            raise ValueError(f"indptr debe empezar en 0 y terminar en len(indices) = {len(self.indices)}")
+        if np.any(np.diff(self.indptr) < 0):
+            raise ValueError("indptr debe ser no decreciente")
+        if self.indices.size and (self.indices.min() < 0 or self.indices.max() >= self.num_nodos):
+            raise ValueError(f"indices debe estar en [0, {self.num_nodos})")
+
+    @property
+    def num_aristas(self):
+        """Aristas no dirigidas (cada una se guarda dos veces)."""
+        return len(self.indices) // 2
+
+    def grados(self):
+        return np.diff(self.indptr)
+
+    def vecinos(self, i):
+        """Vecinos del nodo ``i``."""
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def pares(self, origenes):
+        """
+        Todas las aristas que salen de ``origenes`` como arrays (origen, destino),
+        en el orden de ``origenes``.
+        """
+        inicio = self.indptr[origenes]
+        cuantos = self.indptr[origenes + 1] - inicio
+        total = int(cuantos.sum())
+        # Posición de cada arista dentro de ``indices``: inicio del tramo de
+        # su origen más el desplazamiento dentro del tramo
+        desplazamiento = np.arange(total) - np.repeat(np.cumsum(cuantos) - cuantos, cuantos)
+        return np.repeat(origenes, cuantos), self.indices[np.repeat(inicio, cuantos) + desplazamiento]
+
+
+def como_red(red):
+    """
+    Convierte a RedContactos una RedContactos, un objeto con atributos
+    ``indptr`` e ``indices`` (como scipy.sparse.csr_matrix) o una tupla
+    ``(indptr, indices)``.
+    """
+    if isinstance(red, RedContactos):
+        return red
+    if hasattr(red, 'indptr'):
+        return RedContactos(red.indptr, red.indices)
+    indptr, indices = red
+    return RedContactos(indptr, indices)
+
+
+def red_desde_aristas(origen, destino, num_nodos):
+    """
+    Construye una RedContactos no dirigida a partir de una lista de aristas;
+    descarta lazos y aristas repetidas.
+    """
+    origen = np.asarray(origen, dtype=np.int64)
+    destino = np.asarray(destino, dtype=np.int64)
+    validas = origen != destino
+    o = np.concatenate([origen[validas], destino[validas]])
+    d = np.concatenate([destino[validas], origen[validas]])
+    # Ordenar por (origen, destino) y quitar duplicados en una sola pasada
+    clave = np.unique(o * num_nodos + d)
+    o, d = np.divmod(clave, num_nodos)
+    indptr = np.zeros(num_nodos + 1, dtype=np.int64)
+    np.cumsum(np.bincount(o, minlength=num_nodos), out=indptr[1:])
+    tipo = np.int32 if num_nodos < 2**31 else np.int64
+    return RedContactos(indptr, d.astype(tipo))
+
+
+def erdos_renyi(num_nodos, grado_medio, semilla=None):
+    """
+    Red aleatoria de Erdős–Rényi con el grado medio indicado.
+
+    El número de aristas se sortea como en G(n, p) con
+    p = grado_medio / (n - 1) y cada arista une dos nodos uniformes.
+    """
+    rng = np.random.default_rng(semilla)
+    p = min(grado_medio / max(num_nodos - 1, 1), 1.0)
+    m = rng.binomial(num_nodos * (num_nodos - 1) // 2, p)
+    return red_desde_aristas(rng.integers(0, num_nodos, m), rng.integers(0, num_nodos, m), num_nodos)
+
+
+def watts_strogatz(num_nodos, vecinos, reconexion, semilla=None):
+    """
+    Red de mundo pequeño de Watts–Strogatz.
+
+    Anillo en el que cada nodo se une a sus ``vecinos`` más cercanos
+    (``vecinos // 2`` a cada lado); después cada arista cambia su extremo
+    por un nodo uniforme con probabilidad ``reconexion``.
+    """
+    rng = np.random.default_rng(semilla)
+    mitad = vecinos // 2
+    origen = np.repeat(np.arange(num_nodos, dtype=np.int64), mitad)
+    destino = (origen + np.tile(np.arange(1, mitad + 1), num_nodos)) % num_nodos
+    reconectar = rng.random(destino.size) < reconexion
+    destino[reconectar] = rng.integers(0, num_nodos, int(reconectar.sum()))
+    return red_desde_aristas(origen, destino, num_nodos)
+
+
+def configuracion(grados, semilla=None):
+    """
+    Red del modelo de configuración con la secuencia de grados dada.
+
+    Se empareja al azar una lista con ``grados[i]`` copias de cada nodo i.
+    Los lazos y las aristas repetidas se descartan, así que los grados
+    finales pueden quedar algo por debajo de los pedidos en los nodos de
+    grado muy alto. Si la suma de grados es impar se ignora una copia.
+    """
+    rng = np.random.default_rng(semilla)
+    grados = np.asarray(grados, dtype=np.int64)
+    extremos = np.repeat(np.arange(grados.size, dtype=np.int64), grados)
+    rng.shuffle(extremos)
+    extremos = extremos[:extremos.size // 2 * 2]
+    return red_desde_aristas(extremos[0::2], extremos[1::2], grados.size)
@@ -0,0 +1,128 @@
+import numpy as np
+
+# Límite de celdas por eje para que el índice no crezca sin control
+# cuando el radio es muy pequeño frente al área
+MAX_CELDAS_POR_EJE = 2048
+
+class RejillaEspacial:
+    """
+    Índice de vecindad por rejilla uniforme (lista de celdas).
+
+    El área ``[0, tamaño] x [0, tamaño]`` se divide en celdas cuadradas de
+    lado mayor o igual que ``radio``, de modo que todos los vecinos de un
+    punto a distancia menor que ``radio`` están en su celda o en las ocho
+    adyacentes. Los agentes se ordenan por celda (ordenamiento por conteo)
+    y ``inicio[c]:inicio[c + 1]`` delimita los agentes de la celda ``c``
+    dentro de ``orden``.
+
+    Con ``ventana = (x0, x1, y0, y1)`` el índice solo abarca las celdas del
+    área que cortan esa ventana (por ejemplo, una tesela y su halo), así que
+    su memoria y el coste de ``reconstruir`` crecen con el área de la
+    ventana y no con la del área completa. Las celdas son las mismas que
+    sin ventana; los puntos de fuera se asignan a la celda de borde más
+    cercana, lo que solo les añade candidatos que se descartan por
+    distancia.
+    """
+
+    def __init__(self, tamaño, radio, ventana=None):
+        self.tamaño = tamaño
+        self.radio = radio
+        lado = max(radio, tamaño / MAX_CELDAS_POR_EJE)
+        self.lado_celda = lado
+        self.celdas_por_eje = m = int(np.floor(tamaño / lado)) + 1
+        if ventana is None:
+            self.origen_x = self.origen_y = 0
+            self.celdas_x = self.celdas_y = m
+        else:
+            x0, x1, y0, y1 = ventana
+            self.origen_x, fin_x = (min(int(np.floor(max(v, 0) / lado)), m - 1) for v in (x0, x1))
+            self.origen_y, fin_y = (min(int(np.floor(max(v, 0) / lado)), m - 1) for v in (y0, y1))
+            self.celdas_x = fin_x - self.origen_x + 1
+            self.celdas_y = fin_y - self.origen_y + 1
+        self.x = None
+        self.y = None
+        self.celda_x = None
+        self.celda_y = None
+        self.orden = None
+        self.inicio = None
+
+    def reconstruir(self, x, y):
+        """Recalcula la asignación de agentes a celdas para las posiciones dadas."""
+        mx, my = self.celdas_x, self.celdas_y
+        self.x = x
+        self.y = y
+        if mx == my == self.celdas_por_eje:
+            self.celda_x = np.minimum((x / self.lado_celda).astype(np.int64), mx - 1)
+            self.celda_y = np.minimum((y / self.lado_celda).astype(np.int64), my - 1)
+        else:
+            self.celda_x = np.clip((x / self.lado_celda).astype(np.int64) - self.origen_x, 0, mx - 1)
+            self.celda_y = np.clip((y / self.lado_celda).astype(np.int64) - self.origen_y, 0, my - 1)
+        celda = self.celda_x * my + self.celda_y
+        self.orden = np.argsort(celda, kind='stable')
+        conteo = np.bincount(celda, minlength=mx * my)
+        self.inicio = np.zeros(mx * my + 1, dtype=np.int64)
+        np.cumsum(conteo, out=self.inicio[1:])
+
+    def vecinos(self, i):
+        """Índices de los agentes a distancia menor que ``radio`` del agente ``i``."""
+        mx, my = self.celdas_x, self.celdas_y
+        cx = self.celda_x[i]
+        cy = self.celda_y[i]
+        y0 = max(cy - 1, 0)
+        y1 = min(cy + 1, my - 1)
+        trozos = []
+        for nx in range(max(cx - 1, 0), min(cx + 1, mx - 1) + 1):
+            trozos.append(self.orden[self.inicio[nx * my + y0]:self.inicio[nx * my + y1 + 1]])
+        candidatos = np.concatenate(trozos)
+        dx = self.x[candidatos] - self.x[i]
+        dy = self.y[candidatos] - self.y[i]
+        cerca = (dx * dx + dy * dy < self.radio ** 2) & (candidatos != i)
+        return candidatos[cerca]
+
+    def pares(self, origenes):
+        """
+        Todos los pares (origen, vecino) a distancia menor que ``radio``.
+
+        Parámetros:
+        origenes : array de int
+            Índices de los agentes desde los que se busca.
+
+        Retorna:
+        origen : array de int
+            Índice del agente de origen de cada par.
+        destino : array de int
+            Índice del vecino de cada par (nunca igual a su origen).
+        """
+        mx, my = self.celdas_x, self.celdas_y
+        origenes = np.asarray(origenes, dtype=np.int64)
+        cx = self.celda_x[origenes]
+        cy = self.celda_y[origenes]
+        # Las celdas (nx, cy - 1), (nx, cy), (nx, cy + 1) son contiguas en
+        # ``orden``, así que cada columna vecina es un único tramo
+        y0 = np.maximum(cy - 1, 0)
+        y1 = np.minimum(cy + 1, my - 1)
+        lista_o = []
+        lista_d = []
+        for dx in (-1, 0, 1):
+            nx = cx + dx
+            validos = (nx >= 0) & (nx < mx)
+            ini = self.inicio[nx[validos] * my + y0[validos]]
+            cuantos = self.inicio[nx[validos] * my + y1[validos] + 1] - ini
+            total = int(cuantos.sum())
+            if total == 0:
+                continue
+            # Expandir cada origen tantas veces como agentes tiene su tramo vecino
+            o = np.repeat(origenes[validos], cuantos)
+            desplazamiento = np.arange(total) - np.repeat(np.cumsum(cuantos) - cuantos, cuantos)
+            d = self.orden[np.repeat(ini, cuantos) + desplazamiento]
+            lista_o.append(o)
+            lista_d.append(d)
+        if not lista_o:
+            vacio = np.zeros(0, dtype=np.int64)
+            return vacio, vacio
+        o = np.concatenate(lista_o)
+        d = np.concatenate(lista_d)
+        ddx = self.x[o] - self.x[d]
+        ddy = self.y[o] - self.y[d]
+        cerca = (ddx * ddx + ddy * ddy < self.radio ** 2) & (o != d)
+        return o[cerca], d[cerca]
@@ -0,0 +1,32 @@
+"""
+Pruebas del modelo SIR de metapoblación.
+
+Ejecutar con ``python -m pytest -q`` desde la raíz del repositorio.
+"""
+import numpy as np
+
+from metapoblacion import acoplamiento_movilidad, simulate_sir_metapoblacion
+from modelo_sir import simulate_sir
+
+
+def test_cadena_de_flujos_contagia_a_los_parches_que_solo_reciben():
+    # Flujos en un solo sentido 0 -> 1 -> 2 -> ...: el parche 0 solo emite
+    # viajeros y los demás solo los reciben del anterior
+    parches = 6
+    origen = np.arange(parches - 1)
+    movilidad = acoplamiento_movilidad(origen, origen + 1, np.full(parches - 1, 0.1), parches)
+    I0 = np.zeros(parches)
+    I0[0] = 10
+    _, X = simulate_sir_metapoblacion(np.full(parches, 10000.0), I0, 0, 0.3, 0.1, 200,
+                                      movilidad=movilidad, dtype=np.float64)
+    assert np.all(X[:, 1, 1:].max(axis=0) > 1)
+
+
+def test_sin_movilidad_equivale_a_simulate_sir_por_parche():
+    N = np.array([1000.0, 5000.0])
+    I0 = np.array([1.0, 20.0])
+    identidad = acoplamiento_movilidad([], [], [], 2)
+    _, X = simulate_sir_metapoblacion(N, I0, 0, 0.3, 0.1, 100, movilidad=identidad, dtype=np.float64)
+    for k in range(2):
+        _, S, I, R = simulate_sir(N[k], I0[k], 0, 0.3, 0.1, 100)
+        np.testing.assert_allclose(X[:, 1, k], I, rtol=1e-9)
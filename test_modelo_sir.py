@@ -0,0 +1,26 @@
+"""
+Pruebas del motor SIR estocástico.
+
+Ejecutar con ``python -m pytest -q`` desde la raíz del repositorio.
+"""
+from modelo_sir import probabilidad_extincion, simulate_sir_estocastico
+
+# Con un infectado inicial la probabilidad de extinción temprana es 1/R0
+BETA, GAMMA = 0.3, 0.1
+REPLICAS = 4000
+# Unas cuatro desviaciones típicas de la proporción con REPLICAS réplicas
+TOLERANCIA = 0.03
+
+
+def _extincion(metodo, N):
+    _, _, I, R = simulate_sir_estocastico(N, 1, 0, BETA, GAMMA, 150, replicas=REPLICAS,
+                                          metodo=metodo, semilla=2024)
+    return probabilidad_extincion(I, R, N)
+
+
+def test_extincion_gillespie_coincide_con_la_teoria():
+    assert abs(_extincion('gillespie', 2000) - GAMMA / BETA) < TOLERANCIA
+
+
+def test_extincion_tau_coincide_con_la_teoria():
+    assert abs(_extincion('tau', 20000) - GAMMA / BETA) < TOLERANCIA
@@ -0,0 +1,95 @@
+"""
+Pruebas de la rejilla de vecindad frente a la búsqueda por fuerza bruta.
+
+Ejecutar con ``python -m pytest -q`` desde la raíz del repositorio.
+"""
+import numpy as np
+import pytest
+
+from modelo_agentes import ModeloAgentes, INFECTADO, RECUPERADO
+from rejilla_espacial import RejillaEspacial
+
+
+def _posiciones(tamaño, radio, n, semilla):
+    # Puntos uniformes más casos límite: esquinas y bordes del área, puntos
+    # sobre las fronteras de celda y parejas exactamente a distancia ``radio``
+    rng = np.random.default_rng(semilla)
+    x = list(rng.uniform(0, tamaño, n))
+    y = list(rng.uniform(0, tamaño, n))
+    for px, py in [(0.0, 0.0), (tamaño, tamaño), (0.0, tamaño), (tamaño, 0.0), (tamaño / 2, 0.0), (tamaño, tamaño / 3)]:
+        x.append(px)
+        y.append(py)
+    for k in range(1, 4):
+        x += [k * radio, k * radio + radio, k * radio]
+        y += [2 * radio, 2 * radio, 3 * radio]
+    x += [tamaño - radio, tamaño]
+    y += [tamaño, tamaño]
+    return np.array(x), np.array(y)
+
+
+def _pares_fuerza_bruta(x, y, radio):
+    dx = x[:, None] - x[None, :]
+    dy = y[:, None] - y[None, :]
+    o, d = np.nonzero(dx * dx + dy * dy < radio ** 2)
+    return set(zip(o[o != d].tolist(), d[o != d].tolist()))
+
+
+@pytest.mark.parametrize('tamaño, radio', [(10.0, 0.5), (10.0, 0.7), (50.0, 1.0), (3.0, 5.0)])
+def test_rejilla_encuentra_los_mismos_vecinos_que_fuerza_bruta(tamaño, radio):
+    x, y = _posiciones(tamaño, radio, 400, semilla=int(tamaño * 10 + radio * 10))
+    esperados = _pares_fuerza_bruta(x, y, radio)
+    rejilla = RejillaEspacial(tamaño, radio)
+    rejilla.reconstruir(x, y)
+
+    o, d = rejilla.pares(np.arange(x.size))
+    assert len(o) == len(set(zip(o.tolist(), d.tolist())))
+    assert set(zip(o.tolist(), d.tolist())) == esperados
+    por_origen = {i: set() for i in range(x.size)}
+    for a, b in esperados:
+        por_origen[a].add(b)
+    for i in range(x.size):
+        assert set(rejilla.vecinos(i).tolist()) == por_origen[i]
+
+
+def test_los_puntos_a_distancia_exacta_del_radio_no_son_vecinos():
+    rejilla = RejillaEspacial(10.0, 0.5)
+    rejilla.reconstruir(np.array([5.0, 5.5, 5.0, 4.999]), np.array([5.0, 5.0, 5.5, 5.0]))
+    assert sorted(rejilla.vecinos(0).tolist()) == [3]
+
+
+def test_rejilla_con_ventana_coincide_dentro_de_la_ventana():
+    tamaño, radio = 20.0, 1.0
+    x, y = _posiciones(tamaño, radio, 800, semilla=3)
+    ventana = (5.0 - radio, 12.0 + radio, 0.0 - radio, 9.0 + radio)
+    rejilla = RejillaEspacial(tamaño, radio, ventana=ventana)
+    rejilla.reconstruir(x, y)
+    dentro = np.flatnonzero((x >= 5.0) & (x < 12.0) & (y >= 0.0) & (y < 9.0))
+
+    o, d = rejilla.pares(dentro)
+    esperados = {(a, b) for a, b in _pares_fuerza_bruta(x, y, radio) if a in set(dentro.tolist())}
+    assert set(zip(o.tolist(), d.tolist())) == esperados
+
+
+@pytest.mark.parametrize('actualizacion', ['secuencial', 'sincrona'])
+def test_curvas_epidemicas_de_rejilla_y_fuerza_bruta_son_equivalentes(actualizacion):
+    # Con la misma semilla ambos modelos parten del mismo estado y consumen
+    # los mismos números aleatorios, pero los reparten entre los pares en
+    # otro orden: se comparan las curvas medias de varias semillas
+    finales = {}
+    for busqueda in ('rejilla', 'fuerza_bruta'):
+        curvas = []
+        for semilla in range(40):
+            modelo = ModeloAgentes(300, 15.0, 1.0, 0.3, 0.1, busqueda=busqueda, actualizacion=actualizacion,
+                                   rng=np.random.default_rng(semilla))
+            curvas.append(modelo.simular(40))
+        finales[busqueda] = np.array(curvas)
+
+    rejilla, fuerza_bruta = finales['rejilla'], finales['fuerza_bruta']
+    np.testing.assert_array_equal(rejilla[:, 0], fuerza_bruta[:, 0])
+    # Diferencia del tamaño final medio frente a su error típico
+    final_r, final_f = rejilla[:, -1, RECUPERADO], fuerza_bruta[:, -1, RECUPERADO]
+    error = np.sqrt((final_r.var(ddof=1) + final_f.var(ddof=1)) / len(final_r))
+    assert abs(final_r.mean() - final_f.mean()) < 4 * error + 1
+    picos_r, picos_f = rejilla[:, :, INFECTADO].max(axis=1), fuerza_bruta[:, :, INFECTADO].max(axis=1)
+    error = np.sqrt((picos_r.var(ddof=1) + picos_f.var(ddof=1)) / len(picos_r))
+    assert abs(picos_r.mean() - picos_f.mean()) < 4 * error + 1
@@ -0,0 +1,220 @@
+"""
+Simulaciones largas en hilos de fondo, independientes de la interfaz.
+
+GestorTrabajos mantiene un número fijo de hilos trabajadores y una cola por
+propietario (en la aplicación, una sesión del navegador). Los hilos toman
+trabajos por turno rotatorio entre propietarios y cada propietario tiene
+como mucho ``activos_por_propietario`` trabajos ejecutándose a la vez, así
+que un usuario que envía muchas corridas no deja sin hilos a los demás.
+
+La función de un trabajo recibe el Trabajo como primer argumento y llama a
+``trabajo.informar(progreso, parcial)`` cada cierto tiempo: así publica su
+avance y resultados parciales, y recibe la cancelación (``informar`` lanza
+TrabajoCancelado si se pidió). Lo que se publica en ``parcial`` lo leen
+otros hilos sin copiarlo: debe ser un objeto nuevo o una vista de datos que
+ya no cambian.
+
+Los trabajos se identifican por un id de texto; cualquier sesión que lo
+conozca puede consultarlos, lo que permite volver a conectarse a una corrida
+en curso tras recargar la página. La función se ejecuta en una copia del
+contexto de quien la envía, de modo que, por ejemplo, el perfilador activo
+de instrumentacion.py sigue midiendo dentro del hilo.
+"""
+import contextvars
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque, namedtuple
+
+ESTADOS_TRABAJO = ('en_cola', 'ejecutando', 'terminado', 'cancelado', 'error')
+
+ConsultaTrabajo = namedtuple('ConsultaTrabajo', ['estado', 'progreso', 'parcial', 'resultado', 'error'])
+ConsultaTrabajo.__doc__ = """
+Estado coherente de un Trabajo en un instante.
+
+estado : str
+    Uno de ESTADOS_TRABAJO.
+progreso : float
+    Fracción completada, entre 0 y 1.
+parcial : object
+    Último resultado parcial publicado con ``informar`` (o None).
+resultado : object
+    Valor devuelto por la función, solo en estado 'terminado'.
+error : str o None
+    Descripción de la excepción en estado 'error'.
+"""
+
+
+class TrabajoCancelado(Exception):
+    """Se lanza dentro de la función de un trabajo cuando se pidió cancelarlo."""
+
+
+class Trabajo:
+    """Una ejecución enviada a GestorTrabajos."""
+
+    def __init__(self, propietario, funcion, parametros):
+        self.id = uuid.uuid4().hex[:12]
+        self.propietario = propietario
+        self.funcion = funcion
+        self.parametros = parametros
+        self.estado = 'en_cola'
+        self.progreso = 0.0
+        self.parcial = None
+        self.resultado = None
+        self.error = None
+        self.creado = time.time()
+        self.terminado = None
+        self._contexto = contextvars.copy_context()
+        self._cancelacion = threading.Event()
+        self._cerrojo = threading.Lock()
+
+    @property
+    def activo(self):
+        return self.estado in ('en_cola', 'ejecutando')
+
+    @property
+    def cancelacion_pedida(self):
+        return self._cancelacion.is_set()
+
+    def informar(self, progreso, parcial=None):
+        """
+        Publica el avance desde la función del trabajo.
+
+        Lanza TrabajoCancelado si se pidió cancelar el trabajo.
+        """
+        with self._cerrojo:
+            self.progreso = float(progreso)
+            if parcial is not None:
+                self.parcial = parcial
+        if self._cancelacion.is_set():
+            raise TrabajoCancelado()
+
+    def consultar(self):
+        """ConsultaTrabajo con el estado actual."""
+        with self._cerrojo:
+            return ConsultaTrabajo(self.estado, self.progreso, self.parcial, self.resultado, self.error)
+
+    def _finalizar(self, estado, resultado=None, error=None):
+        with self._cerrojo:
+            self.estado = estado
+            self.resultado = resultado
+            self.error = error
+            if estado == 'terminado':
+                self.progreso = 1.0
+            self.terminado = time.time()
+
+
+class GestorTrabajos:
+    """
+    Grupo acotado de hilos que ejecuta trabajos con reparto justo.
+
+    Parámetros:
+    hilos : int o None
+        Hilos trabajadores; por defecto el número de CPU.
+    activos_por_propietario : int
+        Trabajos de un mismo propietario que pueden ejecutarse a la vez.
+    retencion : float
+        Segundos que se conserva un trabajo terminado para poder consultarlo.
+    """
+
+    def __init__(self, hilos=None, activos_por_propietario=1, retencion=3600.0):
+        self.activos_por_propietario = activos_por_propietario
+        self.retencion = retencion
+        self._condicion = threading.Condition()
+        # propietario -> cola de trabajos pendientes; el orden es el de la rotación
+        self._colas = OrderedDict()
+        self._ejecutando = {}
+        self._trabajos = {}
+        self._hilos = [
+            threading.Thread(target=self._bucle, name=f"trabajador-simulacion-{k}", daemon=True)
+            for k in range(hilos or os.cpu_count() or 1)
+        ]
+        for hilo in self._hilos:
+            hilo.start()
+
+    def enviar(self, propietario, funcion, **parametros):
+        """
+        Encola ``funcion(trabajo, **parametros)`` a nombre de ``propietario``.
+
+        Retorna:
+        Trabajo
+        """
+        trabajo = Trabajo(propietario, funcion, parametros)
+        with self._condicion:
+            self._purgar()
+            self._trabajos[trabajo.id] = trabajo
+            self._colas.setdefault(propietario, deque()).append(trabajo)
+            self._condicion.notify()
+        return trabajo
+
+    def obtener(self, id_trabajo):
+        """El Trabajo con ese id, o None si no existe o ya se descartó."""
+        with self._condicion:
+            return self._trabajos.get(id_trabajo)
+
+    def cancelar(self, id_trabajo):
+        """
+        Pide cancelar un trabajo. Si aún está en cola se descarta en el acto;
+        si se está ejecutando se detiene en su siguiente ``informar``.
+        """
+        with self._condicion:
+            trabajo = self._trabajos.get(id_trabajo)
+            if trabajo is None:
+                return
+            trabajo._cancelacion.set()
+            cola = self._colas.get(trabajo.propietario)
+            if trabajo.estado == 'en_cola' and cola is not None and trabajo in cola:
+                cola.remove(trabajo)
+                if not cola:
+                    del self._colas[trabajo.propietario]
+                trabajo._finalizar('cancelado')
+
+    def pendientes(self):
+        """Número de trabajos en cola y en ejecución."""
+        with self._condicion:
+            return sum(len(c) for c in self._colas.values()), sum(self._ejecutando.values())
+
+    def _purgar(self):
+        limite = time.time() - self.retencion
+        for id_trabajo in [i for i, t in self._trabajos.items() if t.terminado is not None and t.terminado < limite]:
+            del self._trabajos[id_trabajo]
+
+    def _siguiente(self):
+        # Turno rotatorio: el primer propietario con trabajos pendientes y
+        # sin agotar su cupo; después pasa al final de la rotación
+        for propietario, cola in self._colas.items():
+            if self._ejecutando.get(propietario, 0) < self.activos_por_propietario:
+                trabajo = cola.popleft()
+                if cola:
+                    self._colas.move_to_end(propietario)
+                else:
+                    del self._colas[propietario]
+                return trabajo
+        return None
+
+    def _bucle(self):
+        while True:
+            with self._condicion:
+                trabajo = self._siguiente()
+                while trabajo is None:
+                    self._condicion.wait()
+                    trabajo = self._siguiente()
+                with trabajo._cerrojo:
+                    trabajo.estado = 'ejecutando'
+                propietario = trabajo.propietario
+                self._ejecutando[propietario] = self._ejecutando.get(propietario, 0) + 1
+            try:
+                resultado = trabajo._contexto.run(trabajo.funcion, trabajo, **trabajo.parametros)
+                trabajo._finalizar('terminado', resultado)
+            except TrabajoCancelado:
+                trabajo._finalizar('cancelado')
+            except Exception as error:
+                trabajo._finalizar('error', error=f"{type(error).__name__}: {error}")
+            finally:
+                with self._condicion:
+                    self._ejecutando[propietario] -= 1
+                    if not self._ejecutando[propietario]:
+                        del self._ejecutando[propietario]
+                    # Un hueco del propietario puede desbloquear uno de sus trabajos en cola
+                    self._condicion.notify_all()
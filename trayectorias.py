@@ -0,0 +1,237 @@
+"""
+Formato binario compacto para guardar y reproducir trayectorias de ModeloAgentes.
+
+Una trayectoria es un directorio con:
+
+    meta.json      parámetros, número de agentes, formato y días con fotograma
+    conteos.npy    totales S, I, R de todos los días, array (dias + 1, 3)
+    y según el formato:
+    crudo:  x.f32, y.f32, estados.u8   bloques contiguos de ``num_agentes``
+            valores por fotograma, leídos con np.memmap
+    arrow:  fotogramas.arrow           archivo Arrow IPC con un lote de
+            ``fotogramas_por_bloque`` fotogramas, opcionalmente comprimido
+
+Las posiciones se guardan en float32 y los estados en uint8, 9 bytes por
+agente y fotograma. El lector nunca carga el archivo completo: en formato
+crudo cada fotograma es una vista del mapa de memoria y en formato arrow se
+descomprime solo el bloque que lo contiene.
+"""
+import json
+import os
+import threading
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+from modelo_agentes import Instantanea
+
+FORMATOS = ('crudo', 'arrow')
+COMPRESIONES = (None, 'lz4', 'zstd')
+
+_ARCHIVOS_CRUDOS = (('x', 'x.f32', np.float32), ('y', 'y.f32', np.float32), ('estados', 'estados.u8', np.uint8))
+
+
+class EscritorTrayectoria:
+    """
+    Escribe fotogramas de una simulación de agentes a medida que se generan.
+
+    Parámetros:
+    ruta : str
+        Directorio de la trayectoria (se crea si no existe).
+    num_agentes : int
+    parametros : dict o None
+        Parámetros de la simulación, guardados en meta.json.
+    formato : {'crudo', 'arrow'}
+    compresion : {None, 'lz4', 'zstd'}
+        Solo con formato 'arrow'.
+    fotogramas_por_bloque : int
+        Fotogramas por lote Arrow; es la unidad mínima de descompresión.
+    """
+
+    def __init__(self, ruta, num_agentes, parametros=None, formato='crudo', compresion=None,
+                 fotogramas_por_bloque=16):
+        if formato not in FORMATOS:
+            raise ValueError(f"formato debe ser uno de {FORMATOS}, no {formato!r}")
+        if compresion not in COMPRESIONES:
+            raise ValueError(f"compresion debe ser uno de {COMPRESIONES}, no {compresion!r}")
+        if compresion is not None and formato != 'arrow':
+            raise ValueError("La compresión solo está disponible con formato 'arrow'")
+        if formato == 'arrow' and pa is None:
+            raise ImportError("El formato 'arrow' requiere pyarrow")
+        os.makedirs(ruta, exist_ok=True)
+        self.ruta = ruta
+        self.num_agentes = num_agentes
+        self.parametros = parametros or {}
+        self.formato = formato
+        self.compresion = compresion
+        self.fotogramas_por_bloque = fotogramas_por_bloque
+        self.pasos = []
+        self.conteos = []
+        self._pendientes = []
+        if formato == 'crudo':
+            self._archivos = {clave: open(os.path.join(ruta, nombre), 'wb') for clave, nombre, _ in _ARCHIVOS_CRUDOS}
+        else:
+            esquema = pa.schema([('x', pa.float32()), ('y', pa.float32()), ('estados', pa.uint8())])
+            opciones = pa.ipc.IpcWriteOptions(compression=compresion)
+            self._sumidero = pa.OSFile(os.path.join(ruta, 'fotogramas.arrow'), 'wb')
+            self._escritor = pa.ipc.new_file(self._sumidero, esquema, options=opciones)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def agregar(self, instantanea):
+        """
+        Registra una Instantanea. Los conteos se guardan siempre; posiciones
+        y estados solo si la instantánea los trae.
+        """
+        self.conteos.append(np.asarray(instantanea.conteos, dtype=np.int64))
+        if instantanea.x is None:
+            return
+        x = np.asarray(instantanea.x, dtype=np.float32)
+        y = np.asarray(instantanea.y, dtype=np.float32)
+        estados = np.asarray(instantanea.estados, dtype=np.uint8)
+        self.pasos.append(int(instantanea.paso))
+        if self.formato == 'crudo':
+            for clave, valores in (('x', x), ('y', y), ('estados', estados)):
+                self._archivos[clave].write(valores.tobytes())
+        else:
+            self._pendientes.append((x, y, estados))
+            if len(self._pendientes) == self.fotogramas_por_bloque:
+                self._volcar_bloque()
+
+    def _volcar_bloque(self):
+        if not self._pendientes:
+            return
+        columnas = [np.concatenate(c) for c in zip(*self._pendientes)]
+        self._escritor.write_batch(pa.record_batch(columnas, names=['x', 'y', 'estados']))
+        self._pendientes = []
+
+    def cerrar(self):
+        """Vuelca lo pendiente y escribe conteos.npy y meta.json."""
+        if self.formato == 'crudo':
+            for archivo in self._archivos.values():
+                archivo.close()
+        else:
+            self._volcar_bloque()
+            self._escritor.close()
+            self._sumidero.close()
+        np.save(os.path.join(self.ruta, 'conteos.npy'), np.array(self.conteos, dtype=np.int64).reshape(-1, 3))
+        meta = {
+            'num_agentes': self.num_agentes,
+            'formato': self.formato,
+            'compresion': self.compresion,
+            'fotogramas_por_bloque': self.fotogramas_por_bloque,
+            'pasos': self.pasos,
+            'parametros': self.parametros,
+        }
+        with open(os.path.join(self.ruta, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+
+class LectorTrayectoria:
+    """
+    Acceso aleatorio a los fotogramas de una trayectoria guardada.
+
+    ``lector[k]`` devuelve la Instantanea del k-ésimo fotograma con x, y en
+    float32 y estados en int8 (los mismos códigos que ModeloAgentes). Las
+    vistas son de solo lectura y, en formato crudo, apuntan directamente al
+    mapa de memoria.
+
+    Un mismo lector puede usarse desde varios hilos (la aplicación comparte
+    uno entre sesiones).
+    """
+
+    def __init__(self, ruta):
+        with open(os.path.join(ruta, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        self.ruta = ruta
+        self.num_agentes = meta['num_agentes']
+        self.formato = meta['formato']
+        self.parametros = meta['parametros']
+        self.pasos = np.array(meta['pasos'], dtype=np.int64)
+        self.conteos = np.load(os.path.join(ruta, 'conteos.npy'), mmap_mode='r')
+        self._por_bloque = meta['fotogramas_por_bloque']
+        self._bloque = (None, None)
+        self._cerrojo = threading.Lock()
+        forma = (len(self.pasos), self.num_agentes)
+        if self.formato == 'crudo':
+            self._mapas = {
+                clave: np.memmap(os.path.join(ruta, nombre), dtype=tipo, mode='r', shape=forma)
+                if forma[0] * forma[1] else np.zeros(forma, dtype=tipo)
+                for clave, nombre, tipo in _ARCHIVOS_CRUDOS
+            }
+        else:
+            if pa is None:
+                raise ImportError("El formato 'arrow' requiere pyarrow")
+            self._fuente = pa.memory_map(os.path.join(ruta, 'fotogramas.arrow'), 'r')
+            self._lector = pa.ipc.open_file(self._fuente)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def __len__(self):
+        return len(self.pasos)
+
+    def __getitem__(self, k):
+        if not -len(self) <= k < len(self):
+            raise IndexError(f"Fotograma {k} fuera de rango (hay {len(self)})")
+        k %= len(self)
+        if self.formato == 'crudo':
+            x, y, estados = (self._mapas[clave][k] for clave in ('x', 'y', 'estados'))
+        else:
+            x, y, estados = self._fotograma_arrow(k)
+        paso = int(self.pasos[k])
+        return Instantanea(paso, np.array(self.conteos[paso]), x, y, estados.view(np.int8))
+
+    def _fotograma_arrow(self, k):
+        numero, desplazamiento = divmod(k, self._por_bloque)
+        # Comprobar y reemplazar el lote en caché es una sola operación; se
+        # corta del lote local para no mezclarlo con el que cargue otro hilo
+        with self._cerrojo:
+            bloque = self._bloque
+            if bloque[0] != numero:
+                # Solo se descomprime el lote que contiene el fotograma pedido
+                lote = self._lector.get_batch(numero)
+                columnas = [lote.column(nombre).to_numpy(zero_copy_only=True) for nombre in ('x', 'y', 'estados')]
+                bloque = self._bloque = (numero, columnas)
+        n = self.num_agentes
+        return [c[desplazamiento * n:(desplazamiento + 1) * n] for c in bloque[1]]
+
+    def indice_de_dia(self, dia):
+        """Índice del último fotograma registrado en o antes de ``dia``."""
+        return max(int(np.searchsorted(self.pasos, dia, side='right')) - 1, 0)
+
+    def cerrar(self):
+        with self._cerrojo:
+            self._bloque = (None, None)
+        if self.formato == 'crudo':
+            self._mapas.clear()
+        else:
+            self._fuente.close()
+
+
+def grabar_trayectoria(modelo, dias, ruta, cada=1, parametros=None, **opciones_escritor):
+    """
+    Simula ``dias`` pasos de un ModeloAgentes guardando la trayectoria en disco.
+
+    Se registra el estado inicial (día 0), los conteos de todos los días y
+    los fotogramas de cada ``cada`` días (y el último).
+
+    Retorna:
+    conteos : array (dias + 1, 3)
+    """
+    with EscritorTrayectoria(ruta, modelo.num_agentes, parametros, **opciones_escritor) as escritor:
+        escritor.agregar(Instantanea(0, modelo.contar_estados(), modelo.x, modelo.y, modelo.estados))
+        for instantanea in modelo.iterar(dias, cada=cada):
+            escritor.agregar(instantanea)
+        return np.array(escritor.conteos)
@@ -0,0 +1,203 @@
+import time
+
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.colors import ListedColormap, to_rgba, to_rgba_array
+
+from instrumentacion import fase
+
+# Paleta compartida por las gráficas de la aplicación
+COLOR_FONDO = "#020617"
+COLOR_TEXTO = "#e5e7eb"
+COLOR_EJES = "#475569"
+COLOR_REJILLA = "#64748b"
+COLOR_LEYENDA = "#1e293b"
+COLOR_S = "#38bdf8"  # Azul claro
+COLOR_I = "#f97316"  # Naranja
+COLOR_R = "#22c55e"  # Verde
+
+# Colores RGBA de los agentes indexados por código de estado (S, I, R)
+PALETA_ESTADOS_RGBA = to_rgba_array([COLOR_S, COLOR_I, COLOR_R])
+MAPA_ESTADOS = ListedColormap([COLOR_S, COLOR_I, COLOR_R])
+FONDO_RGB = np.array(to_rgba(COLOR_FONDO)[:3])
+
+# Límites de la gráfica de agentes: puntos dibujados como máximo, número de
+# agentes a partir del cual se pasa a mapa de densidad y celdas por eje del mapa
+MAX_PUNTOS_DISPERSION = 5000
+UMBRAL_DENSIDAD = 50000
+RESOLUCION_DENSIDAD = 200
+
+
+def aplicar_estilo_oscuro(fig, ax, etiqueta_x, etiqueta_y):
+    """Fondo oscuro, ejes y rejilla con el estilo del resto de la aplicación."""
+    ax.set_facecolor(COLOR_FONDO)
+    fig.patch.set_facecolor(COLOR_FONDO)
+    ax.tick_params(colors=COLOR_TEXTO)
+    ax.spines["bottom"].set_color(COLOR_EJES)
+    ax.spines["left"].set_color(COLOR_EJES)
+    ax.spines["top"].set_visible(False)
+    ax.spines["right"].set_visible(False)
+    ax.set_xlabel(etiqueta_x, color=COLOR_TEXTO)
+    ax.set_ylabel(etiqueta_y, color=COLOR_TEXTO)
+    ax.grid(alpha=0.2, color=COLOR_REJILLA)
+
+
+def programar_fotogramas(total, fps=20):
+    """
+    Genera los índices de fotograma a mostrar para una animación de ``total`` pasos.
+
+    Cada fotograma tiene una hora objetivo ``k / fps`` desde el inicio. Si el
+    consumidor va adelantado se espera solo lo que falta hasta esa hora; si
+    el dibujo se retrasa se saltan los fotogramas intermedios para alcanzar
+    el que corresponde al tiempo transcurrido. El último índice siempre se
+    entrega.
+    """
+    if total <= 0:
+        return
+    inicio = time.perf_counter()
+    i = 0
+    while True:
+        yield i
+        if i >= total - 1:
+            return
+        transcurrido = time.perf_counter() - inicio
+        i = min(total - 1, max(i + 1, int(transcurrido * fps)))
+        espera = i / fps - (time.perf_counter() - inicio)
+        if espera > 0:
+            time.sleep(espera)
+
+
+class AnimacionCurvas:
+    """
+    Figura de las curvas S, I, R que se construye una sola vez.
+
+    Cada fotograma solo actualiza los datos de las tres líneas con vistas de
+    los arrays de entrada; ejes, estilo y leyenda no se vuelven a crear.
+    """
+
+    def __init__(self, t, S, I, R, N, days, figsize=(10, 4)):
+        self.t = t
+        self.curvas = (S, I, R)
+        self.fig, self.ax = plt.subplots(figsize=figsize)
+        self.lineas = [
+            self.ax.plot([], [], label=etiqueta, color=color, linewidth=3)[0]
+            for etiqueta, color in (
+                ("Susceptibles", COLOR_S), ("Infectados", COLOR_I), ("Recuperados", COLOR_R)
+            )
+        ]
+        aplicar_estilo_oscuro(self.fig, self.ax, "Días", "Número de personas")
+
+        # Leyenda estilizada
+        legend = self.ax.legend(frameon=True, fancybox=True, shadow=True)
+        legend.get_frame().set_facecolor(COLOR_LEYENDA)
+        for text in legend.get_texts():
+            text.set_color(COLOR_TEXTO)
+
+        # Rango de ejes
+        self.ax.set_xlim(0, days)
+        self.ax.set_ylim(0, N)
+
+    def actualizar(self, i):
+        """Muestra las curvas hasta el índice ``i`` (incluido) y devuelve la figura."""
+        with fase('dibujo.curvas'):
+            for linea, curva in zip(self.lineas, self.curvas):
+                linea.set_data(self.t[:i + 1], curva[:i + 1])
+        return self.fig
+
+    def cerrar(self):
+        plt.close(self.fig)
+
+
+class AnimacionAgentes:
+    """
+    Gráfica de los agentes que se construye una sola vez.
+
+    Cada fotograma solo sustituye los datos de los artistas ya creados, con
+    un coste acotado aunque crezca el número de agentes:
+
+    - Hasta ``max_puntos`` agentes se dibujan todos como puntos; el color sale
+      del código de estado a través de un colormap, sin listas de colores.
+    - Entre ``max_puntos`` y ``umbral_densidad`` se dibuja una submuestra
+      estratificada de ``max_puntos`` agentes que conserva la proporción de
+      cada estado. La submuestra se toma de una permutación fija, así que los
+      mismos agentes siguen visibles de un fotograma a otro.
+    - Por encima de ``umbral_densidad`` se dibuja un mapa de densidad de
+      ``resolucion`` x ``resolucion`` celdas: el tono mezcla los colores de
+      los estados presentes en la celda y el brillo crece con el número de
+      agentes (escala logarítmica).
+    """
+
+    def __init__(self, tamaño, figsize=(10, 4), max_puntos=MAX_PUNTOS_DISPERSION,
+                 umbral_densidad=UMBRAL_DENSIDAD, resolucion=RESOLUCION_DENSIDAD):
+        self.tamaño = tamaño
+        self.max_puntos = max_puntos
+        self.umbral_densidad = umbral_densidad
+        self.resolucion = resolucion
+        self.fig, self.ax = plt.subplots(figsize=figsize)
+        self.puntos = self.ax.scatter([], [], c=np.zeros(0, dtype=np.int8), s=100, cmap=MAPA_ESTADOS, vmin=0, vmax=2)
+        self.densidad = None
+        self._permutacion = None
+        aplicar_estilo_oscuro(self.fig, self.ax, "X", "Y")
+        self.ax.set_xlim(0, tamaño)
+        self.ax.set_ylim(0, tamaño)
+
+    def actualizar(self, instantanea):
+        """Dibuja las posiciones y estados de una Instantanea y devuelve la figura."""
+        n = len(instantanea.estados)
+        with fase('dibujo.agentes'):
+            if n > self.umbral_densidad:
+                self._dibujar_densidad(instantanea.x, instantanea.y, instantanea.estados)
+            else:
+                self._dibujar_puntos(instantanea.x, instantanea.y, instantanea.estados)
+            self.ax.set_title(f"Paso de simulación: {instantanea.paso}", color=COLOR_TEXTO)
+        return self.fig
+
+    def _dibujar_puntos(self, x, y, estados):
+        n = len(estados)
+        if n > self.max_puntos:
+            indices = self._submuestra(estados)
+            x, y, estados = x[indices], y[indices], estados[indices]
+        self.puntos.set_offsets(np.column_stack([x, y]))
+        self.puntos.set_array(estados)
+        # Puntos más pequeños cuanto más se llena el área
+        self.puntos.set_sizes([100 * min(1.0, 1000 / max(len(estados), 1))])
+        self.puntos.set_visible(True)
+        if self.densidad is not None:
+            self.densidad.set_visible(False)
+
+    def _submuestra(self, estados):
+        n = len(estados)
+        if self._permutacion is None or len(self._permutacion) != n:
+            self._permutacion = np.random.default_rng(0).permutation(n)
+        # Cuotas por estado proporcionales a su frecuencia (método del mayor resto)
+        conteos = np.bincount(estados, minlength=3)
+        exactas = conteos * self.max_puntos / n
+        cuotas = np.floor(exactas).astype(np.int64)
+        faltan = self.max_puntos - cuotas.sum()
+        cuotas[np.argsort(cuotas - exactas)[:faltan]] += 1
+        en_orden = estados[self._permutacion]
+        return np.concatenate([
+            self._permutacion[en_orden == codigo][:cuota] for codigo, cuota in enumerate(cuotas)
+        ])
+
+    def _dibujar_densidad(self, x, y, estados):
+        m = self.resolucion
+        escala = m / self.tamaño
+        cx = np.minimum((x * escala).astype(np.int64), m - 1)
+        cy = np.minimum((y * escala).astype(np.int64), m - 1)
+        # Un solo bincount da el histograma 2D de los tres estados
+        conteos = np.bincount((cy * m + cx) * 3 + estados, minlength=m * m * 3).reshape(m, m, 3)
+        total = conteos.sum(axis=2, keepdims=True)
+        mezcla = conteos @ PALETA_ESTADOS_RGBA[:, :3] / np.maximum(total, 1)
+        brillo = np.log1p(total) / np.log1p(max(total.max(), 1))
+        imagen = FONDO_RGB * (1 - brillo) + mezcla * brillo
+        if self.densidad is None:
+            self.densidad = self.ax.imshow(imagen, origin="lower", extent=(0, self.tamaño, 0, self.tamaño),
+                                           interpolation="nearest", aspect="auto")
+        else:
+            self.densidad.set_data(imagen)
+        self.densidad.set_visible(True)
+        self.puntos.set_visible(False)
+
+    def cerrar(self):
+        plt.close(self.fig)